@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.db.models.signals import pre_delete
+        from .sharding import delete_user_sessions
+
+        pre_delete.connect(delete_user_sessions, sender=get_user_model(),
+                           dispatch_uid="accounts.delete_user_sessions")
@@ -0,0 +1,22 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from . import revocation
+from .sessions import SESSION_ID_CLAIM
+
+
+class SessionJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that also rejects access tokens whose device session
+    has been revoked (logout or session revoke). The check runs against the
+    node's in-memory revoked-session set, kept current by the revocation
+    broadcast and `revocation.sync()`, so it costs no query per request.
+    """
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        revocation.sync()
+        if revocation.is_revoked(sid=token.get(SESSION_ID_CLAIM)):
+            raise InvalidToken(_("Session has been revoked"))
+        return token
@@ -0,0 +1,249 @@
+"""
+Local breached-password index.
+
+`manage.py compile_breach_index` turns a downloaded SHA-1 breach list (one
+`HASH[:COUNT]` per line, as published by Have I Been Pwned) into a sorted
+binary file:
+
+    header   32 bytes: magic, version, key size, record count
+    fanout   65536 little-endian uint64: records whose first two bytes
+             are <= i, so a lookup starts from a ~count/65536 slice
+    records  count x key size bytes: sorted, unique SHA-1 prefixes
+
+Keys keep the first `key_size` bytes of each hash (10 by default, about a
+1e-15 false-positive rate at a billion entries). `BreachIndex` maps the file
+read-only, so every worker shares the same page-cache pages and a lookup
+reads a handful of records without loading the file.
+"""
+import functools
+import gzip
+import hashlib
+import heapq
+import mmap
+import os
+import random
+import struct
+import tempfile
+
+from django.core.exceptions import ValidationError
+from django.utils.translation import gettext as _
+
+MAGIC = b"PWBREACH"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQ8x")
+FANOUT_SIZE = 1 << 16
+FANOUT = struct.Struct(f"<{FANOUT_SIZE}Q")
+DATA_OFFSET = HEADER.size + FANOUT.size
+DEFAULT_KEY_SIZE = 10
+
+
+class BreachIndex:
+    """
+    Read-only view of a compiled index. `digest in index` takes a raw SHA-1
+    digest (20 bytes).
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.key_size, self.count = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a breached-password index")
+        if len(self._mmap) != DATA_OFFSET + self.count * self.key_size:
+            raise ValueError(f"{path} is truncated")
+        self.path = path
+
+    def __len__(self):
+        return self.count
+
+    def _fanout(self, prefix):
+        return struct.unpack_from("<Q", self._mmap, HEADER.size + prefix * 8)[0]
+
+    def __contains__(self, digest):
+        key = digest[:self.key_size]
+        prefix = key[0] << 8 | key[1]
+        lo = self._fanout(prefix - 1) if prefix else 0
+        hi = self._fanout(prefix)
+        size, data = self.key_size, self._mmap
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = DATA_OFFSET + mid * size
+            probe = data[offset:offset + size]
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                return True
+        return False
+
+    def contains_password(self, password):
+        return hashlib.sha1(password.encode("utf-8")).digest() in self
+
+
+@functools.lru_cache(maxsize=None)
+def open_index(path):
+    """One mapping per process and path."""
+    return BreachIndex(path)
+
+
+class BreachedPasswordValidator:
+    """
+    Rejects passwords whose SHA-1 is in the compiled index at `index_path`.
+    The index is opened when the validator is built (at warm-up), so a
+    missing file fails the readiness probe rather than a registration.
+    """
+
+    def __init__(self, index_path):
+        self.index = open_index(str(index_path))
+
+    def validate(self, password, user=None):
+        if self.index.contains_password(password):
+            raise ValidationError(
+                _("This password has appeared in a data breach."),
+                code="password_breached",
+            )
+
+    def get_help_text(self):
+        return _("Your password can’t be one that has appeared in a data breach.")
+
+
+# === COMPILING ===
+class IndexWriter:
+    """
+    Writes keys, given in ascending order, to an index. The file is built
+    next to `path` and moved into place on close, so running workers keep
+    their mapping of the old file until they restart.
+    """
+
+    def __init__(self, path, key_size=DEFAULT_KEY_SIZE):
+        if not 2 <= key_size <= 20:
+            raise ValueError("key_size must be between 2 and 20 bytes")
+        self.path = path
+        self.key_size = key_size
+        self.count = 0
+        self._counts = [0] * FANOUT_SIZE
+        self._last = None
+        self._file = tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(os.path.abspath(path)), delete=False)
+        self._file.seek(DATA_OFFSET)
+
+    def add(self, key):
+        """Adds a key; repeats of the previous key are skipped."""
+        if key == self._last:
+            return
+        if self._last is not None and key < self._last:
+            raise ValueError("keys must be added in ascending order")
+        self._file.write(key)
+        self._counts[key[0] << 8 | key[1]] += 1
+        self._last = key
+        self.count += 1
+
+    def close(self):
+        total, fanout = 0, []
+        for count in self._counts:
+            total += count
+            fanout.append(total)
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, self.key_size, self.count))
+        self._file.write(FANOUT.pack(*fanout))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.chmod(self._file.name, 0o644)  # temporary files are owner-only
+        os.replace(self._file.name, self.path)
+
+    def abort(self):
+        self._file.close()
+        os.unlink(self._file.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def read_hash_list(path, key_size, min_count=1, stats=None):
+    """
+    Yields the keys of a `HASH[:COUNT]` list (optionally gzipped). Lines
+    that are not a SHA-1 hex digest, and hashes seen fewer than `min_count`
+    times, are skipped and counted in `stats`.
+    """
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rt", encoding="ascii", errors="replace") as f:
+        for line in f:
+            digest, _sep, count = line.strip().partition(":")
+            try:
+                key = bytes.fromhex(digest)[:key_size]
+                ok = len(digest) == 40 and int(count or 1) >= min_count
+            except ValueError:
+                ok = False
+            if ok:
+                yield key
+            elif stats is not None and line.strip():
+                stats["skipped"] = stats.get("skipped", 0) + 1
+
+
+def _write_run(keys, directory):
+    keys.sort()
+    run = tempfile.NamedTemporaryFile(dir=directory, delete=False, suffix=".run")
+    with run:
+        run.write(b"".join(keys))
+    return run.name
+
+
+def _read_run(path, key_size, chunk_records=65536):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(key_size * chunk_records)
+            if not chunk:
+                return
+            for offset in range(0, len(chunk), key_size):
+                yield chunk[offset:offset + key_size]
+
+
+def compile_index(sources, output, key_size=DEFAULT_KEY_SIZE, min_count=1,
+                  run_size=5_000_000, tmp_dir=None):
+    """
+    External sort of the keys of every source list into an index: sorted
+    runs of `run_size` keys go to temporary files and are merged, so memory
+    stays bounded whatever the list size. Returns counts for reporting.
+    """
+    stats = {"skipped": 0, "runs": 0}
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as directory:
+        runs, keys = [], []
+        for source in sources:
+            for key in read_hash_list(source, key_size, min_count, stats):
+                keys.append(key)
+                if len(keys) >= run_size:
+                    runs.append(_write_run(keys, directory))
+                    keys = []
+        if keys or not runs:
+            runs.append(_write_run(keys, directory))
+        stats["runs"] = len(runs)
+
+        with IndexWriter(output, key_size) as writer:
+            for key in heapq.merge(*(_read_run(run, key_size) for run in runs)):
+                writer.add(key)
+        stats["entries"] = writer.count
+    return stats
+
+
+def write_sample_hash_list(path, count, passwords=(), seed=None):
+    """
+    Writes an unsorted `HASH:COUNT` list of `count` random hashes plus the
+    hashes of `passwords`, for tests and benchmarks.
+    """
+    rng = random.Random(seed)
+    lines = [f"{rng.getrandbits(160):040X}:{rng.randint(1, 1000)}" for _ in range(count)]
+    lines += [
+        f"{hashlib.sha1(p.encode('utf-8')).hexdigest().upper()}:{rng.randint(1, 1000)}"
+        for p in passwords
+    ]
+    rng.shuffle(lines)
+    with open(path, "w", encoding="ascii") as f:
+        f.write("\n".join(lines) + "\n")
@@ -0,0 +1,340 @@
+"""
+Asynchronous, batched audit log of authentication events.
+
+Views call `record()`, which appends a compact tuple to a bounded in-memory
+ring buffer and returns; no I/O happens on the request path. A background
+flusher drains the buffer every `FLUSH_INTERVAL` seconds (or as soon as
+`BATCH_SIZE` events are waiting) into a sink:
+
+* `DatabaseSink` appends to the `AuthEvent` table with `bulk_create`, or
+  COPY on PostgreSQL.
+* `JSONLSink` appends JSON lines to a file and rotates it by size.
+
+The `AuthEvent` table doubles as an outbox: `dispatch()` hands events to
+subscribers (e.g. `WebhookSubscriber`) in id order and advances a per
+subscriber `OutboxCursor` in the same transaction, so delivery is
+at-least-once. `manage.py dispatch_auth_events` runs the subscribers.
+
+When the buffer is full the `OVERFLOW` policy applies: "drop_oldest",
+"drop_newest", or "block" (wait up to `BLOCK_TIMEOUT` seconds for the
+flusher, then drop the new event).
+"""
+import atexit
+import csv
+import io
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from collections import deque
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+LOGIN = "login"
+LOGIN_FAILED = "login_failed"
+REFRESH = "refresh"
+LOGOUT = "logout"
+REVOKE = "revoke"
+EXPORT = "export"
+
+# Field order of the buffered event tuples
+FIELDS = ("kind", "user_id", "session_id", "ip", "created_at", "data")
+
+
+class EventBuffer:
+    """
+    Bounded FIFO shared by request threads and the flusher.
+    """
+
+    def __init__(self, capacity, overflow="drop_oldest", block_timeout=0.05):
+        self.capacity = capacity
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, event):
+        """Returns False if an event (this one or an older one) was dropped."""
+        with self._lock:
+            if len(self._items) >= self.capacity:
+                if self.overflow == "block":
+                    self._not_full.wait_for(
+                        lambda: len(self._items) < self.capacity,
+                        timeout=self.block_timeout)
+                if len(self._items) >= self.capacity:
+                    self.dropped += 1
+                    if self.overflow != "drop_oldest":
+                        return False
+                    self._items.popleft()
+                    self._items.append(event)
+                    return False
+            self._items.append(event)
+            return True
+
+    def drain(self, limit):
+        with self._lock:
+            count = min(limit, len(self._items))
+            batch = [self._items.popleft() for _ in range(count)]
+            self._not_full.notify_all()
+        return batch
+
+
+class EventLog:
+    """
+    Buffer plus flusher thread. With `flush_interval=0` no thread is
+    started and events are written by explicit `flush()` calls only.
+    """
+
+    def __init__(self, sink, capacity=10000, batch_size=500,
+                 flush_interval=1.0, overflow="drop_oldest", block_timeout=0.05):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer = EventBuffer(capacity, overflow, block_timeout)
+        self.written = 0
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self.flush_interval and self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="auth-events", daemon=True)
+            self._thread.start()
+        return self
+
+    def record(self, event):
+        self.buffer.put(event)
+        if len(self.buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Writes everything buffered so far; returns the number written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self.buffer.drain(self.batch_size)
+                if not batch:
+                    break
+                try:
+                    self.sink.write(batch)
+                except Exception:
+                    logger.exception("Dropped %d auth events", len(batch))
+                    self.buffer.dropped += len(batch)
+                    continue
+                written += len(batch)
+        self.written += written
+        return written
+
+    def close(self, flush=True):
+        if not flush:
+            self.buffer.drain(len(self.buffer))  # before the flusher wakes
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if flush:
+            self.flush()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+        connection.close()
+
+
+# === SINKS ===
+class DatabaseSink:
+    """
+    Appends batches to the `AuthEvent` table.
+
+    `dispatch()` relies on rows becoming visible in id order: a lower id
+    committed after a higher one would fall behind a subscriber's cursor
+    and never be delivered. Writers on PostgreSQL therefore take turns,
+    allocating ids and committing under one advisory lock. SQLite already
+    admits a single writer at a time.
+    """
+
+    # pg_advisory_xact_lock key shared by every process writing AuthEvent rows
+    LOCK_KEY = 0x41757468  # "Auth"
+
+    def write(self, batch):
+        from .models import AuthEvent
+
+        with transaction.atomic():
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_xact_lock(%s)", [self.LOCK_KEY])
+                self._copy(AuthEvent, batch)
+            else:
+                AuthEvent.objects.bulk_create(
+                    [AuthEvent(**self._row(event)) for event in batch])
+
+    @staticmethod
+    def _row(event):
+        row = dict(zip(FIELDS, event))
+        row["created_at"] = datetime.fromtimestamp(row["created_at"], tz=timezone.utc)
+        return row
+
+    def _copy(self, model, batch):
+        # COPY ... FROM STDIN is several times faster than a multi-row
+        # INSERT for large batches; empty unquoted CSV fields load as NULL.
+        data = io.StringIO()
+        writer = csv.writer(data)
+        for event in batch:
+            row = self._row(event)
+            writer.writerow([
+                row["kind"],
+                "" if row["user_id"] is None else row["user_id"],
+                row["session_id"] or "",
+                row["ip"] or "",
+                row["created_at"].isoformat(),
+                json.dumps(row["data"]),
+            ])
+        data.seek(0)
+        columns = ", ".join(
+            model._meta.get_field(name).column for name in FIELDS)
+        with connection.cursor() as cursor:
+            cursor.cursor.copy_expert(
+                f"COPY {model._meta.db_table} ({columns}) FROM STDIN WITH (FORMAT csv)",
+                data)
+
+
+class JSONLSink:
+    """
+    Appends one JSON object per line to `path`, renaming the file to
+    `path.<unix time>` once it exceeds `max_bytes`.
+    """
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def write(self, batch):
+        lines = "".join(
+            json.dumps(dict(zip(FIELDS, event)), separators=(",", ":")) + "\n"
+            for event in batch)
+        with open(self.path, "a", encoding="utf-8") as handle:
+            handle.write(lines)
+            size = handle.tell()
+        if size >= self.max_bytes:
+            os.replace(self.path, f"{self.path}.{time.time():.0f}")
+
+
+# === OUTBOX SUBSCRIBERS ===
+class WebhookSubscriber:
+    """
+    POSTs each batch of events as a JSON array to `url`.
+    """
+
+    def __init__(self, name, url, timeout=5):
+        self.name = name
+        self.url = url
+        self.timeout = timeout
+
+    def deliver(self, events):
+        body = json.dumps([event.as_dict() for event in events]).encode()
+        request = urllib.request.Request(
+            self.url, data=body, method="POST",
+            headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+def get_subscribers():
+    return [
+        import_string(conf["CLASS"])(name=conf["NAME"], **conf.get("OPTIONS", {}))
+        for conf in settings.AUTH_EVENT_SUBSCRIBERS
+    ]
+
+
+def dispatch(subscriber, batch_size=100):
+    """
+    Delivers the next batch of events to `subscriber` and advances its
+    cursor. A failed delivery rolls the cursor back, so the batch is
+    retried on the next call. Returns the number of events delivered.
+    Rows must only ever be added through `DatabaseSink`, which commits
+    them in id order.
+    """
+    from .models import AuthEvent, OutboxCursor
+
+    with transaction.atomic():
+        cursor, _ = OutboxCursor.objects.select_for_update().get_or_create(
+            name=subscriber.name)
+        events = list(
+            AuthEvent.objects.filter(id__gt=cursor.position).order_by("id")[:batch_size])
+        if not events:
+            return 0
+        subscriber.deliver(events)
+        cursor.position = events[-1].id
+        cursor.save(update_fields=["position"])
+    return len(events)
+
+
+# === PROCESS-WIDE LOG ===
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_event_log():
+    global _log
+    if _log is None:
+        with _log_lock:
+            if _log is None:
+                conf = settings.AUTH_EVENTS
+                sink = import_string(conf["SINK"])(**conf.get("OPTIONS", {}))
+                _log = EventLog(
+                    sink,
+                    capacity=conf["CAPACITY"],
+                    batch_size=conf["BATCH_SIZE"],
+                    flush_interval=conf["FLUSH_INTERVAL"],
+                    overflow=conf["OVERFLOW"],
+                    block_timeout=conf.get("BLOCK_TIMEOUT", 0.05),
+                ).start()
+                atexit.register(_log.close)
+    return _log
+
+
+def shutdown(flush=True):
+    """
+    Stops the process-wide log, writing what is still buffered unless
+    `flush` is False (e.g. the database is already gone). A later
+    `record()` starts a new log.
+    """
+    global _log
+    with _log_lock:
+        log, _log = _log, None
+    if log is not None:
+        atexit.unregister(log.close)
+        log.close(flush=flush)
+
+
+def record(kind, request=None, user_id=None, session_id=None, **data):
+    """
+    Queues an event for the audit log. Never touches the database.
+    """
+    if not settings.AUTH_EVENTS["ENABLED"]:
+        return
+    ip = request.META.get("REMOTE_ADDR") if request is not None else None
+    get_event_log().record((
+        kind,
+        user_id,
+        str(session_id) if session_id else None,
+        ip,
+        time.time(),
+        data,
+    ))
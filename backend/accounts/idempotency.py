@@ -0,0 +1,127 @@
+"""
+Replay of login and refresh responses to retried requests.
+
+Clients on flaky networks resend requests whose response they never saw.
+A resent refresh presents a token that was already rotated (and therefore
+blacklisted) and fails, and the client falls back to a full login. The
+`idempotent` decorator caches successful responses under:
+
+* the `Idempotency-Key` header together with the request body, for
+  `IDEMPOTENCY["KEY_TTL"]` seconds; a key reused with a different body
+  (other credentials) is simply a different key;
+* for refresh, the presented refresh token itself, for
+  `IDEMPOTENCY["REFRESH_GRACE"]` seconds after it was rotated.
+
+A duplicate gets the cached response (with `Idempotent-Replayed: true`)
+and does no work. A duplicate arriving while the first request is still
+running waits up to `IDEMPOTENCY["WAIT"]` seconds for its result. Replays
+for a session that has since been revoked are refused.
+"""
+import functools
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import revocation
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+def _digest(*parts):
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def request_keys(request, refresh_field=None):
+    """
+    Returns `[(cache key, ttl)]` identifying this request, or an empty list
+    when there is nothing to deduplicate on.
+    """
+    conf = settings.IDEMPOTENCY
+    keys = []
+    header = request.headers.get(HEADER)
+    if header and conf["KEY_TTL"]:
+        body = json.dumps(request.data, sort_keys=True, default=str)
+        keys.append((f"idem:key:{_digest(request.path, header, body)}", conf["KEY_TTL"]))
+    token = request.data.get(refresh_field) if refresh_field else None
+    if isinstance(token, str) and token and conf["REFRESH_GRACE"]:
+        keys.append((f"idem:refresh:{_digest(token)}", conf["REFRESH_GRACE"]))
+    return keys
+
+
+def _lookup(keys):
+    entries = cache.get_many([key for key, _ in keys])
+    for key, _ in keys:
+        entry = entries.get(key)
+        if entry is None:
+            continue
+        if entry["sid"] and revocation.is_revoked(sid=entry["sid"]):
+            cache.delete_many([k for k, _ in keys])
+            return None
+        return entry
+    return None
+
+
+def _replay(entry):
+    return Response(entry["data"], status=entry["status"],
+                    headers={REPLAYED_HEADER: "true"})
+
+
+def _session_of(data):
+    refresh = data.get("refresh") if isinstance(data, dict) else None
+    if not refresh:
+        return None
+    return RefreshToken(refresh, verify=False).get("sid")
+
+
+def idempotent(refresh_field=None):
+    """
+    Decorates an APIView `post`. `refresh_field` names the request field
+    carrying the refresh token, enabling the rotation grace window.
+    """
+    def decorator(post):
+        @functools.wraps(post)
+        def wrapper(view, request, *args, **kwargs):
+            keys = request_keys(request, refresh_field)
+            if not keys:
+                return post(view, request, *args, **kwargs)
+
+            entry = _lookup(keys)
+            if entry is not None:
+                return _replay(entry)
+
+            conf = settings.IDEMPOTENCY
+            lock = f"{keys[-1][0]}:lock"
+            if not cache.add(lock, 1, conf["LOCK_TIMEOUT"]):
+                # The first copy of this request is still running
+                deadline = time.monotonic() + conf["WAIT"]
+                while time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    entry = _lookup(keys)
+                    if entry is not None:
+                        return _replay(entry)
+                return Response(
+                    {"detail": "A request with this key is already in progress"},
+                    status=status.HTTP_409_CONFLICT)
+
+            try:
+                response = post(view, request, *args, **kwargs)
+                if status.is_success(response.status_code):
+                    entry = {
+                        "status": response.status_code,
+                        "data": response.data,
+                        "sid": _session_of(response.data),
+                    }
+                    for key, ttl in keys:
+                        cache.set(key, entry, ttl)
+                return response
+            finally:
+                cache.delete(lock)
+        return wrapper
+    return decorator
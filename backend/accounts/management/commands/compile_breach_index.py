@@ -0,0 +1,53 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.breach import DEFAULT_KEY_SIZE, compile_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Compiles SHA-1 breach lists (HASH[:COUNT] per line, optionally "
+        "gzipped) into the sorted binary index read by "
+        "accounts.breach.BreachedPasswordValidator."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("sources", nargs="+", help="Downloaded hash lists.")
+        parser.add_argument(
+            "-o", "--output", required=True,
+            help="Index file to write; replaced atomically.")
+        parser.add_argument(
+            "--key-bytes", type=int, default=DEFAULT_KEY_SIZE,
+            help=f"Bytes of each hash to keep (default: {DEFAULT_KEY_SIZE}).")
+        parser.add_argument(
+            "--min-count", type=int, default=1,
+            help="Skip hashes seen fewer times than this.")
+        parser.add_argument(
+            "--run-size", type=int, default=5_000_000,
+            help="Hashes sorted in memory at a time; bounds memory use.")
+        parser.add_argument(
+            "--tmp-dir", help="Directory for the sorted runs (default: system temp).")
+
+    def handle(self, *args, **options):
+        for source in options["sources"]:
+            if not os.path.exists(source):
+                raise CommandError(f"{source} does not exist.")
+        start = time.perf_counter()
+        try:
+            stats = compile_index(
+                options["sources"], options["output"],
+                key_size=options["key_bytes"],
+                min_count=options["min_count"],
+                run_size=options["run_size"],
+                tmp_dir=options["tmp_dir"],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        size = os.path.getsize(options["output"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {stats['entries']:,} hashes to {options['output']} "
+            f"({size / 1e6:.1f} MB, {stats['runs']} run(s), "
+            f"{stats['skipped']:,} line(s) skipped) "
+            f"in {time.perf_counter() - start:.1f}s"))
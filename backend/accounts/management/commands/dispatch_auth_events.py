@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts import events
+
+
+class Command(BaseCommand):
+    help = (
+        "Delivers AuthEvent rows to the subscribers in AUTH_EVENT_SUBSCRIBERS, "
+        "resuming from each subscriber's cursor."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Deliver the current backlog and exit instead of polling.")
+        parser.add_argument(
+            "--interval", type=float, default=1.0,
+            help="Seconds to sleep when every subscriber is caught up.")
+        parser.add_argument(
+            "--batch-size", type=int, default=100,
+            help="Events per delivery.")
+
+    def handle(self, *args, **options):
+        subscribers = events.get_subscribers()
+        if not subscribers:
+            raise CommandError("No subscribers configured in AUTH_EVENT_SUBSCRIBERS.")
+
+        while True:
+            delivered = 0
+            for subscriber in subscribers:
+                try:
+                    count = events.dispatch(subscriber, options["batch_size"])
+                except Exception as exc:
+                    # Cursor was not advanced; the batch is retried next round
+                    self.stderr.write(f"{subscriber.name}: delivery failed: {exc}")
+                    continue
+                if count:
+                    self.stdout.write(f"{subscriber.name}: delivered {count} event(s)")
+                delivered += count
+            if not delivered:
+                if options["once"]:
+                    return
+                time.sleep(options["interval"])
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts import export
+from accounts.serializers import ExportQuerySerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams device sessions or users as CSV or JSONL, reading rows "
+        "through a server-side cursor so memory stays flat."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=["sessions", "users"])
+        parser.add_argument(
+            "--format", dest="output", choices=sorted(export.FORMATS), default="csv")
+        parser.add_argument(
+            "-o", "--output", dest="path",
+            help="File to write to (default: standard output).")
+        parser.add_argument("--user", help="Only this user (id or email).")
+        parser.add_argument(
+            "--since", help="Created (users: joined) at or after this ISO 8601 time.")
+        parser.add_argument(
+            "--until", help="Created (users: joined) before this ISO 8601 time.")
+        revoked = parser.add_mutually_exclusive_group()
+        revoked.add_argument(
+            "--revoked", action="store_const", const=True, default=None,
+            help="Only revoked sessions.")
+        revoked.add_argument(
+            "--active", dest="revoked", action="store_const", const=False,
+            help="Only sessions that are not revoked.")
+        parser.add_argument(
+            "--chunk-size", type=int, default=export.CHUNK_SIZE,
+            help="Rows fetched per round trip.")
+
+    def handle(self, *args, **options):
+        params = {name: options[name] for name in (
+            "output", "user", "since", "until", "revoked") if options[name] is not None}
+        query = ExportQuerySerializer(data=params, context={"kind": options["kind"]})
+        if not query.is_valid():
+            raise CommandError(query.errors)
+        filters = dict(query.validated_data)
+        output_format = filters.pop("output")
+        fields, rows = export.rows(
+            options["kind"], chunk_size=options["chunk_size"], **filters)
+
+        path = options["path"]
+        out = open(path, "w", newline="", encoding="utf-8") if path else None
+        count = 0
+        try:
+            for line in export.render(fields, rows, output_format):
+                if out:
+                    out.write(line)
+                else:
+                    self.stdout.write(line, ending="")
+                count += 1
+        finally:
+            if out:
+                out.close()
+        if path:
+            if output_format == "csv":
+                count -= 1  # header
+            self.stderr.write(f"Exported {count} {options['kind']} to {path}")
@@ -0,0 +1,203 @@
+import json
+import statistics
+from collections import Counter, defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.profiling import get_ring
+
+
+def sql_time(capture):
+    return sum(query["duration_ms"] for query in capture["queries"])
+
+
+def own_time(capture):
+    """
+    Milliseconds spent in each function's own code: from cProfile, or
+    estimated from how often the sampler caught it at the top of the stack.
+    """
+    profile = capture["profile"]
+    if profile["kind"] == "cprofile":
+        return Counter({row["function"]: row["own_ms"] for row in profile["functions"]})
+    times = Counter()
+    for stack, count in profile["stacks"].items():
+        times[stack.rsplit(";", 1)[-1]] += count * profile["interval_ms"]
+    return times
+
+
+def inclusive_samples(stacks):
+    """Samples in which each frame was anywhere on the stack."""
+    counts = Counter()
+    for stack, count in stacks.items():
+        for label in set(stack.split(";")):
+            counts[label] += count
+    return counts
+
+
+def summarize(captures, limit):
+    """
+    Per URL name: count, median and max duration, median query count and
+    SQL time; across all captures, the statements and functions that took
+    the most time in total.
+    """
+    routes = defaultdict(list)
+    statements = defaultdict(lambda: {"count": 0, "total_ms": 0.0})
+    functions = Counter()
+    for capture in captures:
+        routes[capture["url_name"] or capture["path"]].append(capture)
+        for query in capture["queries"]:
+            entry = statements[" ".join(query["sql"].split())]
+            entry["count"] += 1
+            entry["total_ms"] += query["duration_ms"]
+        functions.update(own_time(capture))
+    return {
+        "captures": sum(len(group) for group in routes.values()),
+        "routes": {
+            name: {
+                "count": len(group),
+                "median_ms": statistics.median(c["duration_ms"] for c in group),
+                "max_ms": max(c["duration_ms"] for c in group),
+                "median_queries": statistics.median(len(c["queries"]) for c in group),
+                "median_sql_ms": statistics.median(sql_time(c) for c in group),
+            }
+            for name, group in routes.items()
+        },
+        "statements": [
+            {"sql": sql, **entry} for sql, entry in sorted(
+                statements.items(), key=lambda item: -item[1]["total_ms"])[:limit]
+        ],
+        "functions": [
+            {"function": name, "own_ms": round(ms, 3)}
+            for name, ms in functions.most_common(limit)
+        ],
+    }
+
+
+def clip(text, width):
+    text = " ".join(text.split())
+    return text if len(text) <= width else text[:width - 3] + "..."
+
+
+class Command(BaseCommand):
+    help = (
+        "Lists the request profiles and slow-request captures stored by "
+        "accounts.profiling, shows one in detail or summarizes them all."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "capture_id", nargs="?",
+            help="Show this capture's SQL timeline and profile.")
+        parser.add_argument(
+            "--summary", action="store_true",
+            help="Summarize every capture by route, statement and function.")
+        parser.add_argument(
+            "--limit", type=int, default=20,
+            help="Number of captures, queries or functions to print.")
+        parser.add_argument(
+            "--clear", action="store_true",
+            help="Delete every capture.")
+        parser.add_argument(
+            "--json", action="store_true",
+            help="Print JSON instead of a table.")
+
+    def handle(self, *args, **options):
+        ring = get_ring()
+        if options["clear"]:
+            ids = ring.ids()
+            for capture_id in ids:
+                ring.delete(capture_id)
+            self.stdout.write(f"Deleted {len(ids)} captures from {ring.directory}")
+        elif options["capture_id"]:
+            try:
+                capture = ring.load(options["capture_id"])
+            except FileNotFoundError:
+                raise CommandError(f"No capture {options['capture_id']} in {ring.directory}")
+            if options["json"]:
+                self.stdout.write(json.dumps(capture, indent=2))
+            else:
+                self.show(capture, options["limit"])
+        elif options["summary"]:
+            summary = summarize(list(ring), options["limit"])
+            if options["json"]:
+                self.stdout.write(json.dumps(summary, indent=2))
+            else:
+                self.show_summary(summary)
+        else:
+            captures = list(ring)[::-1][:options["limit"]]
+            if options["json"]:
+                self.stdout.write(json.dumps([
+                    {key: capture[key] for key in (
+                        "id", "trigger", "started_at", "method", "path",
+                        "url_name", "status", "duration_ms")}
+                    | {"queries": len(capture["queries"]), "sql_ms": sql_time(capture)}
+                    for capture in captures
+                ], indent=2))
+            else:
+                self.show_list(captures, ring)
+
+    def show_list(self, captures, ring):
+        if not captures:
+            self.stdout.write(f"No captures in {ring.directory}")
+            return
+        self.stdout.write(
+            f"{'id':<30}{'trigger':<9}{'status':>6}{'total':>12}{'queries':>9}"
+            f"{'sql':>12}  request")
+        for capture in captures:
+            self.stdout.write(
+                f"{capture['id']:<30}{capture['trigger']:<9}{capture['status']:>6}"
+                f"{capture['duration_ms']:>9.1f} ms{len(capture['queries']):>9}"
+                f"{sql_time(capture):>9.1f} ms  {capture['method']} {capture['path']}")
+
+    def show(self, capture, limit):
+        self.stdout.write(
+            f"{capture['method']} {capture['path']} ({capture['url_name']}) -> "
+            f"{capture['status']} in {capture['duration_ms']:.1f} ms, "
+            f"{capture['trigger']}, {capture['started_at']}")
+
+        queries = capture["queries"]
+        self.stdout.write(
+            f"\nSQL: {len(queries)} queries, {sql_time(capture):.1f} ms "
+            f"(start / duration / alias):")
+        for query in queries[:limit]:
+            self.stdout.write(
+                f"  {query['start_ms']:9.1f} ms{query['duration_ms']:9.1f} ms  "
+                f"{query['alias']:<12}{clip(query['sql'], 90)}")
+        if len(queries) > limit:
+            self.stdout.write(f"  ... {len(queries) - limit} more")
+
+        profile = capture["profile"]
+        if profile["kind"] == "cprofile":
+            self.stdout.write("\nTop functions by cumulative time (calls / own / cumulative):")
+            for row in profile["functions"][:limit]:
+                self.stdout.write(
+                    f"  {row['calls']:>7}{row['own_ms']:9.1f} ms"
+                    f"{row['cumulative_ms']:9.1f} ms  {row['function']}")
+        else:
+            samples = sum(profile["stacks"].values())
+            self.stdout.write(
+                f"\nStack samples: {samples} every {profile['interval_ms']:g} ms "
+                f"(own / on stack):")
+            inclusive = inclusive_samples(profile["stacks"])
+            for name, ms in own_time(capture).most_common(limit):
+                share = inclusive[name] / samples if samples else 0
+                self.stdout.write(f"  {ms:9.1f} ms{share:8.0%}  {name}")
+
+    def show_summary(self, summary):
+        self.stdout.write(
+            f"{summary['captures']} captures\n\n"
+            f"{'route':<24}{'count':>6}{'median':>12}{'max':>12}{'queries':>9}{'sql':>12}")
+        routes = sorted(summary["routes"].items(), key=lambda item: -item[1]["median_ms"])
+        for name, route in routes:
+            self.stdout.write(
+                f"{name:<24}{route['count']:>6}{route['median_ms']:>9.1f} ms"
+                f"{route['max_ms']:>9.1f} ms{route['median_queries']:>9g}"
+                f"{route['median_sql_ms']:>9.1f} ms")
+        self.stdout.write("\nStatements by total time (count / total):")
+        for statement in summary["statements"]:
+            self.stdout.write(
+                f"  {statement['count']:>6}{statement['total_ms']:9.1f} ms  "
+                f"{clip(statement['sql'], 90)}")
+        self.stdout.write("\nFunctions by own time:")
+        for function in summary["functions"]:
+            self.stdout.write(f"  {function['own_ms']:9.1f} ms  {function['function']}")
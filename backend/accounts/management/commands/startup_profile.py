@@ -0,0 +1,147 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def parse_importtime(stderr):
+    """
+    Aggregates `python -X importtime` output into per top-level package
+    totals of self time (in seconds) and module counts.
+    """
+    packages = defaultdict(lambda: {"self": 0.0, "modules": 0})
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, _, name = line[len("import time:"):].split("|", 2)
+        except ValueError:
+            continue
+        package = name.strip().split(".", 1)[0]
+        packages[package]["self"] += int(self_us) / 1e6
+        packages[package]["modules"] += 1
+    return dict(packages)
+
+
+def run_probe(path):
+    """
+    Runs the cold-start probe in a fresh interpreter and returns its report
+    together with the per-package import breakdown.
+    """
+    env = os.environ.copy()
+    env["DJANGO_SETTINGS_MODULE"] = settings.SETTINGS_MODULE
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "accounts.startup", path],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise CommandError(
+            f"Startup probe failed:\n{result.stderr[-2000:]}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report["packages"] = parse_importtime(result.stderr)
+    return report
+
+
+def summarize(reports):
+    """
+    Collapses several probe reports into one, taking the median of every
+    measurement so a single noisy run does not skew the numbers.
+    """
+    def median_of(getter):
+        values = [v for v in (getter(r) for r in reports) if v is not None]
+        return statistics.median(values) if values else 0.0
+
+    first = reports[0]
+    summary = {
+        "path": first["path"],
+        "status": first["status"],
+        "runs": len(reports),
+        "time_to_first_request": median_of(
+            lambda r: r["time_to_first_request"]),
+        "phases": {
+            name: median_of(lambda r, name=name: r["phases"].get(name))
+            for name in first["phases"]
+        },
+        "apps": {
+            app: {
+                key: median_of(
+                    lambda r, app=app, key=key: r["apps"].get(app, {}).get(key))
+                for key in ("import", "models", "ready")
+            }
+            for app in first["apps"]
+        },
+        "packages": {
+            name: {
+                "self": median_of(
+                    lambda r, name=name: r["packages"].get(name, {}).get("self")),
+                "modules": first["packages"][name]["modules"],
+            }
+            for name in first["packages"]
+        },
+    }
+    return summary
+
+
+class Command(BaseCommand):
+    help = (
+        "Profiles a cold worker start: per-package import time, per-app "
+        "setup time and time to first request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path", default="/api/auth/me",
+            help="URL used for the first request (default: /api/auth/me).")
+        parser.add_argument(
+            "--repeat", type=int, default=1,
+            help="Number of fresh interpreters to probe; medians are reported.")
+        parser.add_argument(
+            "--limit", type=int, default=15,
+            help="Number of packages to list in the import breakdown.")
+        parser.add_argument(
+            "--json", action="store_true",
+            help="Print the summary as JSON instead of a table.")
+
+    def handle(self, *args, **options):
+        reports = [run_probe(options["path"])
+                   for _ in range(max(options["repeat"], 1))]
+        summary = summarize(reports)
+
+        if options["json"]:
+            self.stdout.write(json.dumps(summary, indent=2))
+            return
+
+        def ms(seconds):
+            return f"{seconds * 1000:9.1f} ms"
+
+        self.stdout.write(
+            f"Startup profile for {summary['path']} "
+            f"(HTTP {summary['status']}, median of {summary['runs']} run(s))")
+        self.stdout.write("\nPhases:")
+        for name, seconds in summary["phases"].items():
+            self.stdout.write(f"  {name:<32}{ms(seconds)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"  {'time to first request':<32}"
+            f"{ms(summary['time_to_first_request'])}"))
+
+        self.stdout.write("\nApps (import / models / ready):")
+        apps = sorted(summary["apps"].items(),
+                      key=lambda item: -sum(item[1].values()))
+        for name, timings in apps:
+            self.stdout.write(
+                f"  {name:<42}{ms(timings['import'])}"
+                f"{ms(timings['models'])}{ms(timings['ready'])}")
+
+        self.stdout.write(
+            f"\nTop {options['limit']} packages by import time:")
+        packages = sorted(summary["packages"].items(),
+                          key=lambda item: -item[1]["self"])
+        for name, stats in packages[:options["limit"]]:
+            self.stdout.write(
+                f"  {name:<32}{ms(stats['self'])}"
+                f"  ({stats['modules']} modules)")
@@ -8,6 +8,18 @@ from django.conf import settings
 from django.db import migrations, models
 
 
+def device_session_fields(db_constraint):
+    return [
+        ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+        ('device_name', models.CharField(blank=True, max_length=255)),
+        ('created_at', models.DateTimeField(auto_now_add=True)),
+        ('last_seen', models.DateTimeField(auto_now=True)),
+        ('refresh_token_jti', models.CharField(blank=True, max_length=255, null=True)),
+        ('revoked', models.BooleanField(default=False)),
+        ('user', models.ForeignKey(db_constraint=db_constraint, on_delete=django.db.models.deletion.CASCADE, related_name='device_sessions', to=settings.AUTH_USER_MODEL)),
+    ]
+
+
 class Migration(migrations.Migration):
 
     initial = True
@@ -44,16 +56,22 @@ class Migration(migrations.Migration):
                 ('objects', django.contrib.auth.models.UserManager()),
             ],
         ),
-        migrations.CreateModel(
-            name='DeviceSession',
-            fields=[
-                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
-                ('device_name', models.CharField(blank=True, max_length=255)),
-                ('created_at', models.DateTimeField(auto_now_add=True)),
-                ('last_seen', models.DateTimeField(auto_now=True)),
-                ('refresh_token_jti', models.CharField(blank=True, max_length=255, null=True)),
-                ('revoked', models.BooleanField(default=False)),
-                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='device_sessions', to=settings.AUTH_USER_MODEL)),
+        # The table is created without the FK constraint: on a dedicated
+        # session shard (accounts.sharding) accounts_user does not exist.
+        # The state keeps the constraint so that 0005 still drops it from
+        # databases migrated before this change.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='DeviceSession',
+                    fields=device_session_fields(db_constraint=True),
+                ),
+            ],
+            database_operations=[
+                migrations.CreateModel(
+                    name='DeviceSession',
+                    fields=device_session_fields(db_constraint=False),
+                ),
             ],
         ),
     ]
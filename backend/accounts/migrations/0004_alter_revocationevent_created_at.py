@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_revocationevent'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='revocationevent',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:11
+
+import accounts.sharding
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_alter_revocationevent_created_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='devicesession',
+            name='id',
+            field=models.UUIDField(default=accounts.sharding.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='devicesession',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='device_sessions', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_alter_devicesession_id_alter_devicesession_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=32)),
+                ('user_id', models.BigIntegerField(blank=True, db_index=True, null=True)),
+                ('session_id', models.UUIDField(blank=True, null=True)),
+                ('ip', models.GenericIPAddressField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('data', models.JSONField(blank=True, default=dict)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OutboxCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('position', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
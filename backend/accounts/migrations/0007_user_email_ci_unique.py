@@ -0,0 +1,64 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:17
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count, Subquery
+from django.db.models.functions import Lower
+
+# Collision groups spelled out in the error; the rest are only counted
+REPORT_LIMIT = 100
+
+
+def report_email_collisions(apps, schema_editor):
+    """
+    Fails with every group of emails that differ only in case, found with
+    two grouped queries, instead of the first IntegrityError from building
+    the unique index.
+    """
+    User = apps.get_model('accounts', 'User')
+    users = User.objects.using(schema_editor.connection.alias)
+    duplicated = (
+        users.annotate(email_lower=Lower('email'))
+        .values('email_lower')
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+    )
+    total = duplicated.count()
+    if not total:
+        return
+
+    groups = {}
+    rows = (
+        users.annotate(email_lower=Lower('email'))
+        .filter(email_lower__in=Subquery(
+            duplicated.order_by('email_lower').values('email_lower')[:REPORT_LIMIT]))
+        .order_by('email_lower', 'id')
+        .values_list('email_lower', 'id', 'email')
+    )
+    for email_lower, user_id, email in rows:
+        groups.setdefault(email_lower, []).append(f'{email} (id={user_id})')
+    lines = [', '.join(group) for group in groups.values()]
+    if total > len(lines):
+        lines.append(f'... and {total - len(lines)} more')
+    raise RuntimeError(
+        f'{total} email address(es) are used by several users with different '
+        'letter case. Merge or rename these accounts, then run migrate again:\n  '
+        + '\n  '.join(lines))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_authevent_outboxcursor'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            report_email_collisions, migrations.RunPython.noop,
+            hints={'model_name': 'user'}),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='accounts_user_email_ci_unique'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_user_email_ci_unique'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='devicesession',
+            index=models.Index(condition=models.Q(('revoked', False)), fields=['user', 'last_seen'], name='accounts_ds_user_active_seen'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_devicesession_user_active_seen'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='devicesession',
+            name='browser',
+            field=models.CharField(blank=True, db_index=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='devicesession',
+            name='device_type',
+            field=models.CharField(blank=True, db_index=True, max_length=16),
+        ),
+        migrations.AddField(
+            model_name='devicesession',
+            name='os',
+            field=models.CharField(blank=True, db_index=True, max_length=32),
+        ),
+    ]
@@ -1,6 +1,10 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
-import uuid
+from django.db.models import Value
+from django.db.models.functions import Lower
+from django.db.models.lookups import Lookup
+
+from .sharding import shard_for_session, shard_for_user, uuid7
 
 
 class CustomUserManager(BaseUserManager):
@@ -26,6 +30,10 @@ class CustomUserManager(BaseUserManager):
 
         return self.create_user(email, password, **extra_fields)
 
+    def get_by_natural_key(self, username):
+        # Used by authenticate(); emails match regardless of case
+        return self.get(email__iexact=username)
+
 
 class User(AbstractUser):
     username = None
@@ -37,21 +45,156 @@ class User(AbstractUser):
 
     objects = CustomUserManager()
 
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            models.UniqueConstraint(
+                Lower("email"), name="accounts_user_email_ci_unique"),
+        ]
+
     def __str__(self):
         return self.email
 
 
+class LowerExact(Lookup):
+    """
+    `iexact` as `LOWER(email) = LOWER(%s)`, the expression of the functional
+    unique index. The default `iexact` (`UPPER(...)` / `LIKE`) cannot use it.
+    """
+    lookup_name = "iexact"
+
+    def __init__(self, lhs, rhs):
+        if not hasattr(rhs, "resolve_expression"):
+            rhs = Value(rhs)
+        super().__init__(Lower(lhs), Lower(rhs))
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} = {rhs}", (*lhs_params, *rhs_params)
+
+
+# Index-backed case-insensitive lookups on User.email only, including
+# allauth's `email__iexact` matching; `email__lower` is available as well.
+User._meta.get_field("email").register_lookup(LowerExact)
+User._meta.get_field("email").register_lookup(Lower)
+
+
+class DeviceSessionManager(models.Manager):
+    """
+    Shard-aware lookups; see `accounts.sharding`.
+    """
+
+    def for_user(self, user):
+        return self.using(shard_for_user(user.pk))
+
+    def for_session(self, session_id, user_id=None):
+        alias = shard_for_session(session_id)
+        if alias is None and user_id is not None:
+            alias = shard_for_user(user_id)
+        return self.using(alias) if alias else self.get_queryset()
+
+    def for_token(self, token):
+        """Routes by the token's `sid` claim, falling back to its user id."""
+        from rest_framework_simplejwt.settings import api_settings as jwt_settings
+        return self.for_session(
+            token.get("sid"), token.get(jwt_settings.USER_ID_CLAIM))
+
+
 class DeviceSession(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Time-ordered, and encodes the shard of the row
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    # No FK constraint: rows may live on a shard without the users table.
+    # Deletes still cascade through the ORM (see sharding.delete_user_sessions).
     user = models.ForeignKey(
-        User, on_delete=models.CASCADE, related_name='device_sessions')
+        User, on_delete=models.CASCADE, related_name='device_sessions',
+        db_constraint=False)
     device_name = models.CharField(
         max_length=255, blank=True)  # e.g. "Chrome on macOS"
+    # Parsed from the User-Agent at sign-in (accounts.useragent); families
+    # only, no versions, so they group and index well
+    browser = models.CharField(max_length=32, blank=True, db_index=True)
+    os = models.CharField(max_length=32, blank=True, db_index=True)
+    device_type = models.CharField(max_length=16, blank=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     last_seen = models.DateTimeField(auto_now=True)
     refresh_token_jti = models.CharField(
         max_length=255, null=True, blank=True)  # store current refresh token jti
     revoked = models.BooleanField(default=False)
 
+    objects = DeviceSessionManager()
+
+    class Meta:
+        indexes = [
+            # Active sessions of a user by recency: the session cap's
+            # eviction query and the device-name reuse lookup. Partial, so
+            # revoked sessions do not grow it, and it matches the
+            # `NOT revoked` Django emits for `revoked=False`.
+            models.Index(
+                fields=["user", "last_seen"], condition=models.Q(revoked=False),
+                name="accounts_ds_user_active_seen"),
+        ]
+
     def __str__(self):
         return f"{self.user.email} - {self.device_name}"
+
+
+class RevocationEvent(models.Model):
+    """
+    Durable log of logouts and session revocations, read by nodes catching
+    up after (re)connecting to the revocation broadcast.
+    """
+    jti = models.CharField(max_length=255, blank=True)
+    session_id = models.UUIDField(null=True, blank=True)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def as_message(self):
+        return {
+            "v": self.id,
+            "jti": self.jti or None,
+            "sid": str(self.session_id) if self.session_id else None,
+            "exp": int(self.expires_at.timestamp()),
+        }
+
+    def __str__(self):
+        return f"{self.jti or self.session_id} until {self.expires_at}"
+
+
+class AuthEvent(models.Model):
+    """
+    Append-only audit trail of logins, refreshes, logouts and revocations,
+    written in batches by `accounts.events`. Also the outbox read by event
+    subscribers.
+    """
+    kind = models.CharField(max_length=32)
+    # Plain columns rather than FKs: audit rows outlive users and sessions
+    user_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+    session_id = models.UUIDField(null=True, blank=True)
+    ip = models.GenericIPAddressField(null=True, blank=True)
+    created_at = models.DateTimeField(db_index=True)  # when it happened, not when it was written
+    data = models.JSONField(default=dict, blank=True)
+
+    def as_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "user_id": self.user_id,
+            "session_id": str(self.session_id) if self.session_id else None,
+            "ip": self.ip,
+            "created_at": self.created_at.isoformat(),
+            "data": self.data,
+        }
+
+    def __str__(self):
+        return f"{self.kind} user={self.user_id} at {self.created_at}"
+
+
+class OutboxCursor(models.Model):
+    """
+    Last AuthEvent id delivered to an event subscriber.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} at {self.position}"
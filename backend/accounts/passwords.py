@@ -0,0 +1,66 @@
+"""
+Password validation for registration.
+
+`validate_password()` runs the `AUTH_PASSWORD_VALIDATORS` cheapest first
+and skips the expensive ones (`UserAttributeSimilarityValidator`, which runs
+difflib over every user attribute) once a cheap one has failed; a password
+that is too short or too common is rejected without that work.
+
+`CommonPasswordValidator` keeps the decompressed list in one frozenset per
+process, loaded by the `password_validators` warm-up step instead of inside
+the first registration request.
+"""
+import functools
+import gzip
+
+from django.contrib.auth import password_validation
+from django.core.exceptions import ValidationError
+
+# Validators run only once every cheaper one has passed
+EXPENSIVE_VALIDATORS = (password_validation.UserAttributeSimilarityValidator,)
+
+
+@functools.lru_cache(maxsize=None)
+def load_password_list(path):
+    """Returns the lowercased entries of a (possibly gzipped) password list."""
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return frozenset(line.strip() for line in f)
+    except OSError:
+        with open(path, encoding="utf-8") as f:
+            return frozenset(line.strip() for line in f)
+
+
+class CommonPasswordValidator(password_validation.CommonPasswordValidator):
+    """
+    Django's validator backed by a shared, immutable set. Every instance
+    (and every test building its own) reuses the set loaded for the path.
+    """
+
+    def __init__(self, password_list_path=None):
+        if password_list_path is None:
+            password_list_path = self.DEFAULT_PASSWORD_LIST_PATH
+        self.passwords = load_password_list(str(password_list_path))
+
+
+def get_validator_tiers():
+    """Splits the configured validators into (cheap, expensive)."""
+    validators = password_validation.get_default_password_validators()
+    cheap = [v for v in validators if not isinstance(v, EXPENSIVE_VALIDATORS)]
+    expensive = [v for v in validators if isinstance(v, EXPENSIVE_VALIDATORS)]
+    return cheap, expensive
+
+
+def validate_password(password, user=None):
+    """
+    Raises ValidationError with every failure of the first tier that fails.
+    """
+    for tier in get_validator_tiers():
+        errors = []
+        for validator in tier:
+            try:
+                validator.validate(password, user)
+            except ValidationError as error:
+                errors.append(error)
+        if errors:
+            raise ValidationError(errors)
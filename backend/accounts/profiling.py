@@ -0,0 +1,349 @@
+"""
+Opt-in request profiling and slow-request capture for the `accounts` views.
+
+`ProfilingMiddleware` only looks at requests routed to `accounts.views`:
+
+* A staff user sending the `PROFILING["HEADER"]` header (`X-Profile: 1`),
+  or a request picked at random at `SAMPLE_RATE`, runs under cProfile. The
+  capture is always stored and its id returned in `X-Profile-Id`.
+* With `SLOW_THRESHOLD` set, every request also records its SQL timeline
+  (alias, statement, start offset and duration; never the parameters) and
+  is watched by one background stack sampler thread. Both are thrown away
+  unless the request took longer than the threshold.
+
+With neither a header, a sample nor a threshold the middleware does nothing
+beyond reading the settings. Captures are JSON files in `DIR`, a ring of at
+most `MAX_CAPTURES` files shared by every worker on the host, oldest removed
+first. `manage.py profile_captures` lists and summarizes them.
+"""
+import cProfile
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+
+from .authentication import SessionJWTAuthentication
+
+# Functions kept from a cProfile run, by cumulative and by own time
+TOP_FUNCTIONS = 40
+# Longer statements (bulk inserts) are cut to this many characters
+MAX_SQL_LENGTH = 1000
+# Frames kept from the leaf end of a sampled stack
+MAX_STACK_DEPTH = 80
+
+_PREFIXES = sorted(
+    {path for path in sys.path if path and os.path.isdir(path)}
+    | {str(settings.BASE_DIR)}, key=len, reverse=True)
+
+
+def short_path(filename):
+    """Strips the sys.path entry a source file was imported from."""
+    for prefix in _PREFIXES:
+        if filename.startswith(prefix + os.sep):
+            return filename[len(prefix) + 1:]
+    return filename
+
+
+@lru_cache(maxsize=4096)
+def _frame_label(code):
+    return f"{short_path(code.co_filename)}:{code.co_qualname}"
+
+
+def fold_stack(frame):
+    """Returns a stack as "root;...;leaf" frame labels."""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class QueryTimeline:
+    """
+    `execute_wrapper` that records each query's alias, SQL, start offset
+    from `started` and duration, in milliseconds.
+    """
+
+    def __init__(self, started):
+        self.started = started
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                "alias": context["connection"].alias,
+                "sql": sql[:MAX_SQL_LENGTH],
+                "many": many,
+                "start_ms": round((start - self.started) * 1000, 3),
+                "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+            })
+
+
+class StackSampler:
+    """
+    Samples the stacks of registered threads every `interval` seconds from
+    one daemon thread, counting folded stacks per thread. The thread sleeps
+    while no thread is registered.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._active = {}  # thread ident -> Counter of folded stacks
+        self._lock = threading.Lock()
+        self._busy = threading.Event()
+        self._thread = None
+
+    def start(self, ident):
+        counter = Counter()
+        with self._lock:
+            self._active[ident] = counter
+            self._busy.set()
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="request-sampler", daemon=True)
+                self._thread.start()
+        return counter
+
+    def stop(self, ident):
+        with self._lock:
+            counter = self._active.pop(ident, Counter())
+            if not self._active:
+                self._busy.clear()
+        return counter
+
+    def _run(self):
+        while True:
+            self._busy.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, counter in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        counter[fold_stack(frame)] += 1
+            del frames
+
+
+def profile_stats(profiler, limit=TOP_FUNCTIONS):
+    """
+    The top `limit` functions of a cProfile run by cumulative time and by
+    own time, as dicts with times in milliseconds.
+    """
+    rows = [
+        {
+            "function": f"{short_path(filename)}:{line}({name})",
+            "calls": calls,
+            "own_ms": round(own * 1000, 3),
+            "cumulative_ms": round(cumulative * 1000, 3),
+        }
+        for (filename, line, name), (_, calls, own, cumulative, _)
+        in pstats.Stats(profiler).stats.items()
+    ]
+    top = {row["function"]: row for row in
+           sorted(rows, key=lambda row: -row["cumulative_ms"])[:limit]}
+    for row in sorted(rows, key=lambda row: -row["own_ms"])[:limit]:
+        top.setdefault(row["function"], row)
+    return sorted(top.values(), key=lambda row: -row["cumulative_ms"])
+
+
+class CaptureRing:
+    """
+    At most `capacity` JSON captures in `directory`. Ids start with the
+    capture time in nanoseconds so they sort oldest first; files are
+    written to a temporary name and renamed into place.
+    """
+
+    def __init__(self, directory, capacity):
+        self.directory = directory
+        self.capacity = capacity
+
+    def _path(self, capture_id):
+        return os.path.join(self.directory, f"{capture_id}.json")
+
+    def ids(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-5] for name in names if name.endswith(".json"))
+
+    def save(self, capture):
+        os.makedirs(self.directory, exist_ok=True)
+        capture_id = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        capture = {"id": capture_id, **capture}
+        path = self._path(capture_id)
+        partial = f"{path}.{os.getpid()}.tmp"
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump(capture, f, separators=(",", ":"))
+        os.replace(partial, path)
+        for old in self.ids()[:-self.capacity]:
+            self.delete(old)
+        return capture_id
+
+    def load(self, capture_id):
+        with open(self._path(capture_id), encoding="utf-8") as f:
+            return json.load(f)
+
+    def delete(self, capture_id):
+        try:
+            os.remove(self._path(capture_id))
+        except FileNotFoundError:
+            pass  # removed by another worker
+
+    def __iter__(self):
+        for capture_id in self.ids():
+            try:
+                yield self.load(capture_id)
+            except FileNotFoundError:
+                continue
+
+
+def get_ring():
+    conf = settings.PROFILING
+    return CaptureRing(conf["DIR"], conf["MAX_CAPTURES"])
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler():
+    global _sampler
+    if _sampler is None:
+        with _sampler_lock:
+            if _sampler is None:
+                _sampler = StackSampler(settings.PROFILING["SAMPLER_INTERVAL"])
+    return _sampler
+
+
+class ProfiledRequest:
+    """
+    The SQL timeline and profile of one request. `trigger` is "header" or
+    "sample" for a cProfile run, None when only watching for slowness.
+    """
+
+    def __init__(self, trigger):
+        self.trigger = trigger
+        self.started_at = datetime.now(timezone.utc)
+        self.started = time.perf_counter()
+        self.timeline = QueryTimeline(self.started)
+        self._wrappers = ExitStack()
+        for alias in connections:
+            self._wrappers.enter_context(connections[alias].execute_wrapper(self.timeline))
+        self.profiler = None
+        self.samples = None
+        if trigger:
+            self.profiler = cProfile.Profile()
+            try:
+                self.profiler.enable()
+            except ValueError:
+                self.profiler = None  # another thread is profiling (3.12+)
+        if self.profiler is None:
+            self.samples = get_sampler().start(threading.get_ident())
+
+    def stop(self):
+        """Stops profiling and returns the request's duration in seconds."""
+        duration = time.perf_counter() - self.started
+        if self.profiler is not None:
+            self.profiler.disable()
+        else:
+            get_sampler().stop(threading.get_ident())
+        self._wrappers.close()
+        return duration
+
+    def capture(self, request, response, duration):
+        if self.profiler is not None:
+            profile = {"kind": "cprofile", "functions": profile_stats(self.profiler)}
+        else:
+            profile = {
+                "kind": "sampler",
+                "interval_ms": settings.PROFILING["SAMPLER_INTERVAL"] * 1000,
+                "stacks": dict(self.samples.most_common()),
+            }
+        return {
+            "trigger": self.trigger or "slow",
+            "started_at": self.started_at.isoformat(),
+            "method": request.method,
+            "path": request.path,
+            "url_name": request.resolver_match.url_name,
+            "status": response.status_code,
+            "duration_ms": round(duration * 1000, 3),
+            "queries": self.timeline.queries,
+            "profile": profile,
+        }
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests to the `accounts` views as configured in
+    `settings.PROFILING`. Goes after AuthenticationMiddleware and last in
+    the list, so the profile covers the view and nothing else.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            run = getattr(request, "_profiling", None)
+            if run is not None:
+                run.stop()
+            raise
+        run = getattr(request, "_profiling", None)
+        if run is None:
+            return response
+        duration = run.stop()
+        threshold = settings.PROFILING["SLOW_THRESHOLD"]
+        if run.trigger or (threshold and duration >= threshold):
+            capture_id = get_ring().save(run.capture(request, response, duration))
+            if run.trigger == "header":
+                response["X-Profile-Id"] = capture_id
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        conf = settings.PROFILING
+        if not conf["ENABLED"] or not getattr(
+                view_func, "__module__", "").startswith("accounts."):
+            return None
+        trigger = None
+        if request.headers.get(conf["HEADER"]) and self.is_staff(request):
+            trigger = "header"
+        elif conf["SAMPLE_RATE"] and random.random() < conf["SAMPLE_RATE"]:
+            trigger = "sample"
+        elif not conf["SLOW_THRESHOLD"]:
+            return None
+        request._profiling = ProfiledRequest(trigger)
+        return None
+
+    def is_staff(self, request):
+        """
+        Whether the request comes from staff, by session or by access token.
+        Only asked when the header is present, so the extra token check
+        costs nothing on normal traffic.
+        """
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return user.is_staff
+        try:
+            result = SessionJWTAuthentication().authenticate(Request(request))
+        except APIException:
+            return False
+        return result is not None and result[0].is_staff
@@ -0,0 +1,450 @@
+"""
+Revocation broadcast.
+
+Every node keeps a local, expiring set of revoked refresh-token JTIs and
+session ids so it can reject revoked tokens without a database lookup.
+Revocations from `LogoutView`, `SessionRevokeView` and refresh rotation are
+published on a broker and applied by every node; when a node (re)connects it
+catches up on revocations that have not expired yet.
+
+The set is exact: a Bloom filter would save a little memory but its false
+positives would reject valid tokens, and a dict lookup is already O(1).
+
+Brokers:
+
+* `InProcessBroker` delivers within the current process (default; tests).
+* `LocalSocketBroker` fans out over Unix datagram sockets in a directory,
+  for several processes on one host.
+* `RedisBroker` uses Redis pub/sub, plus a sorted set of unexpired
+  revocations for catch-up without a database.
+
+The classes below import nothing from Django, so processes that do not load
+the ORM can reuse them. Only the module-level helpers at the bottom do.
+"""
+import heapq
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class RevokedSet:
+    """
+    Set of keys that drop out on their own once their expiry has passed.
+    """
+
+    def __init__(self):
+        self._expiry = {}
+        self._heap = []
+        self._lock = threading.Lock()
+
+    def add(self, key, expires_at):
+        with self._lock:
+            if expires_at > self._expiry.get(key, 0):
+                self._expiry[key] = expires_at
+                heapq.heappush(self._heap, (expires_at, key))
+            self._purge(time.time())
+
+    def __contains__(self, key):
+        expires_at = self._expiry.get(key)
+        return expires_at is not None and expires_at > time.time()
+
+    def __len__(self):
+        return len(self._expiry)
+
+    def purge(self):
+        with self._lock:
+            self._purge(time.time())
+
+    def _purge(self, now):
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            expires_at, key = heapq.heappop(heap)
+            if self._expiry.get(key) == expires_at:
+                del self._expiry[key]
+
+
+def encode(message):
+    return json.dumps(message, separators=(",", ":")).encode()
+
+
+def decode(payload):
+    return json.loads(payload)
+
+
+# === BROKERS ===
+class InProcessBroker:
+    """
+    Delivers messages to subscribers in the same process.
+    """
+    channels = {}
+
+    def __init__(self, channel="auth:revocations"):
+        self.channel = channel
+        self._callback = None
+
+    def publish(self, message):
+        for callback in list(self.channels.get(self.channel, ())):
+            callback(message)
+
+    def subscribe(self, callback, on_connect=None):
+        self.channels.setdefault(self.channel, []).append(callback)
+        self._callback = callback
+        if on_connect:
+            on_connect()
+
+    def close(self):
+        subscribers = self.channels.get(self.channel, [])
+        if self._callback in subscribers:
+            subscribers.remove(self._callback)
+
+
+class LocalSocketBroker:
+    """
+    Fans messages out to every subscriber socket found in `path`. Each
+    subscriber binds its own Unix datagram socket there; sockets left behind
+    by dead processes are removed on the next publish.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._socket = None
+        self._address = None
+        self._stopped = threading.Event()
+
+    def publish(self, message):
+        payload = encode(message)
+        sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            for name in os.listdir(self.path):
+                if not name.endswith(".sock"):
+                    continue
+                address = os.path.join(self.path, name)
+                try:
+                    sender.sendto(payload, address)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    self._unlink(address)
+        finally:
+            sender.close()
+
+    def subscribe(self, callback, on_connect=None):
+        os.makedirs(self.path, exist_ok=True)
+        self._address = os.path.join(
+            self.path, f"{os.getpid()}-{uuid.uuid4().hex[:8]}.sock")
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.bind(self._address)
+        self._socket.settimeout(0.5)
+        threading.Thread(
+            target=self._listen, args=(callback,),
+            name="revocation-socket", daemon=True).start()
+        if on_connect:
+            on_connect()
+
+    def _listen(self, callback):
+        while not self._stopped.is_set():
+            try:
+                payload = self._socket.recv(65536)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            try:
+                callback(decode(payload))
+            except Exception:
+                logger.exception("Invalid revocation message")
+
+    def close(self):
+        self._stopped.set()
+        if self._socket:
+            self._socket.close()
+            self._unlink(self._address)
+
+    @staticmethod
+    def _unlink(address):
+        try:
+            os.unlink(address)
+        except FileNotFoundError:
+            pass
+
+
+class RedisBroker:
+    """
+    Redis pub/sub with reconnects. Every publish is also added to a sorted
+    set scored by expiry, which `backlog()` reads for catch-up.
+    """
+
+    def __init__(self, url, channel="auth:revocations", reconnect_delay=1.0):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.channel = channel
+        self.log_key = f"{channel}:log"
+        self.reconnect_delay = reconnect_delay
+        self._stopped = threading.Event()
+
+    def publish(self, message):
+        payload = encode(message)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zadd(self.log_key, {payload: message["exp"]})
+        pipe.zremrangebyscore(self.log_key, "-inf", time.time())
+        pipe.publish(self.channel, payload)
+        pipe.execute()
+
+    def backlog(self):
+        """Returns every revocation that has not expired yet."""
+        return [decode(payload) for payload in
+                self.client.zrangebyscore(self.log_key, time.time(), "+inf")]
+
+    def subscribe(self, callback, on_connect=None):
+        threading.Thread(
+            target=self._listen, args=(callback, on_connect),
+            name="revocation-redis", daemon=True).start()
+
+    def _listen(self, callback, on_connect):
+        while not self._stopped.is_set():
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.channel)
+                # Catch up only once subscribed, so nothing published in
+                # between is missed.
+                if on_connect:
+                    on_connect()
+                while not self._stopped.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message:
+                        callback(decode(message["data"]))
+            except Exception:
+                logger.warning(
+                    "Revocation channel lost, reconnecting", exc_info=True)
+                self._stopped.wait(self.reconnect_delay)
+            finally:
+                pubsub.close()
+
+    def close(self):
+        self._stopped.set()
+
+
+class RevocationRegistry:
+    """
+    A node's view of revoked refresh-token JTIs and session ids, kept
+    current by the broker.
+    """
+
+    def __init__(self, broker, catch_up=None):
+        self.broker = broker
+        self.jtis = RevokedSet()
+        self.sessions = RevokedSet()
+        self._catch_up = catch_up
+        # Highest durable revocation ("v") applied, for delta syncs
+        self.version = 0
+        self.change_counter = None
+        self.checked_at = 0.0
+        self.synced_at = time.monotonic()
+        self.pruned_at = time.monotonic()
+        self._sync_lock = threading.Lock()
+
+    def start(self):
+        self.broker.subscribe(self.apply, on_connect=self.catch_up)
+        return self
+
+    def catch_up(self):
+        messages = self._catch_up() if self._catch_up else []
+        if hasattr(self.broker, "backlog"):
+            messages = list(messages) + self.broker.backlog()
+        for message in messages:
+            self.apply(message)
+
+    def apply(self, message):
+        if message.get("v"):
+            self.version = max(self.version, message["v"])
+        if message.get("jti"):
+            self.jtis.add(message["jti"], message["exp"])
+        if message.get("sid"):
+            self.sessions.add(message["sid"], message["exp"])
+
+    def publish(self, message):
+        # Apply locally first so this node never waits on the round trip.
+        self.apply(message)
+        try:
+            self.broker.publish(message)
+        except Exception:
+            logger.exception("Could not broadcast revocation")
+
+    def is_revoked(self, jti=None, sid=None):
+        return bool(jti and jti in self.jtis) or bool(sid and sid in self.sessions)
+
+
+# === DJANGO INTEGRATION ===
+# Cache key bumped on every durable revocation; see `sync()`.
+CHANGE_COUNTER_KEY = "auth:revocation:changes"
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """
+    Returns this process's registry, creating and subscribing it on first
+    use with the broker configured in `REVOCATION_BROADCAST`.
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                from django.conf import settings
+                from django.utils.module_loading import import_string
+
+                conf = settings.REVOCATION_BROADCAST
+                broker = import_string(conf["BROKER"])(**conf.get("OPTIONS", {}))
+                _registry = RevocationRegistry(
+                    broker, catch_up=load_unexpired).start()
+    return _registry
+
+
+def load_unexpired():
+    """
+    Durable revocations that have not expired yet, for catch-up.
+    """
+    from django.db import connection
+    from django.utils import timezone
+    from .models import RevocationEvent
+
+    try:
+        events = RevocationEvent.objects.filter(expires_at__gt=timezone.now())
+        return [event.as_message() for event in events.iterator()]
+    finally:
+        # Broker listener threads ("revocation-*") outlive any request, so
+        # they must not keep a connection open between reconnects.
+        if threading.current_thread().name.startswith("revocation-"):
+            connection.close()
+
+
+def load_since(version, overlap):
+    """
+    Unexpired durable revocations recorded after `version`. Ids are
+    allocated before commit, so a lower id can become visible after a
+    higher one; the last `overlap` seconds are therefore always read again.
+    """
+    from datetime import timedelta
+    from django.db.models import Q
+    from django.utils import timezone
+    from .models import RevocationEvent
+
+    now = timezone.now()
+    since = now - timedelta(seconds=overlap)
+    events = RevocationEvent.objects.filter(
+        Q(id__gt=version) | Q(created_at__gte=since), expires_at__gt=now)
+    return [event.as_message() for event in events]
+
+
+def prune():
+    """
+    Deletes durable revocations whose tokens have expired: they can no
+    longer be presented, and catch-up skips them anyway. Returns the number
+    of rows deleted.
+    """
+    from django.utils import timezone
+    from .models import RevocationEvent
+
+    deleted, _ = RevocationEvent.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
+
+
+def sync():
+    """
+    Brings this node up to date with revocations recorded by other nodes,
+    for deployments where the broadcast may be lossy or absent. Cheap enough
+    for every request: at most once per `INTERVAL` it reads a change counter
+    from the shared cache, and it queries the database only when that
+    counter moved or `MAX_STALENESS` seconds have passed. Every
+    `PRUNE_INTERVAL` seconds it also deletes expired rows.
+    """
+    from django.conf import settings
+    from django.core.cache import cache
+
+    registry = get_registry()
+    conf = settings.REVOCATION_SYNC
+    now = time.monotonic()
+    if now - registry.checked_at < conf["INTERVAL"]:
+        return
+    if not registry._sync_lock.acquire(blocking=False):
+        return  # another thread is syncing
+    try:
+        registry.checked_at = now
+        if conf.get("PRUNE_INTERVAL") and now - registry.pruned_at >= conf["PRUNE_INTERVAL"]:
+            registry.pruned_at = now
+            prune()
+        counter = cache.get(CHANGE_COUNTER_KEY)
+        if (counter == registry.change_counter
+                and now - registry.synced_at < conf["MAX_STALENESS"]):
+            return
+        for message in load_since(registry.version, conf["OVERLAP"]):
+            registry.apply(message)
+        registry.change_counter = counter
+        registry.synced_at = now
+    finally:
+        registry._sync_lock.release()
+
+
+def _bump_change_counter():
+    from django.core.cache import cache
+
+    try:
+        cache.incr(CHANGE_COUNTER_KEY)
+    except ValueError:
+        cache.set(CHANGE_COUNTER_KEY, 1, timeout=None)
+
+
+def revoke(jti=None, session_id=None, expires_at=None, durable=True):
+    """
+    Records a revocation and broadcasts it once the surrounding transaction
+    commits. `expires_at` is a Unix timestamp; it defaults to the refresh
+    token lifetime. Non-durable revocations are only broadcast, for tokens
+    the database already rejects on its own (e.g. rotated refresh tokens).
+    """
+    revoke_many([(jti, session_id, expires_at)], durable=durable)
+
+
+def revoke_many(revocations, durable=True):
+    """
+    `revoke()` for several `(jti, session_id, expires_at)` tuples, written
+    with a single INSERT.
+    """
+    from datetime import datetime, timezone as dt_timezone
+    from django.db import transaction
+    from rest_framework_simplejwt.settings import api_settings
+    from .models import RevocationEvent
+
+    default_expiry = time.time() + api_settings.REFRESH_TOKEN_LIFETIME.total_seconds()
+    messages = [
+        {"jti": jti, "sid": str(session_id) if session_id else None,
+         "exp": int(expires_at or default_expiry)}
+        for jti, session_id, expires_at in revocations
+    ]
+    if not messages:
+        return
+    if durable:
+        events = RevocationEvent.objects.bulk_create([
+            RevocationEvent(
+                jti=message["jti"] or "", session_id=message["sid"],
+                expires_at=datetime.fromtimestamp(message["exp"], tz=dt_timezone.utc))
+            for message in messages
+        ])
+        for message, event in zip(messages, events):
+            message["v"] = event.id
+        transaction.on_commit(_bump_change_counter)
+
+    def publish():
+        registry = get_registry()
+        for message in messages:
+            registry.publish(message)
+    transaction.on_commit(publish)
+
+
+def is_revoked(jti=None, sid=None):
+    return get_registry().is_revoked(jti=jti, sid=sid)
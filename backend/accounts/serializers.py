@@ -1,5 +1,10 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
+
+from .export import FORMATS, resolve_user
 from .models import User, DeviceSession
+from .passwords import validate_password
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -11,22 +16,69 @@ class UserSerializer(serializers.ModelSerializer):
 class RegisterSerializer(serializers.ModelSerializer):
     """
     Used for creating a new user.
+
+    Email uniqueness is left to the unique index on LOWER(email): a taken
+    address fails the INSERT instead of costing a SELECT on every
+    registration.
     """
     password = serializers.CharField(write_only=True, min_length=8)
 
     class Meta:
         model = User
         fields = ["email", "name", "password"]
+        extra_kwargs = {"email": {"validators": []}}
+
+    def validate(self, attrs):
+        user = User(email=attrs["email"], name=attrs.get("name", ""))
+        try:
+            validate_password(attrs["password"], user)
+        except DjangoValidationError as error:
+            raise serializers.ValidationError({"password": list(error.messages)})
+        return attrs
 
     def create(self, validated_data):
         password = validated_data.pop("password")
         user = User(**validated_data)
         user.set_password(password)
-        user.save()
+        try:
+            with transaction.atomic():
+                user.save(force_insert=True)
+        except IntegrityError:
+            raise serializers.ValidationError(
+                {"email": ["user with this email already exists."]})
         return user
 
 
 class DeviceSessionSerializer(serializers.ModelSerializer):
     class Meta:
         model = DeviceSession
-        fields = ["id", "device_name", "created_at", "last_seen", "revoked"]
+        fields = [
+            "id", "device_name", "browser", "os", "device_type",
+            "created_at", "last_seen", "revoked",
+        ]
+
+
+class ExportQuerySerializer(serializers.Serializer):
+    """
+    Output format and filters of a session or user export (accounts.export).
+    Pass `context={"kind": ...}`; only session exports take `revoked`.
+    """
+    output = serializers.ChoiceField(choices=sorted(FORMATS), default="csv")
+    user = serializers.CharField(required=False)
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+    revoked = serializers.BooleanField(required=False, allow_null=True, default=None)
+
+    def validate_user(self, value):
+        user_id = resolve_user(value)
+        if user_id is None:
+            raise serializers.ValidationError("No such user.")
+        return user_id
+
+    def validate(self, attrs):
+        if attrs.get("since") and attrs.get("until") and attrs["since"] >= attrs["until"]:
+            raise serializers.ValidationError({"until": ["Must be after since."]})
+        if self.context.get("kind") != "sessions" and attrs.get("revoked") is not None:
+            raise serializers.ValidationError({"revoked": ["Only sessions can be filtered by revoked."]})
+        attrs["user_id"] = attrs.pop("user", None)
+        return attrs
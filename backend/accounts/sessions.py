@@ -0,0 +1,123 @@
+"""
+Device session lifecycle shared by the login, registration and social
+login views.
+"""
+from django.conf import settings
+from django.db import transaction
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken, OutstandingToken)
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import events, revocation
+from .models import DeviceSession
+from .sharding import new_session_id
+from .useragent import UNKNOWN
+
+# Claim carrying the DeviceSession id; copied into every access token and
+# kept across refresh rotation.
+SESSION_ID_CLAIM = "sid"
+
+# Ids per IN (...) clause when evicting a large backlog of sessions
+_CHUNK_SIZE = 500
+
+
+def start_session(user, device_name, device=UNKNOWN, fallback_name="Unknown Device"):
+    """
+    Creates a DeviceSession for the user and returns it with its refresh
+    token. `device` is the `useragent.DeviceInfo` of the request. The
+    token carries the session id, so access tokens minted from it can be
+    checked against revoked sessions without a database lookup.
+
+    `device_name` is the name sent by the client, if any. Without one the
+    session is named after `device`, or `fallback_name` when nothing is
+    known about it.
+
+    `DEVICE_SESSIONS` can make this reuse the user's active session with the
+    same client-supplied device name (rotating its refresh token) and cap
+    the number of active sessions: the least recently seen ones past the cap
+    are revoked, their refresh tokens blacklisted, in the same transaction.
+    Derived and fallback names, and those in `GENERIC_NAMES`, are shared by
+    unrelated devices, so they never select a session to reuse.
+    """
+    conf = settings.DEVICE_SESSIONS
+    sessions = DeviceSession.objects.for_user(user)
+    # Sessions may live on a shard; the blacklist and revocation log do not
+    with transaction.atomic(), transaction.atomic(using=sessions.db):
+        active = sessions.select_for_update().filter(user=user, revoked=False)
+        if conf["REUSE_BY_DEVICE_NAME"] and _identifies_device(device_name, device, conf):
+            session = active.filter(
+                device_name=device_name).order_by("-last_seen").first()
+            if session is not None:
+                return session, _rotate(session, user, device)
+        if conf["MAX_ACTIVE"]:
+            _evict(active, user, keep=conf["MAX_ACTIVE"] - 1)
+
+        session = DeviceSession(
+            id=new_session_id(user.pk), user=user,
+            device_name=device_name or device.label or fallback_name,
+            browser=device.browser, os=device.os, device_type=device.device_type)
+        refresh = _issue(user, session)
+        session.save(force_insert=True)  # routed to the user's shard
+    return session, refresh
+
+
+def _identifies_device(device_name, device, conf):
+    return bool(device_name) and device_name != device.label and (
+        device_name not in conf.get("GENERIC_NAMES", ()))
+
+
+def _issue(user, session):
+    refresh = RefreshToken.for_user(user)
+    refresh[SESSION_ID_CLAIM] = str(session.id)
+    session.refresh_token_jti = str(refresh["jti"])
+    return refresh
+
+
+def _rotate(session, user, device):
+    old_jti = session.refresh_token_jti
+    refresh = _issue(user, session)
+    session.browser, session.os, session.device_type = device
+    session.save(update_fields=[
+        "refresh_token_jti", "last_seen", "browser", "os", "device_type"])
+    if old_jti:
+        expiry = _blacklist([old_jti])
+        # The blacklist rejects the old token; just tell the other nodes
+        revocation.revoke(jti=old_jti, expires_at=expiry.get(old_jti), durable=False)
+    return refresh
+
+
+def _evict(active, user, keep):
+    """
+    Revokes every active session but the `keep` most recently seen.
+    """
+    evicted = list(
+        active.order_by("-last_seen").values_list("id", "refresh_token_jti")[keep:])
+    if not evicted:
+        return
+    for start in range(0, len(evicted), _CHUNK_SIZE):
+        ids = [session_id for session_id, _ in evicted[start:start + _CHUNK_SIZE]]
+        DeviceSession.objects.using(active.db).filter(id__in=ids).update(revoked=True)
+
+    expiry = _blacklist([jti for _, jti in evicted if jti])
+    revocation.revoke_many(
+        [(jti, session_id, expiry.get(jti)) for session_id, jti in evicted])
+    for session_id, _ in evicted:
+        events.record(events.REVOKE, user_id=user.pk, session_id=session_id,
+                      reason="evicted")
+
+
+def _blacklist(jtis):
+    """
+    Blacklists the outstanding refresh tokens with these JTIs and returns
+    their expiry times as Unix timestamps.
+    """
+    expiry = {}
+    for start in range(0, len(jtis), _CHUNK_SIZE):
+        tokens = list(OutstandingToken.objects.filter(
+            jti__in=jtis[start:start + _CHUNK_SIZE]))
+        BlacklistedToken.objects.bulk_create(
+            [BlacklistedToken(token=token) for token in tokens],
+            ignore_conflicts=True)
+        expiry.update(
+            (token.jti, token.expires_at.timestamp()) for token in tokens)
+    return expiry
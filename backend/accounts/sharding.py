@@ -0,0 +1,121 @@
+"""
+Optional horizontal sharding of DeviceSession.
+
+`DEVICE_SESSION_SHARDS` lists the database aliases that hold session rows.
+A user's sessions live on `shards[user_id % len(shards)]`. Session ids are
+time-ordered UUIDv7s (so inserts land at the right edge of the primary-key
+index) with the shard index in the 12 `rand_a` bits, so a session id or a
+token's `sid` claim routes to its shard without a directory lookup.
+
+With the default single `"default"` shard this module changes nothing but
+the id format.
+"""
+import os
+import time
+import uuid
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_SHARD_BITS = 12
+
+
+def shard_aliases():
+    return settings.DEVICE_SESSION_SHARDS
+
+
+def is_sharded():
+    return shard_aliases() != [DEFAULT_DB_ALIAS]
+
+
+def shard_for_user(user_id):
+    shards = shard_aliases()
+    return shards[int(user_id) % len(shards)]
+
+
+def uuid7(shard_index=0):
+    """
+    Returns a UUIDv7 (RFC 9562): 48-bit Unix milliseconds, version, 12 bits
+    carrying the shard index, variant, 62 random bits.
+    """
+    millis = time.time_ns() // 1_000_000
+    value = (millis & ((1 << 48) - 1)) << 80
+    value |= 0x7 << 76
+    value |= (shard_index & ((1 << _SHARD_BITS) - 1)) << 64
+    value |= 0b10 << 62
+    value |= int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    return uuid.UUID(int=value)
+
+
+def new_session_id(user_id):
+    return uuid7(shard_aliases().index(shard_for_user(user_id)))
+
+
+def shard_for_session(session_id):
+    """
+    Returns the alias encoded in a session id, or None for ids that carry
+    no shard (UUID4 ids from before sharding, or malformed values).
+    """
+    try:
+        value = session_id if isinstance(session_id, uuid.UUID) else uuid.UUID(str(session_id))
+    except ValueError:
+        return None
+    if value.version != 7:
+        return None
+    index = (value.int >> 64) & ((1 << _SHARD_BITS) - 1)
+    shards = shard_aliases()
+    return shards[index] if index < len(shards) else None
+
+
+class DeviceSessionRouter:
+    """
+    Sends DeviceSession queries to the shard of the user they belong to and
+    keeps every other model on the default database. Queries without an
+    instance hint should go through `DeviceSession.objects.for_user()` /
+    `for_session()` / `for_token()`, which pick the alias up front.
+    """
+
+    def _is_session_model(self, model):
+        return model._meta.label == "accounts.DeviceSession"
+
+    def _route(self, model, hints):
+        if not is_sharded():
+            return None
+        if not self._is_session_model(model):
+            return DEFAULT_DB_ALIAS
+        instance = hints.get("instance")
+        if instance is None:
+            return None
+        if self._is_session_model(type(instance)):
+            user_id = instance.user_id
+        else:
+            user_id = instance.pk  # related manager, e.g. user.device_sessions
+        return shard_for_user(user_id) if user_id is not None else None
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if self._is_session_model(type(obj1)) or self._is_session_model(type(obj2)):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == DEFAULT_DB_ALIAS or db not in shard_aliases():
+            return None
+        # Dedicated shard databases hold nothing but session rows
+        return app_label == "accounts" and model_name == "devicesession"
+
+
+def delete_user_sessions(sender, instance, **kwargs):
+    """
+    pre_delete handler for users: the ORM cascade only looks at the user's
+    own database, so sessions on another shard are deleted here.
+    """
+    alias = shard_for_user(instance.pk)
+    if is_sharded() and alias != kwargs.get("using"):
+        instance.device_sessions.model.objects.using(alias).filter(
+            user_id=instance.pk).delete()
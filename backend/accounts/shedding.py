@@ -0,0 +1,190 @@
+"""
+Priority-aware load shedding.
+
+Login, registration and Google sign-in spend most of their time in Argon2
+or a remote call. Under a login spike they take the worker threads that
+cheap refresh, me and logout requests need, and every endpoint slows down
+together. `LoadSheddingMiddleware` gives each URL name in
+`LOAD_SHEDDING["ROUTES"]` an adaptive concurrency limit. A request over its
+route's limit gets a 503 with `Retry-After` before the view runs.
+
+Limits follow AIMD (additive increase, multiplicative decrease):
+
+* A request that finishes within its route's latency target, while the
+  route was using at least half its limit, raises that limit by one.
+* A slower request multiplies a limit by `BACKOFF`, at most once per target
+  interval. The decrease goes to the lowest priority that can still give.
+  When refresh slows down because logins hog the CPU, the login, register
+  and Google limits shrink. A protected route's own limit shrinks only once
+  every lower priority is at its minimum.
+
+Routes not listed (admin, health checks) are never limited. Limits and
+counters are per process, so this needs threaded workers (e.g. gunicorn
+`--threads`), where several requests are in flight at once.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.http import JsonResponse
+
+
+class AIMDLimit:
+    """
+    Concurrency limit and counters of one route. Not thread-safe on its
+    own; `LoadShedder` holds the lock.
+    """
+
+    def __init__(self, name, priority, target, initial, minimum, maximum):
+        self.name = name
+        self.priority = priority
+        self.target = target
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(initial)
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed = 0
+        self.slow = 0
+        self.latency = None  # moving average, seconds
+        self.decreased_at = float("-inf")
+
+    def can_decrease(self, now):
+        return self.limit > self.minimum and now - self.decreased_at >= self.target
+
+    def decrease(self, backoff, now):
+        self.limit = max(float(self.minimum), self.limit * backoff)
+        self.decreased_at = now
+
+    def increase(self):
+        self.limit = min(float(self.maximum), self.limit + 1)
+
+    def snapshot(self):
+        return {
+            "priority": self.priority,
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "slow": self.slow,
+            "latency_ms": None if self.latency is None else round(self.latency * 1000, 1),
+            "target_ms": round(self.target * 1000, 1),
+        }
+
+
+class LoadShedder:
+    """
+    The limits of every route. `routes` maps a URL name to a dict with
+    `PRIORITY` (higher is protected longer) and `TARGET` latency in
+    seconds; `limits` holds the `INITIAL`, `MIN` and `MAX` concurrency.
+    """
+
+    def __init__(self, routes, limits, backoff=0.75):
+        self.limits = {
+            name: AIMDLimit(
+                name, route["PRIORITY"], route["TARGET"],
+                initial=route.get("INITIAL", limits["INITIAL"]),
+                minimum=route.get("MIN", limits["MIN"]),
+                maximum=route.get("MAX", limits["MAX"]))
+            for name, route in routes.items()
+        }
+        self.backoff = backoff
+        self._lock = threading.Lock()
+
+    def acquire(self, name):
+        """
+        Admits a request for route `name` if the route is under its limit.
+        Returns whether it was admitted; an admitted request must be
+        `release()`d.
+        """
+        route = self.limits[name]
+        with self._lock:
+            if route.in_flight >= int(route.limit):
+                route.shed += 1
+                return False
+            route.in_flight += 1
+            route.admitted += 1
+            return True
+
+    def release(self, name, seconds):
+        route = self.limits[name]
+        with self._lock:
+            busy = route.in_flight >= route.limit / 2
+            route.in_flight -= 1
+            route.latency = seconds if route.latency is None else (
+                0.9 * route.latency + 0.1 * seconds)
+            if seconds <= route.target:
+                if busy:
+                    route.increase()
+                return
+            route.slow += 1
+            self._overloaded(route, time.monotonic())
+
+    def _overloaded(self, route, now):
+        lower = sorted({other.priority for other in self.limits.values()
+                        if other.priority < route.priority})
+        for priority in lower:
+            givers = [other for other in self.limits.values()
+                      if other.priority == priority and other.limit > other.minimum]
+            if givers:
+                for other in givers:
+                    if other.can_decrease(now):
+                        other.decrease(self.backoff, now)
+                return
+        if route.can_decrease(now):
+            route.decrease(self.backoff, now)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: route.snapshot() for name, route in self.limits.items()}
+
+
+_shedder = None
+_shedder_lock = threading.Lock()
+
+
+def get_shedder():
+    global _shedder
+    if _shedder is None:
+        with _shedder_lock:
+            if _shedder is None:
+                conf = settings.LOAD_SHEDDING
+                _shedder = LoadShedder(
+                    conf["ROUTES"], conf["LIMITS"], backoff=conf["BACKOFF"])
+    return _shedder
+
+
+class LoadSheddingMiddleware:
+    """
+    Applies the route limits. Runs in `process_view`, once the URL name is
+    known and before the CSRF check or the view do any work.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            admitted = getattr(request, "_load_shedding", None)
+            if admitted is not None:
+                name, started = admitted
+                get_shedder().release(name, time.monotonic() - started)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        conf = settings.LOAD_SHEDDING
+        if not conf["ENABLED"]:
+            return None
+        shedder = get_shedder()
+        name = request.resolver_match.url_name
+        if name not in shedder.limits:
+            return None
+        if not shedder.acquire(name):
+            response = JsonResponse(
+                {"detail": "Server is busy, please retry later."},
+                status=conf["STATUS"])
+            response["Retry-After"] = str(conf["RETRY_AFTER"])
+            return response
+        request._load_shedding = (name, time.monotonic())
+        return None
@@ -0,0 +1,110 @@
+"""
+Cold-start probe used by the `startup_profile` management command.
+
+Run in a fresh interpreter (``python -X importtime -m accounts.startup``) so
+that every import is paid for again. It times each Django setup phase per
+installed app, the WSGI handler construction and the first two requests,
+then prints a JSON report on the last line of stdout.
+"""
+import json
+import os
+import sys
+import time
+from wsgiref.util import setup_testing_defaults
+
+
+def _timed(timings, key, func):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings[key] = timings.get(key, 0.0) + time.perf_counter() - start
+    return wrapper
+
+
+def _instrument_app_registry(apps_timings):
+    """
+    Wrap AppConfig.create so each app's import, models import and ready()
+    are timed individually while `django.setup()` runs.
+    """
+    from django.apps import AppConfig
+
+    original_create = AppConfig.create.__func__
+
+    def create(cls, entry):
+        start = time.perf_counter()
+        app_config = original_create(cls, entry)
+        timings = apps_timings.setdefault(app_config.name, {})
+        timings["import"] = time.perf_counter() - start
+        app_config.import_models = _timed(
+            timings, "models", app_config.import_models)
+        app_config.ready = _timed(timings, "ready", app_config.ready)
+        return app_config
+
+    AppConfig.create = classmethod(create)
+    return lambda: setattr(AppConfig, "create", classmethod(original_create))
+
+
+def _request(application, path, host):
+    environ = {"PATH_INFO": path, "HTTP_HOST": host, "SERVER_NAME": host}
+    setup_testing_defaults(environ)
+    status = []
+
+    def start_response(status_line, headers, exc_info=None):
+        status.append(int(status_line.split()[0]))
+
+    start = time.perf_counter()
+    body = application(environ, start_response)
+    try:
+        for _ in body:
+            pass
+    finally:
+        if hasattr(body, "close"):
+            body.close()
+    return time.perf_counter() - start, status[0]
+
+
+def probe(path="/api/auth/me"):
+    report = {"phases": {}, "apps": {}}
+    phases = report["phases"]
+
+    start = time.perf_counter()
+    import django
+    from django.conf import settings
+    phases["import_django"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    settings.INSTALLED_APPS  # force the settings module import
+    phases["settings"] = time.perf_counter() - start
+
+    restore = _instrument_app_registry(report["apps"])
+    start = time.perf_counter()
+    try:
+        django.setup(set_prefix=False)
+    finally:
+        restore()
+    phases["setup"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    from django.core.wsgi import get_wsgi_application
+    application = get_wsgi_application()
+    phases["wsgi_handler"] = time.perf_counter() - start
+
+    hosts = [h for h in settings.ALLOWED_HOSTS if h and "*" not in h]
+    host = hosts[0].lstrip(".") if hosts else "localhost"
+    phases["first_request"], report["status"] = _request(
+        application, path, host)
+    phases["second_request"], _ = _request(application, path, host)
+
+    report["path"] = path
+    report["time_to_first_request"] = sum(
+        phases[key] for key in ("import_django", "settings", "setup",
+                                "wsgi_handler", "first_request"))
+    return report
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "auth_service.settings")
+    result = probe(*sys.argv[1:2])
+    sys.stdout.write(json.dumps(result) + "\n")
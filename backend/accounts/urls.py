@@ -1,10 +1,13 @@
 from django.urls import path
 from .views import (
+    ExportView,
     MeView,
+    LoadView,
     LoginView,
     LogoutView,
     RegisterView,
     GoogleAuthView,
+    ReadinessView,
     SessionListView,
     SessionRevokeView,
     SecureTokenRefreshView,
@@ -20,4 +23,8 @@ urlpatterns = [
     path("auth/sessions/<uuid:pk>/revoke",
          SessionRevokeView.as_view(), name="session_revoke"),
     path("auth/google", GoogleAuthView.as_view(), name="google_login"),
+    path("export/sessions", ExportView.as_view(kind="sessions"), name="export_sessions"),
+    path("export/users", ExportView.as_view(kind="users"), name="export_users"),
+    path("health/ready", ReadinessView.as_view(), name="readiness"),
+    path("health/load", LoadView.as_view(), name="load"),
 ]
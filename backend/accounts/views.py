@@ -1,16 +1,24 @@
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from rest_framework import status
 from django.contrib.auth import authenticate
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
 from rest_framework_simplejwt.tokens import RefreshToken, TokenError
 from rest_framework_simplejwt.views import TokenRefreshView
 from allauth.socialaccount.providers.google.views import GoogleOAuth2Adapter
 from dj_rest_auth.registration.views import SocialLoginView
 
+from . import events, export, revocation, shedding, useragent, warmup
+from .idempotency import idempotent
 from .models import DeviceSession
-from .serializers import RegisterSerializer, UserSerializer, DeviceSessionSerializer
+from .sessions import start_session
+from .serializers import (
+    DeviceSessionSerializer, ExportQuerySerializer, RegisterSerializer, UserSerializer)
 
 
 # === USER REGISTRATION ===
@@ -24,12 +32,9 @@ class RegisterView(APIView):
         serializer = RegisterSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
-        device_name = request.data.get("device_name", "Registration Device")
-
-        refresh = RefreshToken.for_user(user)
-        jti = str(refresh["jti"])
-        DeviceSession.objects.create(
-            user=user, device_name=device_name, refresh_token_jti=jti)
+        _, refresh = start_session(
+            user, request.data.get("device_name"), useragent.from_request(request),
+            fallback_name="Registration Device")
 
         return Response(
             {
@@ -45,13 +50,14 @@ class RegisterView(APIView):
 class LoginView(APIView):
     permission_classes = [AllowAny]
 
+    @idempotent()
     def post(self, request):
         email = request.data.get("email")
         password = request.data.get("password")
-        device_name = request.data.get("device_name", "Unknown Device")
 
         user = authenticate(request, username=email, password=password)
         if not user:
+            events.record(events.LOGIN_FAILED, request, email=email)
             return Response(
                 {
                     "detail": "Invalid credentials"
@@ -59,11 +65,10 @@ class LoginView(APIView):
                 status=status.HTTP_401_UNAUTHORIZED
             )
 
-        refresh = RefreshToken.for_user(user)
-        jti = str(refresh["jti"])
-        device_session = DeviceSession.objects.create(
-            user=user, device_name=device_name, refresh_token_jti=jti
-        )
+        device_session, refresh = start_session(
+            user, request.data.get("device_name"), useragent.from_request(request))
+        events.record(events.LOGIN, request, user_id=user.pk,
+                      session_id=device_session.id)
 
         return Response(
             {
@@ -99,20 +104,14 @@ class GoogleAuthView(SocialLoginView):
         # Call the parent SocialLoginView to handle the OAuth flow
         response = super().post(request, *args, **kwargs)
 
-        # If login was successful, generate JWT tokens
-        if response.status_code == 200:
+        # If login was successful, generate JWT tokens. dj-rest-auth answers
+        # 204 when it has neither JWTs nor a token model to return.
+        if status.is_success(response.status_code):
             user = self.request.user
-            device_name = request.data.get(
-                "device_name", "Google OAuth Device")
-
-            # Generate JWT tokens
-            refresh = RefreshToken.for_user(user)
-            jti = str(refresh["jti"])
-
-            # Create device session
-            DeviceSession.objects.create(
-                user=user, device_name=device_name, refresh_token_jti=jti
-            )
+            # Create device session and its JWT tokens
+            _, refresh = start_session(
+                user, request.data.get("device_name"), useragent.from_request(request),
+                fallback_name="Google OAuth Device")
 
             # Return JWT tokens instead of session key
             return Response(
@@ -146,8 +145,12 @@ class LogoutView(APIView):
         try:
             token = RefreshToken(refresh_token)
             jti = token["jti"]
-            DeviceSession.objects.filter(
+            DeviceSession.objects.for_token(token).filter(
                 refresh_token_jti=jti).update(revoked=True)
+            revocation.revoke(
+                jti=jti, session_id=token.get("sid"), expires_at=token["exp"])
+            events.record(events.LOGOUT, request, user_id=request.user.pk,
+                          session_id=token.get("sid"))
             token.blacklist()  # optional, requires SIMPLEJWT blacklist app
         except Exception:
             pass
@@ -162,7 +165,8 @@ class SessionListView(APIView):
         """
         Returns all device sessions associated with the authenticated user.
         """
-        sessions = DeviceSession.objects.filter(user=request.user)
+        sessions = DeviceSession.objects.for_user(
+            request.user).filter(user=request.user)
         serializer = DeviceSessionSerializer(sessions, many=True)
         return Response(serializer.data)
 
@@ -176,12 +180,16 @@ class SessionRevokeView(APIView):
         Revokes a specific device session by marking it as 'revoked'.
         """
         try:
-            session = DeviceSession.objects.get(id=pk, user=request.user)
+            session = DeviceSession.objects.for_user(
+                request.user).get(id=pk, user=request.user)
         except DeviceSession.DoesNotExist:
             return Response({"detail": "Session not found"}, status=status.HTTP_404_NOT_FOUND)
 
         session.revoked = True
         session.save()
+        revocation.revoke(jti=session.refresh_token_jti, session_id=session.id)
+        events.record(events.REVOKE, request, user_id=request.user.pk,
+                      session_id=session.id)
         return Response({"detail": "Session revoked"}, status=status.HTTP_200_OK)
 
 
@@ -190,8 +198,11 @@ class SecureTokenRefreshView(TokenRefreshView):
     """
     Extends the default SimpleJWT TokenRefreshView.
     Validates that the refresh token belongs to a valid, non-revoked session.
+    A retried refresh within the grace window gets the first response back
+    instead of failing on the already rotated token.
     """
 
+    @idempotent(refresh_field="refresh")
     def post(self, request, *args, **kwargs):
         refresh_token = request.data.get("refresh")
         if not refresh_token:
@@ -200,23 +211,103 @@ class SecureTokenRefreshView(TokenRefreshView):
         try:
             token = RefreshToken(refresh_token)
             jti = token["jti"]
-            ds = DeviceSession.objects.filter(refresh_token_jti=jti).first()
-            if not ds or ds.revoked:
+            # Revocations broadcast by any node are rejected without a query
+            if revocation.is_revoked(jti=jti, sid=token.get("sid")):
                 return Response({"detail": "Session revoked or invalid"}, status=status.HTTP_401_UNAUTHORIZED)
 
-            # Proceed with the normal refresh process
-            response = super().post(request, *args, **kwargs)
-
-            # If refresh token rotation is used, update the stored JTI
-            if response.status_code == 200:
-                new_refresh = response.data.get("refresh")
+            sessions = DeviceSession.objects.for_token(token)
+            # The session row stays locked until the new JTI is committed:
+            # a concurrent refresh with the same token waits, then no longer
+            # matches and is refused instead of rotating a second time.
+            with transaction.atomic(), transaction.atomic(using=sessions.db):
+                ds = sessions.select_for_update().filter(
+                    refresh_token_jti=jti).first()
+                if not ds or ds.revoked:
+                    return Response({"detail": "Session revoked or invalid"}, status=status.HTTP_401_UNAUTHORIZED)
+
+                # Proceed with the normal refresh process
+                response = super().post(request, *args, **kwargs)
+
+                # If refresh token rotation is used, update the stored JTI
+                new_refresh = response.data.get("refresh") if response.status_code == 200 else None
                 if new_refresh:
-                    new_jti = str(RefreshToken(new_refresh)["jti"])
-                    ds.refresh_token_jti = new_jti
+                    ds.refresh_token_jti = str(RefreshToken(new_refresh)["jti"])
                     ds.last_seen = timezone.now()
                     ds.save()
 
+            if response.status_code == 200:
+                if new_refresh:
+                    # The old token is blacklisted in the DB already; just
+                    # let the other nodes reject it without a lookup.
+                    revocation.revoke(
+                        jti=jti, expires_at=token["exp"], durable=False)
+                events.record(events.REFRESH, request, user_id=ds.user_id,
+                              session_id=ds.id)
+
             return response
 
         except TokenError:
             return Response({"detail": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
+
+
+# === EXPORT ===
+class ExportView(APIView):
+    permission_classes = [IsAdminUser]
+    kind = None  # "sessions" or "users"
+
+    def get(self, request):
+        """
+        Streams every session or user matching the query's filters as CSV
+        or JSONL, reading rows through a server-side cursor.
+        """
+        params = request.query_params.dict()
+        query = ExportQuerySerializer(data=params, context={"kind": self.kind})
+        query.is_valid(raise_exception=True)
+        filters = dict(query.validated_data)
+        output_format = filters.pop("output")
+        fields, rows = export.rows(self.kind, **filters)
+        lines = export.render(fields, rows, output_format)
+        if isinstance(request._request, ASGIRequest):
+            lines = export.aiter_chunks(lines)
+
+        response = StreamingHttpResponse(
+            lines, content_type=export.FORMATS[output_format])
+        stamp = timezone.now().strftime("%Y%m%dT%H%M%SZ")
+        response["Content-Disposition"] = (
+            f'attachment; filename="{self.kind}-{stamp}.{output_format}"')
+        events.record(events.EXPORT, request=request, user_id=request.user.pk,
+                      export=self.kind, filters=params)
+        return response
+
+
+# === READINESS PROBE ===
+class ReadinessView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        """
+        Reports 200 once the worker has finished warming up, 503 before.
+        A failed warm-up is retried on the next probe (see warmup.retry).
+        """
+        if warmup.status()["status"] == "failed":
+            warmup.retry()
+        if warmup.is_ready():
+            return Response(warmup.status())
+        return Response(warmup.status(), status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+# === LOAD SHEDDING COUNTERS ===
+class LoadView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        """
+        Reports this worker's per-route concurrency limits, in-flight
+        requests and shed counters (see accounts.shedding).
+        """
+        return Response({
+            "enabled": settings.LOAD_SHEDDING["ENABLED"],
+            "routes": shedding.get_shedder().snapshot(),
+        })
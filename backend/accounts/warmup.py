@@ -0,0 +1,189 @@
+"""
+Worker warm-up.
+
+A fresh worker pays for its first Argon2 hash, its first JWT signature, its
+first DB/cache connection and the URLconf import during a live request.
+`warm_up_application()` is called from the WSGI/ASGI application factory so
+that this happens before the worker takes traffic, and `/api/health/ready`
+reports ready only once every step has succeeded.
+
+Steps run in registration order. Other modules can add their own with the
+`step` decorator.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_steps = []
+_lock = threading.Lock()
+_state = {
+    "status": "pending",  # pending, running, ready or failed
+    "steps": {},
+    # What the application factory passed, for retries
+    "connections": True,
+}
+
+
+def step(name, connections=False):
+    """
+    Registers a warm-up step. Steps flagged with `connections=True` open
+    per-process resources (sockets) and are skipped when the caller cannot
+    keep them, e.g. before a fork or outside the request threads.
+    """
+    def decorator(func):
+        _steps.append((name, func, connections))
+        return func
+    return decorator
+
+
+def is_ready():
+    return _state["status"] == "ready"
+
+
+def status():
+    return {"status": _state["status"], "steps": dict(_state["steps"])}
+
+
+def warm_up(connections=True):
+    """
+    Runs every registered step and marks the worker ready if all of them
+    succeed. Failures are logged and reported by the readiness endpoint.
+    """
+    with _lock:
+        if _state["status"] in ("running", "ready"):
+            return is_ready()
+        _state["status"] = "running"
+
+    failed = False
+    for name, func, opens_connections in _steps:
+        if opens_connections and not connections:
+            _state["steps"][name] = {"status": "skipped"}
+            continue
+        start = time.perf_counter()
+        try:
+            func()
+        except Exception:
+            logger.exception("Warm-up step %r failed", name)
+            _state["steps"][name] = {"status": "failed"}
+            failed = True
+        else:
+            _state["steps"][name] = {
+                "status": "ok",
+                "ms": round((time.perf_counter() - start) * 1000, 2),
+            }
+
+    _state["status"] = "failed" if failed else "ready"
+    return not failed
+
+
+def warm_up_application(connections=True):
+    """
+    Entry point for the application factories. `WARMUP["MODE"]` selects
+    whether warm-up blocks the factory ("sync"), runs in a thread while the
+    readiness probe reports not ready ("background"), or is skipped ("off").
+    """
+    _state["connections"] = connections
+    mode = settings.WARMUP.get("MODE", "sync")
+    if mode == "off":
+        _state["status"] = "ready"
+    elif mode == "background":
+        warm_up_in_background()
+    else:
+        warm_up(connections)
+
+
+def warm_up_in_background():
+    """
+    Runs warm-up in a thread. Connections opened there would stay with that
+    thread, where no request can use them, so the connection steps are
+    skipped.
+    """
+    thread = threading.Thread(
+        target=warm_up, kwargs={"connections": False},
+        name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def retry():
+    """
+    Runs a failed warm-up again, with the `connections` flag the factory
+    passed. With connections it runs on the calling request thread, so the
+    connections are kept; without them it runs in the background.
+    """
+    if _state["connections"]:
+        warm_up(connections=True)
+    else:
+        warm_up_in_background()
+
+
+# === STEPS ===
+@step("password_hasher")
+def _password_hasher():
+    # Loads the argon2 C bindings and allocates its memory arena once.
+    from django.contrib.auth.hashers import get_hasher
+    hasher = get_hasher()
+    hasher.encode("warm-up", hasher.salt())
+
+
+@step("password_validators")
+def _password_validators():
+    # Instantiates the validators, loading the common-password list.
+    from django.contrib.auth.password_validation import get_default_password_validators
+    get_default_password_validators()
+
+
+@step("signing_keys")
+def _signing_keys():
+    # Builds SimpleJWT's token backend and the PyJWT algorithm objects.
+    from rest_framework_simplejwt.tokens import AccessToken
+    AccessToken(str(AccessToken()))
+
+
+@step("url_resolver")
+def _url_resolver():
+    # Imports the URLconf and every view it references.
+    from django.urls import get_resolver
+    get_resolver().reverse_dict  # populates the resolver's lookup tables
+
+
+@step("database", connections=True)
+def _database():
+    from django.db import connections
+    for connection in connections.all():
+        connection.ensure_connection()
+
+
+@step("cache", connections=True)
+def _cache():
+    from django.core.cache import caches
+    for alias in settings.CACHES:
+        caches[alias].get("warm-up")
+
+
+@step("revocation", connections=True)
+def _revocation():
+    # Subscribes to the revocation broadcast and catches up on it.
+    from .revocation import get_registry
+    get_registry()
+
+
+@step("recent_sessions", connections=True)
+def _recent_sessions():
+    # Pulls the most recently active sessions (and the index pages the
+    # refresh lookup walks) into the database buffer cache.
+    limit = settings.WARMUP.get("PRELOAD_SESSIONS", 0)
+    if not limit:
+        return
+    from .models import DeviceSession
+    from .sharding import shard_aliases
+    for alias in shard_aliases():
+        list(
+            DeviceSession.objects.using(alias).filter(revoked=False)
+            .order_by("-last_seen")
+            .values_list("refresh_token_jti", flat=True)[:limit]
+        )
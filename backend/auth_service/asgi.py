@@ -14,3 +14,38 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auth_service.settings')
 
 application = get_asgi_application()
+
+# Warm the worker before it takes traffic (see accounts.warmup). Sync views
+# run in asgiref's executor thread, so connections opened here would not be
+# reused and the connection steps are skipped.
+from accounts.warmup import warm_up_application  # noqa: E402
+
+warm_up_application(connections=False)
+
+# Optionally answer token checks from gateways without the Django stack
+# (see auth_service.verify_asgi)
+from django.conf import settings  # noqa: E402
+
+if settings.AUTH_VERIFY['MOUNT_PATH']:
+    from accounts import revocation  # noqa: E402
+    from auth_service.verify_asgi import PathRouter, VerifyApp  # noqa: E402
+
+    def _in_worker_thread(func):
+        # The verify app calls these in a worker thread; don't leave its
+        # connection behind
+        def run():
+            from django.db import connection
+
+            try:
+                return func()
+            finally:
+                connection.close()
+        return run
+
+    # Share this process's registry and delta sync, so revocations made by
+    # other workers reach the verify app whichever broker is configured
+    application = PathRouter(
+        settings.AUTH_VERIFY['MOUNT_PATH'],
+        VerifyApp(registry=_in_worker_thread(revocation.get_registry),
+                  sync=_in_worker_thread(revocation.sync)),
+        application)
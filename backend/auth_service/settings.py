@@ -11,15 +11,18 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
-
-load_dotenv()
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# An explicit path skips python-dotenv's stack inspection and directory walk
+load_dotenv(BASE_DIR / '.env')
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -45,7 +48,6 @@ INSTALLED_APPS = [
 
     # third party
     'rest_framework',
-    'rest_framework.authtoken',
     'dj_rest_auth',
     'allauth',
     'allauth.account',
@@ -64,6 +66,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    # Sheds login/registration first when latency rises (accounts.shedding)
+    'accounts.shedding.LoadSheddingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -71,6 +75,9 @@ MIDDLEWARE = [
     'allauth.account.middleware.AccountMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Opt-in profiles and slow-request captures of the accounts views
+    # (accounts.profiling); last, so only the view is measured
+    'accounts.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'auth_service.urls'
@@ -92,7 +99,8 @@ TEMPLATES = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWTAuthentication that also rejects tokens of revoked sessions
+        'accounts.authentication.SessionJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': ('rest_framework.permissions.IsAuthenticated',)
 }
@@ -117,12 +125,19 @@ SESSION_COOKIE_SECURE = os.getenv('SESSION_COOKIE_SECURE', 'False') == 'True'
 SECURE_SSL_REDIRECT = os.getenv('SECURE_SSL_REDIRECT', 'False') == 'True'
 CORS_ALLOWED_ORIGINS = os.getenv(
     'CORS_ALLOWED_ORIGINS', default='http://localhost:3000,http://localhost:8000').split(',')
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key', 'x-profile')
+CORS_EXPOSE_HEADERS = ['x-profile-id']
 
 
 SITE_ID = 1
 
 # DJ-REST-AUTH CONFIG
 REST_USE_JWT = True
+# GoogleAuthView mints its own JWTs, so dj-rest-auth needs no token model
+# (and rest_framework.authtoken stays out of INSTALLED_APPS).
+REST_AUTH = {
+    'TOKEN_MODEL': None,
+}
 
 AUTHENTICATION_BACKENDS = (
     'django.contrib.auth.backends.ModelBackend',
@@ -152,13 +167,192 @@ DATABASES = {
         'HOST': os.getenv('DATABASE_HOST'),
         'PORT': os.getenv('DATABASE_PORT'),
         'PASSWORD': os.getenv('DATABASE_PASSWORD'),
+        # Keep connections across requests so warmed workers reuse them
+        'CONN_MAX_AGE': int(os.getenv('DATABASE_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# DeviceSession sharding (accounts.sharding): aliases that hold session rows,
+# chosen by user id. Extra aliases reuse the default connection settings
+# with DATABASE_<ALIAS>_NAME / _HOST / _PORT overrides, and are migrated
+# with `manage.py migrate --database <alias>`.
+DEVICE_SESSION_SHARDS = os.getenv('DEVICE_SESSION_SHARDS', 'default').split(',')
+for _alias in DEVICE_SESSION_SHARDS:
+    if _alias not in DATABASES:
+        _prefix = f'DATABASE_{_alias.upper()}_'
+        DATABASES[_alias] = {
+            **DATABASES['default'],
+            'NAME': os.getenv(_prefix + 'NAME', f"{DATABASES['default']['NAME']}_{_alias}"),
+            'HOST': os.getenv(_prefix + 'HOST', DATABASES['default']['HOST']),
+            'PORT': os.getenv(_prefix + 'PORT', DATABASES['default']['PORT']),
+        }
+DATABASE_ROUTERS = ['accounts.sharding.DeviceSessionRouter']
+
+# Cache
+# Redis when REDIS_URL is set, otherwise a per-process in-memory cache
+
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
     }
+
+# Revocation broadcast (accounts.revocation): every node applies logouts and
+# session revocations to a local set and rejects those tokens without a query
+if os.getenv('REDIS_URL'):
+    REVOCATION_BROADCAST = {
+        'BROKER': 'accounts.revocation.RedisBroker',
+        'OPTIONS': {'url': os.getenv('REDIS_URL'), 'channel': 'auth:revocations'},
+    }
+elif os.getenv('REVOCATION_SOCKET_DIR'):
+    REVOCATION_BROADCAST = {
+        'BROKER': 'accounts.revocation.LocalSocketBroker',
+        'OPTIONS': {'path': os.getenv('REVOCATION_SOCKET_DIR')},
+    }
+else:
+    REVOCATION_BROADCAST = {
+        'BROKER': 'accounts.revocation.InProcessBroker',
+    }
+
+# Delta sync of the revoked-session set for access-token checks
+# (accounts.revocation.sync), in seconds
+REVOCATION_SYNC = {
+    # How often a node reads the shared change counter from the cache
+    'INTERVAL': float(os.getenv('REVOCATION_SYNC_INTERVAL', '1')),
+    # Query the database at least this often even if the counter is unchanged
+    'MAX_STALENESS': float(os.getenv('REVOCATION_MAX_STALENESS', '30')),
+    # Recent events re-read on every delta, as ids may commit out of order
+    'OVERLAP': 60,
+    # How often a node deletes expired RevocationEvent rows; 0 disables
+    'PRUNE_INTERVAL': float(os.getenv('REVOCATION_PRUNE_INTERVAL', '3600')),
+}
+
+# Worker warm-up (accounts.warmup), run from the WSGI/ASGI application factory
+# MODE: "sync" (block until warm), "background" (readiness gates traffic), "off"
+WARMUP = {
+    'MODE': os.getenv('WARMUP_MODE', 'sync'),
+    # Number of recently active sessions to pull into the DB cache at start
+    'PRELOAD_SESSIONS': int(os.getenv('WARMUP_PRELOAD_SESSIONS', '0')),
+}
+
+# Device sessions (accounts.sessions.start_session)
+DEVICE_SESSIONS = {
+    # Active sessions per user; a login past the cap evicts the least
+    # recently seen ones. 0 disables the cap.
+    'MAX_ACTIVE': int(os.getenv('DEVICE_SESSIONS_MAX_ACTIVE', '50')),
+    # Log in again on the same device name by rotating that session's
+    # refresh token instead of opening a new session
+    'REUSE_BY_DEVICE_NAME': os.getenv('DEVICE_SESSIONS_REUSE_BY_DEVICE_NAME', 'False') == 'True',
+    # Placeholder names sent by many devices at once; never reused
+    'GENERIC_NAMES': ['Unknown Device', 'Registration Device', 'Google OAuth Device',
+                      'NextAuth Client'],
+}
+
+# Replay of retried login/refresh responses (accounts.idempotency), in seconds
+IDEMPOTENCY = {
+    # How long a response is kept for its Idempotency-Key header
+    'KEY_TTL': int(os.getenv('IDEMPOTENCY_KEY_TTL', '60')),
+    # How long a rotated refresh token still gets the rotation's response
+    'REFRESH_GRACE': int(os.getenv('IDEMPOTENCY_REFRESH_GRACE', '30')),
+    # A duplicate of a request still in flight waits this long for its result
+    'WAIT': 2.0,
+    'LOCK_TIMEOUT': 10,
+}
+
+# Adaptive per-route concurrency limits (accounts.shedding). Routes are URL
+# names; a higher PRIORITY is shed later, TARGET is the latency in seconds
+# above which limits back off. Limits are per worker process.
+LOAD_SHEDDING = {
+    'ENABLED': os.getenv('LOAD_SHEDDING_ENABLED', 'True') == 'True',
+    'ROUTES': {
+        'login': {'PRIORITY': 0, 'TARGET': 0.5},
+        'register': {'PRIORITY': 0, 'TARGET': 1.0},
+        'google_login': {'PRIORITY': 0, 'TARGET': 2.0},
+        'logout': {'PRIORITY': 1, 'TARGET': 0.2},
+        'token_refresh': {'PRIORITY': 1, 'TARGET': 0.2},
+        'me': {'PRIORITY': 1, 'TARGET': 0.1},
+    },
+    # Concurrent requests per route; a route may override these
+    'LIMITS': {
+        'INITIAL': int(os.getenv('LOAD_SHEDDING_INITIAL_LIMIT', '8')),
+        'MIN': 1,
+        'MAX': int(os.getenv('LOAD_SHEDDING_MAX_LIMIT', '64')),
+    },
+    # Factor applied to a limit on a slow response
+    'BACKOFF': 0.75,
+    # Response to a shed request, with Retry-After in seconds
+    'STATUS': int(os.getenv('LOAD_SHEDDING_STATUS', '503')),
+    'RETRY_AFTER': int(os.getenv('LOAD_SHEDDING_RETRY_AFTER', '1')),
+}
+
+# Request profiling (accounts.profiling). Staff sending HEADER, or a random
+# SAMPLE_RATE share of requests, are profiled with cProfile; requests slower
+# than SLOW_THRESHOLD seconds (0 to disable) keep their SQL timeline and
+# sampled stacks. Captures go to a ring of MAX_CAPTURES files in DIR, read
+# with `manage.py profile_captures`.
+PROFILING = {
+    'ENABLED': os.getenv('PROFILING_ENABLED', 'True') == 'True',
+    'HEADER': 'X-Profile',
+    'SAMPLE_RATE': float(os.getenv('PROFILING_SAMPLE_RATE', '0')),
+    'SLOW_THRESHOLD': float(os.getenv('PROFILING_SLOW_THRESHOLD', '0')),
+    # Seconds between stack samples of a request watched for slowness
+    'SAMPLER_INTERVAL': 0.005,
+    'DIR': os.getenv('PROFILING_DIR') or os.path.join(
+        tempfile.gettempdir(), 'auth-service-profiles'),
+    'MAX_CAPTURES': int(os.getenv('PROFILING_MAX_CAPTURES', '200')),
+}
+
+# Django-free access-token check (auth_service.verify_asgi), mounted in front
+# of Django by auth_service.asgi at this path; empty to not mount it
+AUTH_VERIFY = {
+    'MOUNT_PATH': os.getenv('AUTH_VERIFY_PATH', ''),
+}
+
+# Batched auth event log (accounts.events): views enqueue, a background
+# thread writes batches to the AuthEvent table or to rotated JSONL files
+AUTH_EVENTS = {
+    'ENABLED': os.getenv('AUTH_EVENTS_ENABLED', 'True') == 'True',
+    'SINK': 'accounts.events.DatabaseSink',
+    'OPTIONS': {},
+    # Events held in memory at most; OVERFLOW is "drop_oldest",
+    # "drop_newest" or "block" (wait BLOCK_TIMEOUT seconds for the flusher)
+    'CAPACITY': int(os.getenv('AUTH_EVENTS_CAPACITY', '10000')),
+    'OVERFLOW': os.getenv('AUTH_EVENTS_OVERFLOW', 'drop_oldest'),
+    'BLOCK_TIMEOUT': 0.05,
+    'BATCH_SIZE': 500,
+    # Seconds between flushes; 0 disables the thread (flush() by hand)
+    'FLUSH_INTERVAL': float(os.getenv('AUTH_EVENTS_FLUSH_INTERVAL', '1')),
 }
+if os.getenv('AUTH_EVENTS_JSONL_PATH'):
+    AUTH_EVENTS.update(
+        SINK='accounts.events.JSONLSink',
+        OPTIONS={'path': os.getenv('AUTH_EVENTS_JSONL_PATH')},
+    )
+
+# Consumers of the AuthEvent outbox, run by `manage.py dispatch_auth_events`
+AUTH_EVENT_SUBSCRIBERS = []
+if os.getenv('AUTH_EVENTS_WEBHOOK_URL'):
+    AUTH_EVENT_SUBSCRIBERS.append({
+        'NAME': 'webhook',
+        'CLASS': 'accounts.events.WebhookSubscriber',
+        'OPTIONS': {'url': os.getenv('AUTH_EVENTS_WEBHOOK_URL')},
+    })
 
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
+# accounts.passwords.validate_password runs these cheapest first and skips
+# UserAttributeSimilarityValidator once a cheaper one has failed
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -167,12 +361,19 @@ AUTH_PASSWORD_VALIDATORS = [
         'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
     },
     {
-        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+        'NAME': 'accounts.passwords.CommonPasswordValidator',
     },
     {
         'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
     },
 ]
+# Breached-password check against a local index built with
+# `manage.py compile_breach_index` (accounts.breach)
+if os.getenv('BREACHED_PASSWORDS_INDEX'):
+    AUTH_PASSWORD_VALIDATORS.append({
+        'NAME': 'accounts.breach.BreachedPasswordValidator',
+        'OPTIONS': {'index_path': os.getenv('BREACHED_PASSWORDS_INDEX')},
+    })
 
 
 # Internationalization
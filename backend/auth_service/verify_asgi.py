@@ -0,0 +1,276 @@
+"""
+Access-token verification without Django.
+
+A small ASGI app for gateways and sidecars (nginx `auth_request`, Traefik or
+Envoy forward auth) that only need to know whether a request's access token
+is good. It checks the token the way `SessionJWTAuthentication` does, with
+the same `SIMPLE_JWT` settings, and rejects tokens whose session has been
+revoked using a `RevocationRegistry` on the broker configured in
+`REVOCATION_BROADCAST`. It loads neither the ORM nor the Django request
+stack; settings are read from the module named by `DJANGO_SETTINGS_MODULE`,
+imported as a plain module.
+
+Because it never reads the database:
+
+* the user row is not checked, so a deactivated user's access tokens pass
+  until they expire unless their sessions are revoked;
+* a standalone process only knows revocations made before it started when
+  the broker keeps a backlog (`RedisBroker`). Mounted in the Django process
+  (see `auth_service.asgi`), it shares the process's registry and runs the
+  same delta sync from `RevocationEvent` as `SessionJWTAuthentication`, so
+  revocations reach it even on the default in-process broker.
+
+GET or HEAD with `Authorization: Bearer <access token>` answers 200 with
+`{"user_id", "session_id", "exp"}`, also sent as `X-Auth-User-Id` and
+`X-Auth-Session-Id` headers, or 401. Run standalone with any ASGI server,
+e.g. on a Unix socket:
+
+    uvicorn auth_service.verify_asgi:application --uds /run/auth/verify.sock
+"""
+import asyncio
+import importlib
+import json
+import logging
+import os
+import threading
+import time
+
+import jwt
+
+from accounts.revocation import RevocationRegistry
+
+logger = logging.getLogger(__name__)
+
+# rest_framework_simplejwt's defaults for the settings used here (its
+# settings module imports Django, so they are repeated)
+JWT_DEFAULTS = {
+    "ALGORITHM": "HS256",
+    "SIGNING_KEY": None,  # SECRET_KEY
+    "VERIFYING_KEY": "",
+    "AUDIENCE": None,
+    "ISSUER": None,
+    "JWK_URL": None,
+    "LEEWAY": 0,
+    "AUTH_HEADER_TYPES": ("Bearer",),
+    "USER_ID_CLAIM": "user_id",
+    "TOKEN_TYPE_CLAIM": "token_type",
+    "JTI_CLAIM": "jti",
+}
+
+# accounts.sessions.SESSION_ID_CLAIM
+SESSION_ID_CLAIM = "sid"
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def load_settings(module=None):
+    """
+    Returns the `SIMPLE_JWT` (with defaults filled in), `REVOCATION_BROADCAST`
+    and `REVOCATION_SYNC` settings without configuring Django.
+    """
+    module = importlib.import_module(
+        module or os.environ.get("DJANGO_SETTINGS_MODULE", "auth_service.settings"))
+    simple_jwt = {**JWT_DEFAULTS, **getattr(module, "SIMPLE_JWT", {})}
+    if simple_jwt["SIGNING_KEY"] is None:
+        simple_jwt["SIGNING_KEY"] = module.SECRET_KEY
+    return {
+        "SIMPLE_JWT": simple_jwt,
+        "REVOCATION_BROADCAST": module.REVOCATION_BROADCAST,
+        "REVOCATION_SYNC": getattr(module, "REVOCATION_SYNC", {}),
+    }
+
+
+def import_string(dotted_path):
+    module, name = dotted_path.rsplit(".", 1)
+    return getattr(importlib.import_module(module), name)
+
+
+class TokenVerifier:
+    """
+    The checks simplejwt's `JWTAuthentication` makes on an access token:
+    signature, expiry, audience and issuer, token type and required claims.
+    """
+
+    def __init__(self, conf):
+        if conf["JWK_URL"]:
+            raise ValueError("SIMPLE_JWT['JWK_URL'] is not supported here")
+        self.algorithm = conf["ALGORITHM"]
+        self.key = (conf["SIGNING_KEY"] if self.algorithm.startswith("HS")
+                    else conf["VERIFYING_KEY"])
+        if not self.key:
+            raise ValueError(f"No key to verify {self.algorithm} tokens with")
+        self.audience = conf["AUDIENCE"]
+        self.issuer = conf["ISSUER"]
+        self.leeway = conf["LEEWAY"]
+        self.header_types = tuple(kind.encode() for kind in conf["AUTH_HEADER_TYPES"])
+        self.user_id_claim = conf["USER_ID_CLAIM"]
+        self.token_type_claim = conf["TOKEN_TYPE_CLAIM"]
+        self.jti_claim = conf["JTI_CLAIM"]
+
+    def verify(self, token):
+        try:
+            claims = jwt.decode(
+                token, self.key, algorithms=[self.algorithm],
+                audience=self.audience, issuer=self.issuer, leeway=self.leeway,
+                options={"verify_aud": self.audience is not None,
+                         "require": ["exp"]})
+        except jwt.InvalidTokenError:
+            raise InvalidToken("Token is invalid or expired")
+        if claims.get(self.token_type_claim) != "access":
+            raise InvalidToken("Token has wrong type")
+        if self.jti_claim not in claims or self.user_id_claim not in claims:
+            raise InvalidToken("Token contained no recognizable user identification")
+        return claims
+
+
+class VerifyApp:
+    """
+    The ASGI application. The revocation registry is started on lifespan
+    startup, or on the first request when the server sends no lifespan
+    events. `catch_up` is passed to the registry; see `RevocationRegistry`.
+
+    Mounted in a process that has its own registry, pass `registry`, a
+    callable returning that (started) registry, and `sync`, a callable that
+    brings it up to date (`accounts.revocation.sync`). Both run in a worker
+    thread; `sync` at most once per `REVOCATION_SYNC['INTERVAL']` seconds.
+    """
+
+    def __init__(self, settings=None, catch_up=None, registry=None, sync=None):
+        settings = settings or load_settings()
+        self.verifier = TokenVerifier(settings["SIMPLE_JWT"])
+        self.broadcast = settings["REVOCATION_BROADCAST"]
+        self.sync_interval = settings.get("REVOCATION_SYNC", {}).get("INTERVAL", 0)
+        self.catch_up = catch_up
+        self.get_registry = registry
+        self.sync = sync
+        self.registry = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self.registry is None and self.get_registry is not None:
+                self.registry = self.get_registry()
+            elif self.registry is None:
+                broker = import_string(self.broadcast["BROKER"])(
+                    **self.broadcast.get("OPTIONS", {}))
+                if self.catch_up is None and not hasattr(broker, "backlog"):
+                    logger.warning(
+                        "%s keeps no backlog: revocations made before now are "
+                        "not known to the verify app", type(broker).__name__)
+                self.registry = RevocationRegistry(
+                    broker, catch_up=self.catch_up).start()
+        return self.registry
+
+    def close(self):
+        # A registry from `registry` belongs to the host process
+        if self.registry is not None and self.get_registry is None:
+            self.registry.broker.close()
+        self.registry = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] != "http":
+            raise ValueError(f"Unsupported ASGI scope {scope['type']!r}")
+        if self.registry is None:
+            await asyncio.to_thread(self.start)
+        if (self.sync is not None
+                and time.monotonic() - self.registry.checked_at >= self.sync_interval):
+            await asyncio.to_thread(self.sync)
+        status, body, headers = self.handle(scope)
+        payload = json.dumps(body).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(payload)).encode()),
+                (b"cache-control", b"no-store"),
+                *headers,
+            ],
+        })
+        await send({
+            "type": "http.response.body",
+            "body": b"" if scope["method"] == "HEAD" else payload,
+        })
+
+    def handle(self, scope):
+        """
+        Returns `(status, body, extra headers)` for an HTTP request scope.
+        """
+        if scope["method"] not in ("GET", "HEAD"):
+            return 405, {"detail": f'Method "{scope["method"]}" not allowed.'}, [
+                (b"allow", b"GET, HEAD")]
+        header = next(
+            (value for name, value in scope["headers"] if name == b"authorization"), b"")
+        parts = header.split()
+        if not parts or parts[0] not in self.verifier.header_types:
+            return self._unauthorized(
+                "Authentication credentials were not provided.", "not_authenticated")
+        if len(parts) != 2:
+            return self._unauthorized(
+                "Authorization header must contain two space-delimited values",
+                "bad_authorization_header")
+        try:
+            claims = self.verifier.verify(parts[1].decode("latin-1"))
+        except InvalidToken as exc:
+            return self._unauthorized(str(exc))
+
+        session_id = claims.get(SESSION_ID_CLAIM)
+        if self.registry.is_revoked(sid=session_id):
+            return self._unauthorized("Session has been revoked")
+        user_id = claims[self.verifier.user_id_claim]
+        headers = [(b"x-auth-user-id", str(user_id).encode())]
+        if session_id:
+            headers.append((b"x-auth-session-id", str(session_id).encode()))
+        return 200, {
+            "user_id": user_id, "session_id": session_id, "exp": claims["exp"],
+        }, headers
+
+    def _unauthorized(self, detail, code="token_not_valid"):
+        # Same challenge as DRF's JWTAuthentication.authenticate_header
+        realm = self.verifier.header_types[0].decode()
+        return 401, {"detail": detail, "code": code}, [
+            (b"www-authenticate", f'{realm} realm="api"'.encode())]
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await asyncio.to_thread(self.start)
+                except Exception as exc:
+                    logger.exception("Verify app failed to start")
+                    await send({"type": "lifespan.startup.failed", "message": str(exc)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+class PathRouter:
+    """
+    Sends HTTP requests for `prefix` (and paths below it) to `app` and
+    everything else to `default`. Lifespan events go to `app` only, as
+    Django's ASGI handler does not take them.
+    """
+
+    def __init__(self, prefix, app, default):
+        self.prefix = prefix.rstrip("/")
+        self.app = app
+        self.default = default
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.app(scope, receive, send)
+        path = scope.get("path", "")
+        if path == self.prefix or path.startswith(self.prefix + "/"):
+            return await self.app(scope, receive, send)
+        return await self.default(scope, receive, send)
+
+
+application = VerifyApp()
@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auth_service.settings')
 
 application = get_wsgi_application()
+
+# Warm the worker before it takes traffic (see accounts.warmup). With a
+# preforking server, load the app in each worker (no gunicorn --preload)
+# so the DB and cache connections are opened after the fork.
+from accounts.warmup import warm_up_application  # noqa: E402
+
+warm_up_application()
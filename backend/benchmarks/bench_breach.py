@@ -0,0 +1,122 @@
+"""
+Lookup speed of the breached-password index (accounts.breach) at scale.
+
+Writes an index of `--entries` uniformly spread random keys straight in
+sorted order (no text list or sort needed, so 100M+ entries fit in a few
+minutes and ~1 GB of disk), then times hits, misses and the full validator
+call. `--compile-entries` also times `compile_index` on a generated text
+list, which exercises the external sort.
+
+    cd backend
+    SECRET_KEY=x python benchmarks/bench_breach.py --entries 100000000
+    SECRET_KEY=x python benchmarks/bench_breach.py --index /var/lib/breach.idx
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "test_settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.exceptions import ValidationError  # noqa: E402
+
+from accounts.breach import (  # noqa: E402
+    DATA_OFFSET, BreachIndex, BreachedPasswordValidator, IndexWriter,
+    compile_index, write_sample_hash_list)
+
+
+def build_synthetic(path, entries, key_size, samples):
+    """Writes `entries` sorted random keys; returns `samples` of them."""
+    # One random key in each of `entries` equal slots of the key space:
+    # sorted, unique and spread like real hashes
+    slot = (1 << key_size * 8) // entries
+    step = max(entries // samples, 1)
+    picked = []
+    randrange = random.randrange
+    start = time.perf_counter()
+    with IndexWriter(path, key_size) as writer:
+        add = writer.add
+        for n in range(entries):
+            key = (n * slot + randrange(slot)).to_bytes(key_size, "big")
+            add(key)
+            if n % step == 0:
+                picked.append(key + bytes(20 - key_size))
+    print(f"built {entries:,} entries in {time.perf_counter() - start:.1f}s "
+          f"({os.path.getsize(path) / 1e6:,.0f} MB)")
+    return picked
+
+
+def bench_lookups(index, hits, count):
+    misses = [random.getrandbits(160).to_bytes(20, "big") for _ in range(count)]
+    hits = (hits * (count // max(len(hits), 1) + 1))[:count]
+    for label, digests in (("hit", hits), ("miss", misses)):
+        start = time.perf_counter()
+        found = sum(digest in index for digest in digests)
+        seconds = time.perf_counter() - start
+        print(f"{label:<10}{count / seconds:>12,.0f} lookups/s  "
+              f"({seconds / count * 1e6:6.2f} us each, {found:,} found)")
+
+
+def bench_validator(path, count):
+    validator = BreachedPasswordValidator(path)
+    passwords = [f"candidate password {n}" for n in range(count)]
+    start = time.perf_counter()
+    for password in passwords:
+        try:
+            validator.validate(password)
+        except ValidationError:
+            pass
+    seconds = time.perf_counter() - start
+    print(f"{'validate':<10}{count / seconds:>12,.0f} calls/s    "
+          f"({seconds / count * 1e6:6.2f} us each, includes SHA-1)")
+
+
+def bench_compile(directory, entries, run_size):
+    source = os.path.join(directory, "hashes.txt")
+    write_sample_hash_list(source, entries, seed=0)
+    start = time.perf_counter()
+    stats = compile_index([source], os.path.join(directory, "compiled.idx"),
+                          run_size=run_size, tmp_dir=directory)
+    seconds = time.perf_counter() - start
+    print(f"compiled {stats['entries']:,} entries from text in {seconds:.1f}s "
+          f"({stats['entries'] / seconds:,.0f}/s, {stats['runs']} runs)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--entries", type=int, default=100_000_000)
+    parser.add_argument("--key-bytes", type=int, default=10)
+    parser.add_argument("--lookups", type=int, default=200_000)
+    parser.add_argument("--index", help="Benchmark an existing index instead.")
+    parser.add_argument("--compile-entries", type=int, default=0)
+    parser.add_argument("--run-size", type=int, default=1_000_000)
+    parser.add_argument("--tmp-dir", help="Where to build (needs entries x key bytes free).")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.tmp_dir) as directory:
+        path = args.index
+        if path:
+            index = BreachIndex(path)
+            step = max(len(index) // 1000, 1)
+            hits = [index._mmap[off:off + index.key_size] + bytes(20 - index.key_size)
+                    for off in range(
+                        DATA_OFFSET, len(index._mmap), step * index.key_size)]
+        else:
+            path = os.path.join(directory, "breach.idx")
+            hits = build_synthetic(path, args.entries, args.key_bytes, 1000)
+            index = BreachIndex(path)
+        bench_lookups(index, hits, args.lookups)
+        bench_validator(path, args.lookups)
+        if args.compile_entries:
+            bench_compile(directory, args.compile_entries, args.run_size)
+
+
+if __name__ == "__main__":
+    main()
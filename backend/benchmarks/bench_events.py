@@ -0,0 +1,103 @@
+"""
+Throughput of the auth event log (accounts.events).
+
+Compares one synchronous INSERT per event (what an inline audit write would
+cost) with enqueueing from request threads and flushing in batches to the
+database and JSONL sinks. Runs against the test settings' in-memory SQLite
+unless DJANGO_SETTINGS_MODULE says otherwise:
+
+    cd backend
+    SECRET_KEY=x python benchmarks/bench_events.py --events 50000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "test_settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import transaction  # noqa: E402
+
+from accounts import events  # noqa: E402
+from accounts.models import AuthEvent  # noqa: E402
+
+
+def event(n):
+    return (events.LOGIN, n, None, "127.0.0.1", time.time(), {})
+
+
+def report(label, count, seconds):
+    print(f"{label:<40}{count / seconds:>14,.0f} events/s  ({seconds * 1000:8.1f} ms)")
+
+
+def bench_inline(count):
+    sink = events.DatabaseSink()
+    start = time.perf_counter()
+    for n in range(count):
+        with transaction.atomic():  # one autocommitted write per request
+            AuthEvent.objects.create(**sink._row(event(n)))
+    report("inline INSERT per event", count, time.perf_counter() - start)
+
+
+def bench_enqueue(count, threads):
+    log = events.EventLog(events.DatabaseSink(), capacity=count, flush_interval=0)
+    per_thread = count // threads
+
+    def produce():
+        for n in range(per_thread):
+            log.record(event(n))
+
+    workers = [threading.Thread(target=produce) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    report(f"enqueue ({threads} threads)", per_thread * threads,
+           time.perf_counter() - start)
+
+
+def bench_flush(label, sink, count, batch_size):
+    log = events.EventLog(sink, capacity=count, batch_size=batch_size, flush_interval=0)
+    for n in range(count):
+        log.record(event(n))
+    start = time.perf_counter()
+    log.flush()
+    report(f"{label} (batch {batch_size})", count, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--inline-events", type=int, default=2000,
+                        help="Events for the (slow) inline baseline.")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--batch-sizes", default="100,500,2000")
+    args = parser.parse_args()
+
+    call_command("migrate", verbosity=0)
+    bench_inline(args.inline_events)
+    bench_enqueue(args.events, args.threads)
+    for batch_size in map(int, args.batch_sizes.split(",")):
+        bench_flush("flush to AuthEvent", events.DatabaseSink(), args.events, batch_size)
+    with tempfile.TemporaryDirectory() as directory:
+        sink = events.JSONLSink(os.path.join(directory, "events.jsonl"))
+        bench_flush("flush to JSONL", sink, args.events, 500)
+
+    buffer = events.EventBuffer(capacity=1000)
+    for n in range(args.events):
+        buffer.put(event(n))
+    print(f"\nBounded buffer of 1000 after {args.events:,} events: "
+          f"{len(buffer)} held, {buffer.dropped:,} dropped (drop_oldest)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Memory and speed of the streaming session export (accounts.export).
+
+Creates `--sessions` DeviceSession rows, then compares serializing them all
+at once (what SessionListView-style code does) with streaming them through
+`export.render`. Reports rows per second and the peak Python allocation
+from tracemalloc. The streaming peak should stay flat as `--sessions`
+grows.
+
+    cd backend
+    SECRET_KEY=x python benchmarks/bench_export.py --sessions 200000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "test_settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+
+from accounts import export  # noqa: E402
+from accounts.models import DeviceSession, User  # noqa: E402
+from accounts.serializers import DeviceSessionSerializer  # noqa: E402
+from accounts.sharding import uuid7  # noqa: E402
+
+
+def seed(count):
+    user = User.objects.create_user(email="bench@example.com", password="unused")
+    batch = 5000
+    for start in range(0, count, batch):
+        DeviceSession.objects.bulk_create([
+            DeviceSession(id=uuid7(), user=user, device_name=f"Device {n}",
+                          refresh_token_jti=f"{n:032x}")
+            for n in range(start, min(start + batch, count))
+        ])
+
+
+def measure(label, func, count):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = func()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28}{count / seconds:>12,.0f} rows/s  peak {peak / 1e6:8.1f} MB  "
+          f"({size / 1e6:,.1f} MB out)")
+
+
+def load_all():
+    data = DeviceSessionSerializer(DeviceSession.objects.order_by("id"), many=True).data
+    return sum(len(str(row)) for row in data)
+
+
+def stream(output_format):
+    def run():
+        fields, rows = export.rows("sessions")
+        return sum(len(line) for line in export.render(fields, rows, output_format))
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", type=int, default=200_000)
+    args = parser.parse_args()
+
+    call_command("migrate", verbosity=0)
+    seed(args.sessions)
+    measure("serializer, all at once", load_all, args.sessions)
+    measure("streamed csv", stream("csv"), args.sessions)
+    measure("streamed jsonl", stream("jsonl"), args.sessions)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Per-request cost of accounts.profiling on GET /api/auth/me and POST
+/api/auth/refresh.
+
+Runs the same requests through Django's test client with profiling off,
+with only the slow-request watch on (SQL timeline and stack sampler, nothing
+stored), and with every request under cProfile and stored (SAMPLE_RATE 1).
+The watch is what production pays on every request; cProfile is what a
+profiled request pays.
+
+    cd backend
+    SECRET_KEY=x python benchmarks/bench_profiling.py --requests 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "test_settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from accounts.models import User  # noqa: E402
+from accounts.profiling import get_ring  # noqa: E402
+
+MODES = {
+    "off": {"ENABLED": False},
+    "slow watch": {"SLOW_THRESHOLD": 60},
+    "cProfile every request": {"SAMPLE_RATE": 1.0},
+}
+
+
+def login(client):
+    response = client.post("/api/auth/login", {
+        "email": "bench@example.com", "password": "benchpass123"}, format="json")
+    return response.data
+
+
+def run(client, tokens, count):
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+    start = time.perf_counter()
+    for _ in range(count):
+        client.get("/api/auth/me")
+    me = (time.perf_counter() - start) / count
+    client.credentials()
+    refresh = tokens["refresh"]
+    start = time.perf_counter()
+    for _ in range(count):
+        refresh = client.post("/api/auth/refresh", {"refresh": refresh},
+                              format="json").data["refresh"]
+    return me, (time.perf_counter() - start) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    call_command("migrate", verbosity=0)
+    User.objects.create_user(email="bench@example.com", password="benchpass123")
+    client = APIClient()
+    with tempfile.TemporaryDirectory() as directory:
+        for label, conf in MODES.items():
+            with override_settings(ALLOWED_HOSTS=["testserver"], PROFILING={
+                    **settings.PROFILING, "DIR": directory, "MAX_CAPTURES": 100, **conf}):
+                me, refresh = run(client, login(client), args.requests)
+                stored = len(get_ring().ids())
+            print(f"{label:<26}me {me * 1e6:8.0f} us   refresh {refresh * 1e6:8.0f} us"
+                  f"   ({stored} captures)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Registrations per second and the cost of the password pipeline
+(accounts.passwords).
+
+Compares Django's `validate_password` over the stock validators with the
+tiered pipeline, for accepted and rejected passwords, then times complete
+POST /api/auth/register requests. Argon2 dominates a real registration;
+pass `--hasher md5` to see what is left once hashing is taken out.
+
+    cd backend
+    SECRET_KEY=x python benchmarks/bench_register.py
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "test_settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import password_validation  # noqa: E402
+from django.core.exceptions import ValidationError  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from accounts import passwords  # noqa: E402
+from accounts.models import User  # noqa: E402
+
+STOCK_VALIDATORS = [
+    {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
+    {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator"},
+    {"NAME": "django.contrib.auth.password_validation.CommonPasswordValidator"},
+    {"NAME": "django.contrib.auth.password_validation.NumericPasswordValidator"},
+]
+HASHERS = {
+    "argon2": "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "md5": "django.contrib.auth.hashers.MD5PasswordHasher",
+}
+CASES = {
+    "accepted": "Qz7!mountain-lake",
+    "common": "password123",
+}
+
+
+def report(label, count, seconds):
+    print(f"{label:<44}{count / seconds:>12,.0f} /s  ({seconds / count * 1e6:9.1f} us each)")
+
+
+def timed(func, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        try:
+            func()
+        except ValidationError:
+            pass
+    return time.perf_counter() - start
+
+
+def bench_cold_start():
+    start = time.perf_counter()
+    password_validation.get_password_validators(STOCK_VALIDATORS)
+    stock = time.perf_counter() - start
+    passwords.load_password_list.cache_clear()
+    start = time.perf_counter()
+    password_validation.get_password_validators(settings.AUTH_PASSWORD_VALIDATORS)
+    tiered = time.perf_counter() - start
+    print(f"{'load validators (stock list)':<44}{stock * 1000:>12.1f} ms")
+    print(f"{'load validators (frozenset, at warm-up)':<44}{tiered * 1000:>12.1f} ms\n")
+
+
+def bench_validation(count):
+    stock = password_validation.get_password_validators(STOCK_VALIDATORS)
+    user = User(email="new.person@example.com", name="New Person")
+    for case, password in CASES.items():
+        report(f"stock validate_password ({case})", count, timed(
+            lambda: password_validation.validate_password(password, user, stock), count))
+        report(f"tiered validate_password ({case})", count, timed(
+            lambda: passwords.validate_password(password, user), count))
+    print()
+
+
+def bench_register(count, hasher):
+    client = APIClient()
+    with override_settings(PASSWORD_HASHERS=[HASHERS[hasher]], ALLOWED_HOSTS=["testserver"]):
+        start = time.perf_counter()
+        for n in range(count):
+            response = client.post("/api/auth/register", {
+                "email": f"user{n}@example.com", "name": "Bench",
+                "password": CASES["accepted"],
+            }, format="json")
+            assert response.status_code == 201, response.data
+        report(f"register ({hasher})", count, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for n in range(count):
+            client.post("/api/auth/register", {
+                "email": f"USER{n}@example.com", "name": "Bench",
+                "password": CASES["accepted"],
+            }, format="json")
+        report(f"register duplicate email ({hasher})", count, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--validations", type=int, default=5000)
+    parser.add_argument("--registrations", type=int, default=200)
+    parser.add_argument("--hasher", choices=sorted(HASHERS), default="argon2")
+    args = parser.parse_args()
+
+    call_command("migrate", verbosity=0)
+    bench_cold_start()
+    bench_validation(args.validations)
+    bench_register(args.registrations, args.hasher)
+
+
+if __name__ == "__main__":
+    main()
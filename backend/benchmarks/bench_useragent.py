@@ -0,0 +1,78 @@
+"""
+Cost of accounts.useragent.parse() at different cache-hit rates.
+
+Builds a stream of `--calls` User-Agents in which a `--hit-rate` share
+repeats a small set of common headers and the rest are unique (a Chrome
+build number nobody has sent before), then times parse() over the stream.
+The uncached line is the raw cost of the precompiled patterns on the common
+headers.
+
+    cd backend
+    SECRET_KEY=x python benchmarks/bench_useragent.py --calls 200000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "test_settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from accounts import useragent  # noqa: E402
+
+COMMON = [
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36 Edg/124.0.2478.51",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 "
+    "(KHTML, like Gecko) Version/17.4 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0.6367.82 Mobile Safari/537.36",
+    "Mozilla/5.0 (X11; Linux x86_64; rv:125.0) Gecko/20100101 Firefox/125.0",
+    "okhttp/4.12.0",
+    "MyApp/3.1 CFNetwork/1492.0.1 Darwin/23.3.0",
+]
+
+
+def stream(calls, hit_rate):
+    rng = random.Random(1)
+    return [
+        rng.choice(COMMON) if rng.random() < hit_rate else
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+        f"Chrome/124.0.{n}.{rng.randrange(1000)} Safari/537.36"
+        for n in range(calls)
+    ]
+
+
+def timed(func, user_agents):
+    start = time.perf_counter()
+    for user_agent in user_agents:
+        func(user_agent)
+    return (time.perf_counter() - start) / len(user_agents)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--calls", type=int, default=200_000)
+    args = parser.parse_args()
+
+    uncached = useragent._parse.__wrapped__
+    print(f"{'uncached, common headers':<28}"
+          f"{timed(uncached, stream(args.calls, 1.0)) * 1e6:8.2f} us/call")
+    for hit_rate in (0.0, 0.5, 0.9, 0.99, 1.0):
+        user_agents = stream(args.calls, hit_rate)
+        useragent.parse.cache_clear()
+        seconds = timed(useragent.parse, user_agents)
+        info = useragent.parse.cache_info()
+        print(f"{f'hit rate {hit_rate:.0%}':<28}{seconds * 1e6:8.2f} us/call"
+              f"   ({info.hits / (info.hits + info.misses):.1%} hits)")
+
+
+if __name__ == "__main__":
+    main()
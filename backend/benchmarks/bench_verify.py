@@ -0,0 +1,118 @@
+"""
+Access-token checks per second: the Django-free verify app
+(auth_service.verify_asgi) against GET /api/auth/me through Django's ASGI
+handler.
+
+Both are driven in-process by the same minimal ASGI client, so the numbers
+leave out the server and the network and show what each app costs per
+request. Requests are sent one at a time, then `--concurrency` at a time.
+Django runs sync views in a single executor thread, so the SQLite database
+is a temporary file rather than the test settings' in-memory one.
+
+    cd backend
+    SECRET_KEY=x python benchmarks/bench_verify.py --requests 5000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "test_settings")
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+TMP_DIR = tempfile.TemporaryDirectory()
+for alias, database in settings.DATABASES.items():
+    if database["ENGINE"].endswith("sqlite3"):
+        database["NAME"] = os.path.join(TMP_DIR.name, f"{alias}.sqlite3")
+
+django.setup()
+
+from django.core.asgi import get_asgi_application  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from rest_framework_simplejwt.tokens import RefreshToken  # noqa: E402
+
+from accounts.models import User  # noqa: E402
+from accounts.sessions import SESSION_ID_CLAIM  # noqa: E402
+from auth_service.verify_asgi import VerifyApp  # noqa: E402
+
+
+async def request(app, path, token):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "", "server": ("testserver", 80),
+        "client": ("127.0.0.1", 50000),
+        "headers": [(b"host", b"testserver"),
+                    (b"authorization", f"Bearer {token}".encode())],
+    }
+    result = {}
+    body_sent = False
+
+    async def receive():
+        nonlocal body_sent
+        if body_sent:
+            # Like a server, only report a disconnect once there is one
+            await asyncio.Event().wait()
+        body_sent = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+
+    await app(scope, receive, send)
+    return result["status"]
+
+
+async def run(app, path, token, count, concurrency):
+    async def worker(share):
+        for _ in range(share):
+            status = await request(app, path, token)
+            assert status == 200, status
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(count // concurrency) for _ in range(concurrency)))
+    return time.perf_counter() - start
+
+
+def report(label, count, seconds):
+    print(f"{label:<36}{count / seconds:>12,.0f} req/s  ({seconds / count * 1e6:8.1f} us each)")
+    return count / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    call_command("migrate", verbosity=0)
+    user = User.objects.create_user(email="bench@example.com", password="unused")
+    refresh = RefreshToken.for_user(user)
+    refresh[SESSION_ID_CLAIM] = str(uuid.uuid4())
+    token = str(refresh.access_token)
+
+    apps = {
+        "verify app": (VerifyApp(), "/api/auth/verify"),
+        "django /api/auth/me": (get_asgi_application(), "/api/auth/me"),
+    }
+    with override_settings(ALLOWED_HOSTS=["testserver"]):
+        for concurrency in (1, args.concurrency):
+            rates = {}
+            for label, (app, path) in apps.items():
+                asyncio.run(run(app, path, token, 100, 1))  # warm up
+                count = args.requests - args.requests % concurrency
+                seconds = asyncio.run(run(app, path, token, count, concurrency))
+                rates[label] = report(f"{label} (concurrency {concurrency})", count, seconds)
+            print(f"{'speedup':<36}{rates['verify app'] / rates['django /api/auth/me']:>12.1f}x\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Local load generator: a login spike against steady refresh and me traffic.
+
+Serves the project from a threaded WSGI server on 127.0.0.1, logs in one
+session per "protected" client, then for `--duration` seconds runs:
+
+* `--protected` clients looping GET /api/auth/me, with a refresh every
+  `--refresh-every` requests;
+* `--spike` clients looping POST /api/auth/login (Argon2) as fast as they
+  can.
+
+It does this once with load shedding off and once with it on
+(accounts.shedding), then prints throughput, status codes and latency
+percentiles per endpoint, and the limits from /api/health/load. The
+database is a temporary SQLite file.
+
+    cd backend
+    SECRET_KEY=x python benchmarks/loadgen.py --spike 32 --protected 8 --duration 10
+"""
+import argparse
+import collections
+import http.client
+import json
+import os
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "test_settings")
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+TMP_DIR = tempfile.TemporaryDirectory()
+for alias, database in settings.DATABASES.items():
+    if database["ENGINE"].endswith("sqlite3"):
+        database["NAME"] = os.path.join(TMP_DIR.name, f"{alias}.sqlite3")
+        # Writers queue for the lock up front instead of failing with
+        # "database is locked" when a read transaction tries to write
+        database["OPTIONS"] = {"timeout": 60, "transaction_mode": "IMMEDIATE"}
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+from django.test import override_settings  # noqa: E402
+
+from accounts import shedding  # noqa: E402
+from accounts.models import User  # noqa: E402
+
+PASSWORD = "Qz7!mountain-lake"
+
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class Client:
+    def __init__(self, port, stats):
+        self.port = port
+        self.stats = stats
+
+    def call(self, label, method, path, body=None, token=None):
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=120)
+        start = time.perf_counter()
+        try:
+            connection.request(method, path, body and json.dumps(body), headers)
+            response = connection.getresponse()
+            data = response.read()
+        finally:
+            connection.close()
+        self.stats.add(label, response.status, time.perf_counter() - start)
+        if response.getheader("Content-Type") != "application/json":
+            return response.status, None
+        return response.status, json.loads(data)
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = collections.defaultdict(list)
+        self.statuses = collections.defaultdict(collections.Counter)
+        self.recording = False
+
+    def add(self, label, status, seconds):
+        if not self.recording:
+            return
+        with self.lock:
+            self.statuses[label][status] += 1
+            if status < 500 and status != 429:
+                self.latencies[label].append(seconds)
+
+    def report(self, duration):
+        print(f"  {'endpoint':<10}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}  statuses")
+        for label in sorted(self.statuses):
+            latencies = sorted(self.latencies[label]) or [0.0]
+            total = sum(self.statuses[label].values())
+            p50 = latencies[len(latencies) // 2] * 1000
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+            statuses = ", ".join(
+                f"{status}: {count}" for status, count in sorted(self.statuses[label].items()))
+            print(f"  {label:<10}{total / duration:>9.1f}{p50:>9.1f}{p99:>9.1f}  {statuses}")
+
+
+def protected_client(client, email, stop, refresh_every):
+    status, data = client.call("login", "POST", "/api/auth/login", {
+        "email": email, "password": PASSWORD, "device_name": "loadgen"})
+    assert status == 200, (status, data)
+    access, refresh = data["access"], data["refresh"]
+    n = 0
+    while not stop.is_set():
+        n += 1
+        if n % refresh_every == 0:
+            status, data = client.call("refresh", "POST", "/api/auth/refresh", {"refresh": refresh})
+            if status == 200:
+                access, refresh = data["access"], data["refresh"]
+        else:
+            client.call("me", "GET", "/api/auth/me", token=access)
+
+
+def spike_client(client, email, stop):
+    while not stop.is_set():
+        client.call("login", "POST", "/api/auth/login", {
+            "email": email, "password": PASSWORD, "device_name": "spike"})
+
+
+def run(port, args, users, enabled):
+    shedding._shedder = None  # start from the initial limits
+    stats = Stats()
+    stop = threading.Event()
+    conf = {**settings.LOAD_SHEDDING, "ENABLED": enabled}
+    with override_settings(LOAD_SHEDDING=conf):
+        client = Client(port, stats)
+        threads = [threading.Thread(
+            target=protected_client, args=(client, users[n], stop, args.refresh_every))
+            for n in range(args.protected)]
+        for thread in threads:
+            thread.start()
+        time.sleep(2)  # protected sessions log in before the spike
+        stats.recording = True
+        spikes = [threading.Thread(target=spike_client, args=(client, users[-1], stop))
+                  for _ in range(args.spike)]
+        for thread in spikes:
+            thread.start()
+        time.sleep(args.duration)
+        stats.recording = False
+        stop.set()
+        for thread in threads + spikes:
+            thread.join()
+        _, load = Client(port, Stats()).call("load", "GET", "/api/health/load")
+
+    print(f"load shedding {'on' if enabled else 'off'}:")
+    stats.report(args.duration)
+    if enabled:
+        for name, route in load["routes"].items():
+            print(f"  limit {name:<14}{route['limit']:>4}  shed {route['shed']}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--spike", type=int, default=32, help="Clients looping login.")
+    parser.add_argument("--protected", type=int, default=8, help="Clients looping me/refresh.")
+    parser.add_argument("--refresh-every", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    call_command("migrate", verbosity=0)
+    users = [f"user{n}@example.com" for n in range(args.protected + 1)]
+    for email in users:
+        User.objects.create_user(email=email, password=PASSWORD)
+
+    host_settings = override_settings(ALLOWED_HOSTS=["127.0.0.1"])
+    host_settings.enable()
+    server = ThreadingWSGIServer(("127.0.0.1", 0), QuietHandler)
+    server.set_app(get_wsgi_application())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        for enabled in (False, True):
+            run(server.server_port, args, users, enabled)
+    finally:
+        server.shutdown()
+        host_settings.disable()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Per-test timing and query-count report.
+
+`pytest --perf-report` lists the slowest tests and the tests issuing the
+most SQL queries at the end of the run; `--perf-report-json PATH` writes
+every test's numbers for CI to keep. Queries are counted on every database
+alias, on the test's own thread (not on threads it starts). Works under
+pytest-xdist: counts travel back from the workers in `user_properties`.
+"""
+import json
+
+import pytest
+from django.db import connections
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("perf-report")
+    group.addoption(
+        "--perf-report", nargs="?", type=int, const=10, default=None, metavar="N",
+        help="Print the N slowest and most query-heavy tests (default 10).")
+    group.addoption(
+        "--perf-report-json", metavar="PATH",
+        help="Write per-test duration and query count as JSON.")
+
+
+def _enabled(config):
+    return (config.getoption("perf_report") is not None
+            or config.getoption("perf_report_json"))
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@pytest.fixture(autouse=True)
+def _count_queries(request):
+    if not _enabled(request.config):
+        yield
+        return
+    counter = QueryCounter()
+    wrapped = [connections[alias] for alias in connections]
+    for connection in wrapped:
+        connection.execute_wrappers.append(counter)
+    try:
+        yield
+    finally:
+        for connection in wrapped:
+            connection.execute_wrappers.remove(counter)
+        request.node.user_properties.append(("queries", counter.count))
+
+
+class PerfReport:
+    def __init__(self, config):
+        self.config = config
+        self.tests = {}
+
+    def pytest_runtest_logreport(self, report):
+        entry = self.tests.setdefault(report.nodeid, {"seconds": 0.0, "queries": 0})
+        entry["seconds"] += report.duration  # setup, call and teardown
+        queries = dict(report.user_properties).get("queries")
+        if queries is not None:
+            entry["queries"] = queries
+
+    def pytest_terminal_summary(self, terminalreporter):
+        limit = self.config.getoption("perf_report")
+        path = self.config.getoption("perf_report_json")
+        if path:
+            with open(path, "w") as f:
+                json.dump(self.tests, f, indent=2, sort_keys=True)
+        if limit is None or not self.tests:
+            return
+        write = terminalreporter.write_line
+        total = sum(entry["queries"] for entry in self.tests.values())
+        for title, key in (("slowest tests", "seconds"), ("most queries", "queries")):
+            terminalreporter.section(f"perf report: {title}")
+            ranked = sorted(self.tests.items(), key=lambda item: -item[1][key])
+            for nodeid, entry in ranked[:limit]:
+                write(f"{entry['seconds']:8.2f}s {entry['queries']:6} queries  {nodeid}")
+        write(f"{len(self.tests)} tests, {total} queries")
+
+
+def pytest_sessionfinish(session):
+    # Events recorded by the last tests would be flushed at exit, after the
+    # test databases are gone
+    from accounts import events
+    events.shutdown(flush=False)
+
+
+def pytest_configure(config):
+    if _enabled(config):
+        config.pluginmanager.register(PerfReport(config), "perf-report")
@@ -0,0 +1,129 @@
+import gzip
+import hashlib
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from accounts.breach import (
+    BreachIndex, IndexWriter, compile_index, open_index, write_sample_hash_list)
+
+BREACHED = ['Qz7!mountain-lake', 'correct horse battery staple']
+
+
+def sha1(password):
+    return hashlib.sha1(password.encode('utf-8')).digest()
+
+
+class BreachIndexTestCase(SimpleTestCase):
+    """
+    Tests for compiling and searching the breached-password index.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.source = os.path.join(self.directory, 'hashes.txt')
+        self.output = os.path.join(self.directory, 'breach.idx')
+        write_sample_hash_list(self.source, 2000, passwords=BREACHED, seed=1)
+
+    def test_compile_and_lookup(self):
+        """Test every listed hash is found and other passwords are not."""
+        stats = compile_index([self.source], self.output, run_size=300)
+        self.assertEqual(stats['runs'], 7)
+        index = BreachIndex(self.output)
+        self.assertEqual(len(index), 2002)
+        for password in BREACHED:
+            self.assertTrue(index.contains_password(password))
+        self.assertFalse(index.contains_password('not in the list'))
+        with open(self.source) as f:
+            for line in f:
+                self.assertIn(bytes.fromhex(line.split(':')[0]), index)
+
+    def test_duplicates_merged_across_runs(self):
+        """Test the same hash in several runs and files is stored once."""
+        copy = self.source + '.gz'
+        with open(self.source, 'rb') as f, gzip.open(copy, 'wb') as out:
+            out.write(f.read())
+        compile_index([self.source, copy], self.output, run_size=500)
+        self.assertEqual(len(BreachIndex(self.output)), 2002)
+        self.assertEqual(
+            os.path.getsize(self.output), 32 + 65536 * 8 + 2002 * 10)
+
+    def test_short_keys_and_min_count(self):
+        """Test truncated keys still match and rare hashes can be left out."""
+        with open(self.source, 'a') as f:
+            f.write(f'{sha1("rare password").hex().upper()}:1\nnot-a-hash\n\n')
+        stats = compile_index([self.source], self.output, key_size=6, min_count=2)
+        index = BreachIndex(self.output)
+        self.assertEqual(index.key_size, 6)
+        self.assertFalse(index.contains_password('rare password'))
+        self.assertGreaterEqual(stats['skipped'], 2)
+
+    def test_writer_rejects_unsorted_keys(self):
+        """Test out-of-order keys abort the write and leave no file behind."""
+        with self.assertRaises(ValueError):
+            with IndexWriter(self.output) as writer:
+                writer.add(b'\x02' * 10)
+                writer.add(b'\x01' * 10)
+        self.assertEqual(os.listdir(self.directory), ['hashes.txt'])
+
+    def test_rejects_other_files(self):
+        """Test a file that is not an index is refused."""
+        with self.assertRaises(ValueError):
+            BreachIndex(self.source)
+
+    def test_command(self):
+        """Test the management command compiles and reports the index."""
+        out = StringIO()
+        call_command('compile_breach_index', self.source, '-o', self.output, stdout=out)
+        self.assertIn('Wrote 2,002 hashes', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('compile_breach_index', 'missing.txt', '-o', self.output)
+
+
+class BreachedPasswordValidatorTestCase(APITestCase):
+    """
+    Tests for rejecting breached passwords at registration.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        source = os.path.join(cls.directory, 'hashes.txt')
+        cls.index_path = os.path.join(cls.directory, 'breach.idx')
+        write_sample_hash_list(source, 100, passwords=BREACHED, seed=2)
+        compile_index([source], cls.index_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        open_index.cache_clear()
+        shutil.rmtree(cls.directory)
+        super().tearDownClass()
+
+    def register(self, password):
+        validators = [{
+            'NAME': 'accounts.breach.BreachedPasswordValidator',
+            'OPTIONS': {'index_path': self.index_path},
+        }]
+        with self.settings(AUTH_PASSWORD_VALIDATORS=validators):
+            return APIClient().post('/api/auth/register', {
+                'email': 'new.person@example.com', 'password': password,
+            }, format='json')
+
+    def test_breached_password_rejected(self):
+        """Test a password from the index is rejected."""
+        response = self.register(BREACHED[0])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('This password has appeared in a data breach.', response.data['password'])
+
+    def test_other_password_accepted(self):
+        """Test a password missing from the index is accepted."""
+        response = self.register('an unlisted passphrase')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
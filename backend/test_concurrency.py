@@ -0,0 +1,80 @@
+import threading
+import unittest
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test import TransactionTestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import DeviceSession
+from test_fixtures import PASSWORD, mint_tokens, use_revocation_registry
+
+User = get_user_model()
+
+# Requests sent at once
+CONCURRENCY = 8
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql',
+                     'needs PostgreSQL: set TEST_DATABASE_HOST')
+class RefreshRotationRaceTestCase(TransactionTestCase):
+    """
+    Tests for concurrent refreshes of one token against real row locks.
+    Requests run on their own threads and database connections, so data
+    is committed rather than held in a test transaction.
+    """
+    databases = {'default', 'sessions_1'}
+
+    def setUp(self):
+        use_revocation_registry(self)
+        self.user = User.objects.create_user(email='test@example.com', password=PASSWORD)
+        self.tokens = mint_tokens(self.user)
+
+    def race(self, send):
+        """Calls `send()` from CONCURRENCY threads released together."""
+        barrier = threading.Barrier(CONCURRENCY)
+        responses = [None] * CONCURRENCY
+
+        def run(index):
+            try:
+                barrier.wait()
+                responses[index] = send()
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=run, args=(index,)) for index in range(CONCURRENCY)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return responses
+
+    def refresh(self):
+        return APIClient().post(
+            '/api/auth/refresh', {'refresh': self.tokens['refresh']}, format='json')
+
+    @override_settings(IDEMPOTENCY={**settings.IDEMPOTENCY, 'REFRESH_GRACE': 0})
+    def test_concurrent_refresh_rotates_once(self):
+        """Test one of several simultaneous refreshes of a token wins and the rest are refused."""
+        responses = self.race(self.refresh)
+        codes = sorted(response.status_code for response in responses)
+        self.assertEqual(codes, [status.HTTP_200_OK] + [status.HTTP_401_UNAUTHORIZED] * (CONCURRENCY - 1))
+        [winner] = [response for response in responses if response.status_code == status.HTTP_200_OK]
+
+        session = DeviceSession.objects.get(pk=self.tokens['session_id'])
+        self.assertEqual(session.refresh_token_jti, RefreshToken(winner.data['refresh'])['jti'])
+        old_jti = RefreshToken(self.tokens['refresh'], verify=False)['jti']
+        self.assertEqual(BlacklistedToken.objects.filter(token__jti=old_jti).count(), 1)
+
+    def test_concurrent_retries_get_one_rotation(self):
+        """Test simultaneous retries within the grace window all get the same new tokens."""
+        responses = self.race(self.refresh)
+        self.assertEqual({response.status_code for response in responses}, {status.HTTP_200_OK})
+        self.assertEqual(len({response.data['refresh'] for response in responses}), 1)
+        session = DeviceSession.objects.get(pk=self.tokens['session_id'])
+        self.assertEqual(session.refresh_token_jti,
+                         RefreshToken(responses[0].data['refresh'])['jti'])
@@ -0,0 +1,102 @@
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+User = get_user_model()
+
+INDEX = 'accounts_user_email_ci_unique'
+
+
+class CaseInsensitiveEmailTestCase(APITestCase):
+    """
+    Tests for case-insensitive email uniqueness and lookups.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='Test.User@Example.com', password='testpass123')
+
+    def test_login_ignores_case(self):
+        """Test login matches the email regardless of case."""
+        response = self.client.post('/api/auth/login', {
+            'email': 'test.user@example.COM', 'password': 'testpass123',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['user']['id'], self.user.id)
+
+    def test_register_rejects_case_variant(self):
+        """Test registration rejects an email that differs only in case."""
+        response = self.client.post('/api/auth/register', {
+            'email': 'TEST.USER@example.com', 'name': 'Other', 'password': 'testpass123',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('email', response.data)
+
+    def test_database_rejects_case_variant(self):
+        """Test the functional unique index rejects case variants."""
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create_user(email='test.user@example.com', password='testpass123')
+
+    def test_iexact_and_lower_lookups(self):
+        """Test both lookups find the user."""
+        self.assertEqual(User.objects.get(email__iexact='TEST.USER@EXAMPLE.COM'), self.user)
+        self.assertEqual(User.objects.get(email__lower='test.user@example.com'), self.user)
+        self.assertEqual(User.objects.get_by_natural_key('test.user@example.com'), self.user)
+
+    def test_lookups_use_functional_index(self):
+        """Test the query plans search the LOWER(email) index instead of scanning."""
+        if connection.vendor == 'postgresql':
+            # Stop the planner from preferring a scan of the near-empty
+            # table, so the plan shows whether the index matches the lookup
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            table_scan = 'Seq Scan'
+        else:
+            table_scan = 'SCAN'
+        for queryset in (
+            User.objects.filter(email__iexact='test.user@example.com'),
+            User.objects.filter(email__lower='test.user@example.com'),
+        ):
+            plan = queryset.explain()
+            self.assertIn(INDEX, plan)
+            self.assertNotIn(table_scan, plan)
+
+
+class EmailCollisionMigrationTestCase(TransactionTestCase):
+    """
+    Tests for the collision report run before the unique index is built.
+    """
+    before = [('accounts', '0006_authevent_outboxcursor')]
+    after = [('accounts', '0007_user_email_ci_unique')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        # Back to the latest migrations, not just `after`, for later tests
+        User.objects.all().delete()
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_collisions_are_reported_together(self):
+        """Test every colliding group is listed before the migration fails."""
+        old_apps = self.migrate(self.before)
+        OldUser = old_apps.get_model('accounts', 'User')
+        for email in ('a@example.com', 'A@example.com', 'b@example.com',
+                      'B@Example.com', 'c@example.com'):
+            OldUser.objects.create(email=email)
+
+        with self.assertRaisesMessage(RuntimeError, '2 email address(es)') as caught:
+            self.migrate(self.after)
+        message = str(caught.exception)
+        self.assertIn('A@example.com', message)
+        self.assertIn('B@Example.com', message)
+        self.assertNotIn('c@example.com', message)
+
+        OldUser.objects.filter(email__in=['A@example.com', 'B@Example.com']).delete()
+        self.migrate(self.after)
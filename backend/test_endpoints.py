@@ -1,7 +1,10 @@
+from unittest import mock
+
 from rest_framework import status
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase, APIClient
 from rest_framework_simplejwt.tokens import RefreshToken
+from dj_rest_auth.registration.serializers import SocialLoginSerializer
 
 from accounts.models import DeviceSession
 
@@ -358,3 +361,21 @@ class AuthEndpointsTestCase(APITestCase):
         url = f'/api/auth/sessions/{session.id}/revoke'
         response = self.client.post(url, {}, format='json')
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    # === GOOGLE LOGIN VIEW TESTS ===
+
+    def test_google_login_success(self):
+        """Test a successful Google login returns JWTs and creates a device session."""
+        user = self.create_user()
+        user.backend = 'django.contrib.auth.backends.ModelBackend'
+        with mock.patch.object(SocialLoginSerializer, 'validate', return_value={'user': user}):
+            response = self.client.post('/api/auth/google', {
+                'access_token': 'google-token', 'device_name': 'Test Device'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('access', response.data)
+        self.assertIn('refresh', response.data)
+        self.assertEqual(response.data['user']['email'], user.email)
+        session = DeviceSession.objects.get(user=user)
+        self.assertEqual(session.device_name, 'Test Device')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.assertEqual(self.client.get(self.me_url).status_code, status.HTTP_200_OK)
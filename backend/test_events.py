@@ -0,0 +1,277 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import SimpleTestCase, TransactionTestCase
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from accounts import events
+from accounts.models import AuthEvent, OutboxCursor
+
+User = get_user_model()
+
+
+def make_event(n):
+    return ("login", n, None, "127.0.0.1", 1700000000.0 + n, {})
+
+
+class ListSink:
+    def __init__(self):
+        self.batches = []
+
+    def write(self, batch):
+        self.batches.append(batch)
+
+
+class EventBufferTestCase(SimpleTestCase):
+    """
+    Tests for the bounded buffer, its overflow policies and the flusher.
+    """
+
+    def test_drop_oldest_keeps_newest_events(self):
+        """Test a full buffer evicts the oldest event and counts the drop."""
+        buffer = events.EventBuffer(capacity=3)
+        for n in range(5):
+            buffer.put(make_event(n))
+        self.assertEqual(buffer.dropped, 2)
+        self.assertEqual([e[1] for e in buffer.drain(10)], [2, 3, 4])
+
+    def test_drop_newest_rejects_new_events(self):
+        """Test the drop_newest policy keeps what is already buffered."""
+        buffer = events.EventBuffer(capacity=3, overflow="drop_newest")
+        results = [buffer.put(make_event(n)) for n in range(5)]
+        self.assertEqual(results, [True, True, True, False, False])
+        self.assertEqual([e[1] for e in buffer.drain(10)], [0, 1, 2])
+
+    def test_block_waits_for_the_flusher(self):
+        """Test the block policy admits an event once space frees up."""
+        buffer = events.EventBuffer(capacity=1, overflow="block", block_timeout=5)
+        buffer.put(make_event(0))
+        threading.Timer(0.05, buffer.drain, args=(1,)).start()
+        self.assertTrue(buffer.put(make_event(1)))
+        self.assertEqual(buffer.dropped, 0)
+
+    def test_flush_writes_in_batches(self):
+        """Test flush() drains everything in batches of BATCH_SIZE."""
+        sink = ListSink()
+        log = events.EventLog(sink, batch_size=2, flush_interval=0)
+        for n in range(5):
+            log.record(make_event(n))
+        self.assertEqual(log.flush(), 5)
+        self.assertEqual([len(b) for b in sink.batches], [2, 2, 1])
+
+    def test_background_flusher(self):
+        """Test the flusher thread writes a full batch without being asked."""
+        sink = ListSink()
+        log = events.EventLog(sink, batch_size=2, flush_interval=30).start()
+        log.record(make_event(0))
+        log.record(make_event(1))
+        for _ in range(100):  # wakes up as soon as the batch is full
+            if log.written:
+                break
+            time.sleep(0.01)
+        self.assertEqual(log.written, 2)
+        log.close()
+
+    def test_shutdown(self):
+        """Test shutdown() flushes or discards the process-wide log and detaches it."""
+        for flush, written in ((True, 1), (False, 0)):
+            sink = ListSink()
+            log = events.EventLog(sink, flush_interval=30).start()
+            log.record(make_event(0))
+            with mock.patch.object(events, '_log', log):
+                events.shutdown(flush=flush)
+                self.assertIsNone(events._log)
+            self.assertEqual(sum(len(b) for b in sink.batches), written)
+            self.assertFalse(log._thread.is_alive())
+
+    def test_failing_sink_drops_batch(self):
+        """Test a sink error is logged and does not wedge the buffer."""
+        sink = mock.Mock()
+        sink.write.side_effect = RuntimeError
+        log = events.EventLog(sink, batch_size=10, flush_interval=0)
+        log.record(make_event(0))
+        with self.assertLogs("accounts.events", "ERROR"):
+            self.assertEqual(log.flush(), 0)
+        self.assertEqual(log.buffer.dropped, 1)
+        self.assertEqual(len(log.buffer), 0)
+
+    def test_jsonl_sink_rotates(self):
+        """Test the JSONL sink appends lines and rotates past max_bytes."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "events.jsonl")
+            sink = events.JSONLSink(path, max_bytes=200)
+            sink.write([make_event(0)])
+            with open(path) as handle:
+                self.assertEqual(json.loads(handle.readline())["user_id"], 0)
+            sink.write([make_event(n) for n in range(1, 4)])
+            self.assertFalse(os.path.exists(path))
+            self.assertEqual(len(os.listdir(directory)), 1)
+
+
+class AuthEventEndpointTestCase(APITestCase):
+    """
+    Tests that the auth endpoints record events without writing them inline.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123')
+        self.log = events.EventLog(events.DatabaseSink(), flush_interval=0)
+        patcher = mock.patch.object(events, '_log', self.log)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def login(self, password='testpass123'):
+        return self.client.post('/api/auth/login', {
+            'email': self.user.email, 'password': password, 'device_name': 'Test Device',
+        }, format='json')
+
+    def test_events_are_buffered_then_flushed(self):
+        """Test login, refresh, revoke and logout events reach the table on flush."""
+        self.assertEqual(self.login('wrongpass').status_code, status.HTTP_401_UNAUTHORIZED)
+        data = self.login().data
+        response = self.client.post('/api/auth/refresh', {'refresh': data['refresh']}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        other = self.login().data
+        self.client.post(f'/api/auth/sessions/{other["session_id"]}/revoke', {}, format='json')
+        self.client.post('/api/auth/logout', {'refresh': response.data['refresh']}, format='json')
+
+        self.assertFalse(AuthEvent.objects.exists())
+        self.log.flush()
+        rows = list(AuthEvent.objects.order_by('id'))
+        self.assertEqual([r.kind for r in rows],
+                         ['login_failed', 'login', 'refresh', 'login', 'revoke', 'logout'])
+        self.assertEqual(rows[0].data, {'email': 'test@example.com'})
+        self.assertEqual(str(rows[1].session_id), data['session_id'])
+        self.assertEqual(rows[2].user_id, self.user.pk)
+        self.assertEqual(rows[1].ip, '127.0.0.1')
+
+    def test_disabled(self):
+        """Test nothing is buffered when the event log is disabled."""
+        with self.settings(AUTH_EVENTS={'ENABLED': False}):
+            self.login()
+        self.assertEqual(len(self.log.buffer), 0)
+
+
+class Hook(BaseHTTPRequestHandler):
+    received = []
+    fail = False
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if Hook.fail:
+            self.send_response(500)
+        else:
+            Hook.received.extend(json.loads(body))
+            self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class OutboxTestCase(APITestCase):
+    """
+    Tests for delivering AuthEvent rows to a webhook stub.
+    """
+
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), Hook)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        Hook.received, Hook.fail = [], False
+        self.url = f'http://127.0.0.1:{self.server.server_port}/hook'
+        self.subscriber = events.WebhookSubscriber('hook', self.url)
+        events.DatabaseSink().write([make_event(n) for n in range(3)])
+
+    def test_dispatch_advances_cursor(self):
+        """Test events are delivered in order and only once."""
+        self.assertEqual(events.dispatch(self.subscriber, batch_size=2), 2)
+        self.assertEqual(events.dispatch(self.subscriber, batch_size=2), 1)
+        self.assertEqual(events.dispatch(self.subscriber), 0)
+        self.assertEqual([e['user_id'] for e in Hook.received], [0, 1, 2])
+        self.assertEqual(OutboxCursor.objects.get(name='hook').position,
+                         AuthEvent.objects.latest('id').id)
+
+    def test_failed_delivery_is_retried(self):
+        """Test a failed POST leaves the cursor where it was."""
+        Hook.fail = True
+        with self.assertRaises(Exception):
+            events.dispatch(self.subscriber)
+        self.assertEqual(OutboxCursor.objects.filter(name='hook', position__gt=0).count(), 0)
+        Hook.fail = False
+        self.assertEqual(events.dispatch(self.subscriber), 3)
+
+    def test_dispatch_command(self):
+        """Test the management command drains the outbox with --once."""
+        subscribers = [{'NAME': 'hook', 'CLASS': 'accounts.events.WebhookSubscriber',
+                        'OPTIONS': {'url': self.url}}]
+        out = StringIO()
+        with self.settings(AUTH_EVENT_SUBSCRIBERS=subscribers):
+            call_command('dispatch_auth_events', '--once', stdout=out)
+        self.assertIn('hook: delivered 3 event(s)', out.getvalue())
+        self.assertEqual(len(Hook.received), 3)
+
+
+class ListSubscriber:
+    name = 'list'
+
+    def __init__(self):
+        self.received = []
+
+    def deliver(self, events):
+        self.received.extend(event.user_id for event in events)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql',
+                     'needs PostgreSQL: set TEST_DATABASE_HOST')
+class OutboxCommitOrderTestCase(TransactionTestCase):
+    """
+    Tests for dispatching while two flushers write concurrently.
+    """
+
+    def test_late_commit_of_lower_id_is_delivered(self):
+        """Test an event written first but committed last is still dispatched."""
+        sink = events.DatabaseSink()
+        written, release = threading.Event(), threading.Event()
+
+        def slow_writer():
+            try:
+                with transaction.atomic():
+                    sink.write([make_event(1)])
+                    written.set()
+                    release.wait(5)
+            finally:
+                connections.close_all()
+
+        def fast_writer():
+            try:
+                sink.write([make_event(2)])
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=slow_writer), threading.Thread(target=fast_writer)]
+        threads[0].start()
+        written.wait(5)
+        threads[1].start()
+        time.sleep(0.2)  # the fast writer commits now unless writers take turns
+
+        subscriber = ListSubscriber()
+        events.dispatch(subscriber)
+        release.set()
+        for thread in threads:
+            thread.join()
+        events.dispatch(subscriber)
+        self.assertEqual(sorted(subscriber.received), [1, 2])
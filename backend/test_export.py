@@ -0,0 +1,187 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.http import StreamingHttpResponse
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts import events, export
+from accounts.admin import EstimatedCountPaginator
+from accounts.export import SESSION_FIELDS
+from accounts.models import DeviceSession
+from accounts.sharding import new_session_id, shard_for_user
+
+User = get_user_model()
+
+
+class ExportTestCase(APITestCase):
+    """
+    Tests for the streaming session and user exports.
+    """
+    databases = {'default', 'sessions_1'}
+
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user(
+            email='staff@example.com', password='testpass123', is_staff=True)
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123')
+        self.sessions = [
+            DeviceSession.objects.create(user=self.user, device_name=name, revoked=revoked)
+            for name, revoked in (('Phone', False), ('Laptop', True), ('Tablet', False))
+        ]
+        DeviceSession.objects.filter(pk=self.sessions[0].pk).update(
+            created_at=datetime(2024, 1, 1, tzinfo=timezone.utc))
+        DeviceSession.objects.create(user=self.staff, device_name='Desk')
+        self.client.force_authenticate(self.staff)
+
+    def export(self, kind='sessions', **params):
+        response = self.client.get(f'/api/export/{kind}', params)
+        if response.status_code != status.HTTP_200_OK:
+            return response, None
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertFalse(response.is_async)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv_export(self):
+        """Test every session is streamed as CSV with a header row."""
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="sessions-', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(tuple(rows[0]), SESSION_FIELDS)
+        self.assertEqual(len(rows), 4)
+        laptop = next(row for row in rows if row['device_name'] == 'Laptop')
+        self.assertEqual(laptop['revoked'], 'True')
+
+    def test_jsonl_export_with_filters(self):
+        """Test user, revoked and date filters narrow a JSONL export."""
+        _, body = self.export(output='jsonl', user='TEST@example.com', revoked='false',
+                              since='2025-01-01T00:00:00Z')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['device_name'] for row in rows], ['Tablet'])
+        self.assertEqual(rows[0]['user_id'], self.user.pk)
+        _, body = self.export(output='jsonl', user=str(self.user.pk), until='2025-01-01T00:00:00Z')
+        self.assertEqual([json.loads(line)['device_name'] for line in body.splitlines()], ['Phone'])
+
+    def test_user_export(self):
+        """Test users are exported without password hashes."""
+        _, body = self.export('users', output='jsonl')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['email'] for row in rows], ['staff@example.com', 'test@example.com'])
+        self.assertNotIn('password', rows[0])
+
+    async def test_asgi_export_is_async(self):
+        """Test under ASGI the export streams from an async iterator, not a buffered one."""
+        access = AccessToken.for_user(self.staff)
+        response = await self.async_client.get(
+            '/api/export/sessions', {'output': 'jsonl'},
+            headers={'Authorization': f'Bearer {access}'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(b''.join(chunks).decode().splitlines()), 4)
+
+        lines = (f'{n}\n' for n in range(5))
+        chunks = [chunk async for chunk in export.aiter_chunks(lines, size=2)]
+        self.assertEqual(chunks, ['0\n1\n', '2\n3\n', '4\n'])
+
+    def test_invalid_filters(self):
+        """Test unknown users, bad ranges and revoked on users get 400."""
+        for kind, params in (('sessions', {'user': 'nobody@example.com'}),
+                             ('sessions', {'since': '2025-01-02T00:00:00Z',
+                                           'until': '2025-01-01T00:00:00Z'}),
+                             ('sessions', {'output': 'xml'}),
+                             ('users', {'revoked': 'true'})):
+            response, _ = self.export(kind, **params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_staff_only(self):
+        """Test non-staff users cannot export."""
+        self.client.force_authenticate(self.user)
+        response, _ = self.export()
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_export_is_audited(self):
+        """Test an export is recorded in the auth event log."""
+        with mock.patch.object(events, 'record') as record:
+            self.export(revoked='true')
+        record.assert_called_once()
+        self.assertEqual(record.call_args.args[0], events.EXPORT)
+        self.assertEqual(record.call_args.kwargs['filters'], {'revoked': 'true'})
+
+    def test_rows_read_in_chunks(self):
+        """Test rows come from an iterator, never a fully loaded queryset."""
+        with mock.patch('django.db.models.query.QuerySet.iterator',
+                        autospec=True, side_effect=lambda qs, chunk_size: iter(())) as iterator:
+            self.export()
+        self.assertEqual(iterator.call_args.kwargs['chunk_size'], 2000)
+
+    @override_settings(DEVICE_SESSION_SHARDS=['default', 'sessions_1'])
+    def test_sessions_from_every_shard(self):
+        """Test a sharded export reads each shard."""
+        users = (User.objects.create_user(email=f'user{i}@example.com', password='testpass123')
+                 for i in range(2))
+        other = next(user for user in users if shard_for_user(user.pk) == 'sessions_1')
+        DeviceSession.objects.using('sessions_1').create(
+            id=new_session_id(other.pk), user=other, device_name='Shard')
+        _, body = self.export(output='jsonl')
+        devices = sorted(json.loads(line)['device_name'] for line in body.splitlines())
+        self.assertEqual(devices, ['Desk', 'Laptop', 'Phone', 'Shard', 'Tablet'])
+
+    def test_management_command(self):
+        """Test the command writes the same export to a file."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'sessions.csv')
+            stderr = io.StringIO()
+            call_command('export_auth_data', 'sessions', '--active', '--user', 'test@example.com',
+                         '-o', path, stderr=stderr)
+            with open(path, newline='') as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual({row['device_name'] for row in rows}, {'Phone', 'Tablet'})
+        self.assertIn('Exported 2 sessions', stderr.getvalue())
+
+        stdout = io.StringIO()
+        call_command('export_auth_data', 'users', '--format', 'jsonl', stdout=stdout)
+        self.assertEqual(len(stdout.getvalue().splitlines()), 2)
+        with self.assertRaises(CommandError):
+            call_command('export_auth_data', 'users', '--revoked')
+
+
+class DeviceSessionAdminTestCase(APITestCase):
+    """
+    Tests for the DeviceSession changelist on large tables.
+    """
+
+    def setUp(self):
+        self.staff = User.objects.create_superuser(email='admin@example.com', password='testpass123')
+        self.session = DeviceSession.objects.create(user=self.staff, device_name='Phone')
+        self.client.force_login(self.staff)
+
+    def test_changelist_and_change_page(self):
+        """Test the admin lists sessions and edits them with a raw id widget."""
+        response = self.client.get('/admin/accounts/devicesession/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertContains(response, str(self.session.pk))
+        response = self.client.get(f'/admin/accounts/devicesession/{self.session.pk}/change/')
+        # A text input for the user id, not a <select> of every user
+        self.assertContains(response, f'<input type="text" name="user" value="{self.staff.pk}"')
+
+    def test_estimated_count_on_postgresql(self):
+        """Test the unfiltered count comes from pg_class on PostgreSQL."""
+        queryset = DeviceSession.objects.order_by('-id')
+        cursor = mock.MagicMock()
+        cursor.__enter__.return_value.fetchone.return_value = (5_000_000,)
+        connection = mock.Mock(vendor='postgresql', cursor=mock.Mock(return_value=cursor))
+        with mock.patch('accounts.admin.connections', {'default': connection}):
+            self.assertEqual(EstimatedCountPaginator(queryset, 100).count, 5_000_000)
+            self.assertEqual(EstimatedCountPaginator(queryset.filter(revoked=True), 100).count, 0)
+        self.assertEqual(EstimatedCountPaginator(queryset, 100).count, 1)
@@ -0,0 +1,100 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.idempotency import request_keys
+from accounts.models import DeviceSession
+from test_fixtures import use_revocation_registry
+
+User = get_user_model()
+
+
+class IdempotencyTestCase(APITestCase):
+    """
+    Tests for replaying login and refresh responses to retried requests.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        use_revocation_registry(self)
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123')
+        self.credentials = {
+            'email': 'test@example.com', 'password': 'testpass123', 'device_name': 'Phone',
+        }
+
+    def login(self, key=None, **data):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        return self.client.post('/api/auth/login', {**self.credentials, **data},
+                                format='json', **headers)
+
+    def refresh(self, token):
+        return self.client.post('/api/auth/refresh', {'refresh': token}, format='json')
+
+    def test_retried_refresh_is_replayed(self):
+        """Test a retried refresh gets the first rotation's tokens back."""
+        token = self.login().data['refresh']
+        first = self.refresh(token)
+        retry = self.refresh(token)
+        self.assertEqual(retry.status_code, status.HTTP_200_OK)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        session = DeviceSession.objects.get(user=self.user)
+        self.assertEqual(session.refresh_token_jti, str(RefreshToken(first.data['refresh'])['jti']))
+        # The replayed tokens keep working
+        self.assertEqual(self.refresh(retry.data['refresh']).status_code, status.HTTP_200_OK)
+
+    def test_reuse_after_grace_window_fails(self):
+        """Test a rotated token is rejected once no grace window applies."""
+        token = self.login().data['refresh']
+        with self.settings(IDEMPOTENCY={'KEY_TTL': 60, 'REFRESH_GRACE': 0}):
+            self.refresh(token)
+            self.assertEqual(self.refresh(token).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_no_replay_for_revoked_session(self):
+        """Test a logged-out session's rotation is not handed out again."""
+        token = self.login().data['refresh']
+        rotated = self.refresh(token).data
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {rotated["access"]}')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/auth/logout', {'refresh': rotated['refresh']}, format='json')
+        self.assertEqual(self.refresh(token).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_login_with_idempotency_key(self):
+        """Test a retried login does not authenticate or open a second session."""
+        first = self.login(key='abc')
+        with mock.patch('accounts.views.authenticate') as authenticate:
+            retry = self.login(key='abc')
+        authenticate.assert_not_called()
+        self.assertEqual(retry.data['session_id'], first.data['session_id'])
+        self.assertEqual(DeviceSession.objects.filter(user=self.user).count(), 1)
+
+    def test_key_is_bound_to_the_request_body(self):
+        """Test the same key with other credentials or without a key is not replayed."""
+        first = self.login(key='abc')
+        self.assertEqual(self.login(key='abc', password='wrongpass').status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+        other = self.login(key='abc', device_name='Laptop')
+        self.assertNotEqual(other.data['session_id'], first.data['session_id'])
+        self.assertNotIn('Idempotent-Replayed', self.login())
+
+    def test_failures_are_not_cached(self):
+        """Test a failed login can succeed when retried with the same key."""
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.login(key='abc').status_code, status.HTTP_401_UNAUTHORIZED)
+        User.objects.filter(pk=self.user.pk).update(is_active=True)
+        self.assertEqual(self.login(key='abc').status_code, status.HTTP_200_OK)
+
+    def test_duplicate_of_request_in_flight(self):
+        """Test a duplicate of a running request gets 409 once the wait runs out."""
+        token = self.login().data['refresh']
+        request = mock.Mock(data={'refresh': token}, headers={}, path='/api/auth/refresh')
+        lock = request_keys(request, 'refresh')[-1][0] + ':lock'
+        cache.add(lock, 1)
+        with self.settings(IDEMPOTENCY={'KEY_TTL': 60, 'REFRESH_GRACE': 30,
+                                        'WAIT': 0.1, 'LOCK_TIMEOUT': 10}):
+            self.assertEqual(self.refresh(token).status_code, status.HTTP_409_CONFLICT)
@@ -0,0 +1,132 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from accounts import shedding
+from accounts.shedding import LoadShedder
+
+User = get_user_model()
+
+LIMITS = {'INITIAL': 4, 'MIN': 1, 'MAX': 8}
+ROUTES = {
+    'login': {'PRIORITY': 0, 'TARGET': 0.5},
+    'register': {'PRIORITY': 0, 'TARGET': 1.0},
+    'token_refresh': {'PRIORITY': 1, 'TARGET': 0.2},
+    'me': {'PRIORITY': 1, 'TARGET': 0.1},
+}
+
+
+class AIMDLimitTestCase(SimpleTestCase):
+    """
+    Tests for the AIMD limits and priority-ordered backoff.
+    """
+
+    def setUp(self):
+        self.shedder = LoadShedder(ROUTES, LIMITS, backoff=0.5)
+
+    def limit(self, name):
+        return self.shedder.limits[name].limit
+
+    def run_requests(self, name, count, seconds):
+        for _ in range(count):
+            self.assertTrue(self.shedder.acquire(name))
+        for _ in range(count):
+            self.shedder.release(name, seconds)
+
+    def test_sheds_over_limit(self):
+        """Test requests past the limit are refused and counted."""
+        for _ in range(4):
+            self.assertTrue(self.shedder.acquire('login'))
+        self.assertFalse(self.shedder.acquire('login'))
+        self.assertTrue(self.shedder.acquire('me'))
+        counters = self.shedder.snapshot()['login']
+        self.assertEqual((counters['in_flight'], counters['admitted'], counters['shed']), (4, 4, 1))
+
+    def test_additive_increase_when_busy(self):
+        """Test fast responses raise the limit only while it is being used."""
+        self.run_requests('login', 1, 0.01)
+        self.assertEqual(self.limit('login'), 4)
+        self.run_requests('login', 3, 0.01)
+        self.assertEqual(self.limit('login'), 5)
+        for _ in range(10):
+            self.run_requests('login', int(self.limit('login')), 0.01)
+        self.assertEqual(self.limit('login'), LIMITS['MAX'])
+
+    def test_slow_response_backs_off_once_per_target(self):
+        """Test a burst of slow responses halves the limit once, not per response."""
+        with mock.patch('accounts.shedding.time.monotonic', return_value=100.0):
+            self.run_requests('login', 3, 2.0)
+        self.assertEqual(self.limit('login'), 2)
+        with mock.patch('accounts.shedding.time.monotonic', return_value=101.0):
+            self.run_requests('login', 1, 2.0)
+        self.assertEqual(self.limit('login'), 1)
+        self.assertEqual(self.shedder.snapshot()['login']['slow'], 4)
+
+    def test_slow_protected_route_sheds_lower_priorities_first(self):
+        """Test a slow refresh shrinks login and register before itself."""
+        for now in (100.0, 101.0):
+            with mock.patch('accounts.shedding.time.monotonic', return_value=now):
+                self.run_requests('token_refresh', 1, 1.0)
+        self.assertEqual((self.limit('login'), self.limit('register')), (1, 1))
+        self.assertEqual(self.limit('token_refresh'), 4)
+        self.assertEqual(self.limit('me'), 4)
+        with mock.patch('accounts.shedding.time.monotonic', return_value=102.0):
+            self.run_requests('token_refresh', 1, 1.0)
+        self.assertEqual(self.limit('token_refresh'), 2)
+        self.assertEqual(self.limit('me'), 4)
+
+
+class LoadSheddingMiddlewareTestCase(APITestCase):
+    """
+    Tests for shedding requests by URL name in the middleware.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.shedder = LoadShedder(ROUTES, {'INITIAL': 1, 'MIN': 1, 'MAX': 1})
+        patcher = mock.patch.object(shedding, '_shedder', self.shedder)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123')
+
+    def login(self):
+        return self.client.post('/api/auth/login', {
+            'email': 'test@example.com', 'password': 'testpass123', 'device_name': 'Phone',
+        }, format='json')
+
+    def test_login_shed_with_retry_after(self):
+        """Test a login over the limit gets 503 and Retry-After while me is served."""
+        access = self.login().data['access']
+        self.assertEqual(self.shedder.snapshot()['login']['in_flight'], 0)
+        self.shedder.acquire('login')  # a login still in flight
+        response = self.login()
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], str(settings.LOAD_SHEDDING['RETRY_AFTER']))
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(self.client.get('/api/auth/me').status_code, status.HTTP_200_OK)
+
+    def test_status_setting(self):
+        """Test shed requests can be answered with 429 instead."""
+        self.shedder.acquire('login')
+        with self.settings(LOAD_SHEDDING={**settings.LOAD_SHEDDING, 'STATUS': 429}):
+            self.assertEqual(self.login().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_disabled(self):
+        """Test nothing is shed when load shedding is off."""
+        self.shedder.acquire('login')
+        with self.settings(LOAD_SHEDDING={**settings.LOAD_SHEDDING, 'ENABLED': False}):
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+    def test_counters_endpoint(self):
+        """Test the load endpoint reports limits, in-flight and shed counts."""
+        self.shedder.acquire('login')
+        self.login()
+        response = self.client.get('/api/health/load')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        login = response.data['routes']['login']
+        self.assertEqual((login['limit'], login['in_flight'], login['shed']), (1, 1, 1))
+        self.assertNotIn('load', response.data['routes'])  # never limited itself
@@ -0,0 +1,74 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.password_validation import (
+    UserAttributeSimilarityValidator, get_default_password_validators)
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from accounts.passwords import CommonPasswordValidator
+from accounts.serializers import RegisterSerializer
+
+User = get_user_model()
+
+
+class RegistrationPasswordTestCase(APITestCase):
+    """
+    Tests for the registration password pipeline.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = '/api/auth/register'
+
+    def register(self, password, email='new.person@example.com'):
+        return self.client.post(self.url, {
+            'email': email, 'name': 'New Person', 'password': password,
+        }, format='json')
+
+    def test_common_password_rejected(self):
+        """Test a password from the common list is rejected."""
+        response = self.register('password123')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('This password is too common.', response.data['password'])
+
+    def test_numeric_password_rejected(self):
+        """Test an all-digit password is rejected."""
+        response = self.register('83749201736')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('This password is entirely numeric.', response.data['password'])
+
+    def test_similar_password_rejected(self):
+        """Test a password close to the email is rejected."""
+        response = self.register('new.person.example')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('password', response.data)
+
+    def test_similarity_skipped_after_cheap_failure(self):
+        """Test the difflib validator does not run once a cheap one failed."""
+        with mock.patch.object(UserAttributeSimilarityValidator, 'validate') as similarity:
+            self.assertEqual(self.register('password123').status_code,
+                             status.HTTP_400_BAD_REQUEST)
+            similarity.assert_not_called()
+            self.assertEqual(self.register('Qz7!mountain-lake').status_code,
+                             status.HTTP_201_CREATED)
+            similarity.assert_called_once()
+
+    def test_no_uniqueness_select(self):
+        """Test validation issues no query; the unique index catches duplicates."""
+        User.objects.create_user(email='new.person@example.com', password='testpass123')
+        serializer = RegisterSerializer(data={
+            'email': 'New.Person@example.com', 'password': 'Qz7!mountain-lake'})
+        with self.assertNumQueries(0):
+            self.assertTrue(serializer.is_valid())
+        response = self.register('Qz7!mountain-lake', email='NEW.person@example.com')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['email'], ['user with this email already exists.'])
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_common_password_list_is_shared(self):
+        """Test validator instances reuse one frozen password set."""
+        configured = next(v for v in get_default_password_validators()
+                          if isinstance(v, CommonPasswordValidator))
+        self.assertIsInstance(configured.passwords, frozenset)
+        self.assertIs(CommonPasswordValidator().passwords, configured.passwords)
@@ -0,0 +1,150 @@
+import io
+import json
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from accounts.profiling import CaptureRing, StackSampler, get_ring
+from test_fixtures import AuthFixtures, use_revocation_registry
+
+
+def spin(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class ProfilingMiddlewareTestCase(AuthFixtures, APITestCase):
+    """
+    Tests for staff-triggered, sampled and slow-request profiling.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        use_revocation_registry(self)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.settings_override = override_settings(
+            PROFILING={**settings.PROFILING, 'DIR': directory.name})
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def configure(self, **conf):
+        return override_settings(PROFILING={**settings.PROFILING, **conf})
+
+    def test_staff_header_profiles_request(self):
+        """Test a staff token with X-Profile gets a cProfile capture and its id."""
+        self.authenticate(self.staff_tokens)
+        response = self.client.get('/api/auth/me', HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        capture = get_ring().load(response['X-Profile-Id'])
+        self.assertEqual(capture['trigger'], 'header')
+        self.assertEqual((capture['url_name'], capture['status']), ('me', 200))
+        self.assertEqual(capture['profile']['kind'], 'cprofile')
+        functions = [row['function'] for row in capture['profile']['functions']]
+        self.assertTrue(any('accounts/views.py' in name for name in functions))
+        self.assertTrue(capture['queries'])
+        self.assertNotIn('params', capture['queries'][0])
+
+    def test_header_ignored_for_non_staff(self):
+        """Test X-Profile from a regular user or without a token does nothing."""
+        self.authenticate(self.user_tokens)
+        response = self.client.get('/api/auth/me', HTTP_X_PROFILE='1')
+        self.assertNotIn('X-Profile-Id', response)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer invalid')
+        self.client.get('/api/auth/me', HTTP_X_PROFILE='1')
+        self.assertEqual(get_ring().ids(), [])
+
+    def test_sample_rate(self):
+        """Test sampled requests are profiled without a header."""
+        self.authenticate(self.user_tokens)
+        with self.configure(SAMPLE_RATE=1.0):
+            response = self.client.get('/api/auth/me')
+        self.assertNotIn('X-Profile-Id', response)
+        [capture] = list(get_ring())
+        self.assertEqual((capture['trigger'], capture['profile']['kind']), ('sample', 'cprofile'))
+
+    def test_slow_requests_captured(self):
+        """Test only requests over the threshold keep their timeline and samples."""
+        self.authenticate(self.user_tokens)
+        with self.configure(SLOW_THRESHOLD=60):
+            self.client.get('/api/auth/me')
+        self.assertEqual(get_ring().ids(), [])
+
+        with self.configure(SLOW_THRESHOLD=0.02, SAMPLER_INTERVAL=0.001), \
+                mock.patch('accounts.profiling._sampler', None), \
+                mock.patch('accounts.views.UserSerializer.to_representation',
+                           side_effect=lambda user: spin(0.05) or {}):
+            self.client.get('/api/auth/me')
+        [capture] = list(get_ring())
+        self.assertEqual(capture['trigger'], 'slow')
+        self.assertGreaterEqual(capture['duration_ms'], 50)
+        self.assertEqual(capture['profile']['kind'], 'sampler')
+        self.assertTrue(any('test_profiling.py:spin' in stack
+                            for stack in capture['profile']['stacks']))
+        self.assertTrue(capture['queries'])
+
+    def test_other_views_not_profiled(self):
+        """Test views outside the accounts app are left alone."""
+        self.client.force_login(self.staff)
+        with self.configure(SAMPLE_RATE=1.0):
+            self.client.get('/admin/', HTTP_X_PROFILE='1')
+        self.assertEqual(get_ring().ids(), [])
+
+    def test_management_command(self):
+        """Test captures can be listed, shown, summarized and cleared."""
+        self.authenticate(self.staff_tokens)
+        capture_id = self.client.get('/api/auth/me', HTTP_X_PROFILE='1')['X-Profile-Id']
+
+        stdout = io.StringIO()
+        call_command('profile_captures', stdout=stdout)
+        self.assertIn(capture_id, stdout.getvalue())
+        self.assertIn('GET /api/auth/me', stdout.getvalue())
+
+        stdout = io.StringIO()
+        call_command('profile_captures', capture_id, stdout=stdout)
+        self.assertIn('Top functions by cumulative time', stdout.getvalue())
+
+        stdout = io.StringIO()
+        call_command('profile_captures', '--summary', '--json', stdout=stdout)
+        summary = json.loads(stdout.getvalue())
+        self.assertEqual(summary['routes']['me']['count'], 1)
+        self.assertTrue(summary['statements'])
+
+        with self.assertRaises(CommandError):
+            call_command('profile_captures', 'missing')
+        call_command('profile_captures', '--clear', stdout=io.StringIO())
+        self.assertEqual(get_ring().ids(), [])
+
+
+class CaptureRingTestCase(SimpleTestCase):
+    """
+    Tests for the on-disk capture ring and the stack sampler.
+    """
+
+    def test_ring_keeps_newest(self):
+        """Test the ring deletes the oldest captures past its capacity."""
+        with tempfile.TemporaryDirectory() as directory:
+            ring = CaptureRing(directory, 3)
+            ids = [ring.save({'n': n}) for n in range(5)]
+            self.assertEqual(ring.ids(), ids[2:])
+            self.assertEqual([capture['n'] for capture in ring], [2, 3, 4])
+
+    def test_sampler_counts_stacks(self):
+        """Test the sampler records the registered thread's stacks only while registered."""
+        sampler = StackSampler(0.001)
+        ident = threading.get_ident()
+        samples = sampler.start(ident)
+        spin(0.05)
+        self.assertIs(sampler.stop(ident), samples)
+        self.assertTrue(any(stack.endswith('test_profiling.py:spin') for stack in samples))
+        count = sum(samples.values())
+        spin(0.02)
+        self.assertEqual(sum(samples.values()), count)
@@ -0,0 +1,281 @@
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts import revocation
+from accounts.models import DeviceSession, RevocationEvent
+from accounts.revocation import (
+    InProcessBroker,
+    LocalSocketBroker,
+    RevocationRegistry,
+    RevokedSet,
+)
+from test_fixtures import use_revocation_registry
+
+User = get_user_model()
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+class RevocationBrokerTestCase(SimpleTestCase):
+    """
+    Tests for the revoked set and the brokers, without a database.
+    """
+
+    def test_revoked_set_expires_entries(self):
+        """Test keys are members until their expiry and are purged after."""
+        revoked = RevokedSet()
+        revoked.add('live', time.time() + 60)
+        revoked.add('expired', time.time() - 1)
+        self.assertIn('live', revoked)
+        self.assertNotIn('expired', revoked)
+        revoked.purge()
+        self.assertEqual(len(revoked), 1)
+
+    def test_revoked_set_keeps_latest_expiry(self):
+        """Test re-adding a key with a later expiry extends it."""
+        revoked = RevokedSet()
+        revoked.add('jti', time.time() - 1)
+        revoked.add('jti', time.time() + 60)
+        revoked.purge()
+        self.assertIn('jti', revoked)
+
+    def test_in_process_broker_reaches_other_nodes(self):
+        """Test a revocation published on one node is applied on another."""
+        channel = uuid.uuid4().hex
+        node_a = RevocationRegistry(InProcessBroker(channel)).start()
+        node_b = RevocationRegistry(InProcessBroker(channel)).start()
+        node_a.publish({'jti': 'abc', 'sid': None, 'exp': time.time() + 60})
+        self.assertTrue(node_a.is_revoked(jti='abc'))
+        self.assertTrue(node_b.is_revoked(jti='abc'))
+        self.assertFalse(node_b.is_revoked(jti='other'))
+        node_a.broker.close()
+        node_b.broker.close()
+
+    def test_local_socket_broker_reaches_other_nodes(self):
+        """Test revocations fan out over Unix datagram sockets."""
+        with tempfile.TemporaryDirectory() as path:
+            node_a = RevocationRegistry(LocalSocketBroker(path)).start()
+            node_b = RevocationRegistry(LocalSocketBroker(path)).start()
+            try:
+                sid = str(uuid.uuid4())
+                node_a.publish({'jti': None, 'sid': sid, 'exp': time.time() + 60})
+                self.assertTrue(node_a.is_revoked(sid=sid))
+                self.assertTrue(wait_for(lambda: node_b.is_revoked(sid=sid)))
+            finally:
+                node_a.broker.close()
+                node_b.broker.close()
+
+    def test_catch_up_on_connect(self):
+        """Test a node applies the backlog when it subscribes."""
+        backlog = [{'jti': 'missed', 'sid': None, 'exp': time.time() + 60}]
+        node = RevocationRegistry(
+            InProcessBroker(uuid.uuid4().hex), catch_up=lambda: backlog).start()
+        self.assertTrue(node.is_revoked(jti='missed'))
+        node.broker.close()
+
+
+class RevocationEndpointsTestCase(APITestCase):
+    """
+    Tests for revocations published by the logout, revoke and refresh views.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.registry = use_revocation_registry(self)
+        self.channel = self.registry.broker.channel
+        self.user = User.objects.create_user(
+            email='test@example.com', name='Test User', password='testpass123')
+
+    def create_device_session(self):
+        refresh = RefreshToken.for_user(self.user)
+        session = DeviceSession.objects.create(
+            user=self.user, device_name='Test Device',
+            refresh_token_jti=str(refresh['jti']))
+        return session, refresh
+
+    def authenticate(self):
+        access = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def test_logout_broadcasts_revocation(self):
+        """Test logout records a durable revocation and broadcasts its JTI."""
+        session, refresh = self.create_device_session()
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/auth/logout', {'refresh': str(refresh)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_205_RESET_CONTENT)
+        self.assertTrue(RevocationEvent.objects.filter(jti=refresh['jti']).exists())
+        self.assertTrue(self.registry.is_revoked(jti=refresh['jti']))
+
+    def test_session_revoke_broadcasts_session_id(self):
+        """Test revoking a session broadcasts its id and current JTI."""
+        session, refresh = self.create_device_session()
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/auth/sessions/{session.id}/revoke', {}, format='json')
+        self.assertTrue(self.registry.is_revoked(sid=str(session.id)))
+        self.assertTrue(self.registry.is_revoked(jti=refresh['jti']))
+
+    def test_refresh_rejects_broadcast_revocation(self):
+        """Test refresh fails once another node broadcast the JTI as revoked."""
+        session, refresh = self.create_device_session()
+        other_node = RevocationRegistry(InProcessBroker(self.channel)).start()
+        self.addCleanup(other_node.broker.close)
+        other_node.publish({'jti': refresh['jti'], 'sid': None, 'exp': refresh['exp']})
+
+        response = self.client.post(
+            '/api/auth/refresh', {'refresh': str(refresh)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data['detail'], 'Session revoked or invalid')
+
+    def test_rotation_broadcasts_old_jti(self):
+        """Test the rotated-away refresh JTI is broadcast but not stored."""
+        session, refresh = self.create_device_session()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/auth/refresh', {'refresh': str(refresh)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(self.registry.is_revoked(jti=refresh['jti']))
+        self.assertFalse(RevocationEvent.objects.exists())
+
+    def test_revoke_uses_batched_path(self):
+        """Test a single revocation is written and broadcast through revoke_many()."""
+        with mock.patch.object(revocation, 'revoke_many', wraps=revocation.revoke_many) as batch, \
+                self.captureOnCommitCallbacks(execute=True):
+            revocation.revoke(jti='single', durable=True)
+        batch.assert_called_once_with([('single', None, None)], durable=True)
+        self.assertEqual(RevocationEvent.objects.get().jti, 'single')
+        self.assertTrue(self.registry.is_revoked(jti='single'))
+
+    def test_catch_up_loads_unexpired_events(self):
+        """Test a new node catches up on unexpired durable revocations only."""
+        now = timezone.now()
+        RevocationEvent.objects.create(jti='live', expires_at=now + timedelta(hours=1))
+        RevocationEvent.objects.create(jti='gone', expires_at=now - timedelta(hours=1))
+        node = RevocationRegistry(
+            InProcessBroker(uuid.uuid4().hex),
+            catch_up=revocation.load_unexpired).start()
+        self.addCleanup(node.broker.close)
+        self.assertTrue(node.is_revoked(jti='live'))
+        self.assertFalse(node.is_revoked(jti='gone'))
+
+
+class SessionRevocationTestCase(APITestCase):
+    """
+    Tests for the `sid` claim and immediate access-token revocation.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.registry = use_revocation_registry(self)
+        User.objects.create_user(
+            email='test@example.com', name='Test User', password='testpass123')
+
+    def login(self):
+        response = self.client.post('/api/auth/login', {
+            'email': 'test@example.com',
+            'password': 'testpass123',
+            'device_name': 'Test Device',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_tokens_carry_session_id(self):
+        """Test access, refresh and rotated refresh tokens carry the session id."""
+        data = self.login()
+        refresh = RefreshToken(data['refresh'])
+        self.assertEqual(refresh['sid'], data['session_id'])
+        self.assertEqual(refresh.access_token['sid'], data['session_id'])
+
+        response = self.client.post(
+            '/api/auth/refresh', {'refresh': data['refresh']}, format='json')
+        self.assertEqual(RefreshToken(response.data['refresh'])['sid'], data['session_id'])
+
+    def test_access_token_rejected_after_logout(self):
+        """Test an access token stops working as soon as its session logs out."""
+        data = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {data["access"]}')
+        self.assertEqual(self.client.get('/api/auth/me').status_code, status.HTTP_200_OK)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/auth/logout', {'refresh': data['refresh']}, format='json')
+        response = self.client.get('/api/auth/me')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_access_token_rejected_after_session_revoke(self):
+        """Test revoking a session from another device invalidates its access token."""
+        victim = self.login()
+        other = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {other["access"]}')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/auth/sessions/{victim["session_id"]}/revoke', {}, format='json')
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {victim["access"]}')
+        self.assertEqual(self.client.get('/api/auth/me').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {other["access"]}')
+        self.assertEqual(self.client.get('/api/auth/me').status_code, status.HTTP_200_OK)
+
+    def test_sync_applies_revocations_from_other_nodes(self):
+        """Test a delta sync picks up revocations this node was not told about."""
+        sid = str(uuid.uuid4())
+        with self.captureOnCommitCallbacks(execute=True):
+            event = RevocationEvent.objects.create(
+                session_id=sid, expires_at=timezone.now() + timedelta(hours=1))
+            revocation._bump_change_counter()
+        self.assertFalse(self.registry.is_revoked(sid=sid))
+
+        with self.settings(REVOCATION_SYNC={'INTERVAL': 0, 'MAX_STALENESS': 30, 'OVERLAP': 60}):
+            revocation.sync()
+        self.assertTrue(self.registry.is_revoked(sid=sid))
+        self.assertEqual(self.registry.version, event.id)
+
+    def test_sync_skips_expired_revocations(self):
+        """Test a delta sync does not re-add revocations that have already expired."""
+        now = timezone.now()
+        live = RevocationEvent.objects.create(jti='live', expires_at=now + timedelta(hours=1))
+        RevocationEvent.objects.create(jti='gone', expires_at=now - timedelta(hours=1))
+        self.assertEqual(revocation.load_since(0, overlap=60), [live.as_message()])
+
+    def test_sync_skips_database_when_unchanged(self):
+        """Test an unchanged change counter costs no query."""
+        with self.settings(REVOCATION_SYNC={'INTERVAL': 0, 'MAX_STALENESS': 30, 'OVERLAP': 60}):
+            revocation.sync()
+            with self.assertNumQueries(0):
+                revocation.sync()
+            revocation._bump_change_counter()
+            with self.assertNumQueries(1):
+                revocation.sync()
+
+    def test_sync_prunes_expired_events(self):
+        """Test a sync deletes expired revocations once per prune interval."""
+        now = timezone.now()
+        RevocationEvent.objects.create(jti='live', expires_at=now + timedelta(hours=1))
+        RevocationEvent.objects.create(jti='gone', expires_at=now - timedelta(hours=1))
+        conf = {'INTERVAL': 0, 'MAX_STALENESS': 30, 'OVERLAP': 60, 'PRUNE_INTERVAL': 60}
+        with self.settings(REVOCATION_SYNC=conf):
+            revocation.sync()
+            self.assertEqual(RevocationEvent.objects.count(), 2)  # interval not reached
+            self.registry.pruned_at -= 60
+            revocation.sync()
+            self.assertEqual(list(RevocationEvent.objects.values_list('jti', flat=True)), ['live'])
+            RevocationEvent.objects.create(jti='later', expires_at=now - timedelta(hours=1))
+            revocation.sync()
+        self.assertEqual(RevocationEvent.objects.count(), 2)
@@ -0,0 +1,105 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from accounts.models import DeviceSession
+from test_fixtures import use_revocation_registry
+
+User = get_user_model()
+
+
+class SessionCapTestCase(APITestCase):
+    """
+    Tests for the per-user session cap and same-device session reuse.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        use_revocation_registry(self)
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123')
+
+    def login(self, device_name='Test Device'):
+        data = {'email': 'test@example.com', 'password': 'testpass123'}
+        if device_name is not None:
+            data['device_name'] = device_name
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/auth/login', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def active_ids(self):
+        return set(str(pk) for pk in DeviceSession.objects.filter(
+            user=self.user, revoked=False).values_list('id', flat=True))
+
+    def test_least_recently_seen_sessions_evicted(self):
+        """Test logins past the cap revoke the oldest sessions and their tokens."""
+        with self.settings(DEVICE_SESSIONS={'MAX_ACTIVE': 3, 'REUSE_BY_DEVICE_NAME': False}):
+            logins = [self.login(f'Device {n}') for n in range(5)]
+        self.assertEqual(self.active_ids(), {data['session_id'] for data in logins[2:]})
+        self.assertEqual(BlacklistedToken.objects.count(), 2)
+
+        evicted = logins[0]
+        response = self.client.post('/api/auth/refresh', {'refresh': evicted['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {evicted["access"]}')
+        self.assertEqual(self.client.get('/api/auth/me').status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {logins[-1]["access"]}')
+        self.assertEqual(len(self.client.get('/api/auth/sessions').data), 5)
+
+    def test_eviction_follows_last_seen(self):
+        """Test a refreshed session counts as recently seen and survives."""
+        with self.settings(DEVICE_SESSIONS={'MAX_ACTIVE': 2, 'REUSE_BY_DEVICE_NAME': False}):
+            first = self.login('Phone')
+            second = self.login('Laptop')
+            self.client.post('/api/auth/refresh', {'refresh': first['refresh']}, format='json')
+            third = self.login('Tablet')
+        self.assertEqual(self.active_ids(), {first['session_id'], third['session_id']})
+        self.assertNotIn(second['session_id'], self.active_ids())
+
+    def test_no_cap(self):
+        """Test a cap of 0 keeps every session."""
+        with self.settings(DEVICE_SESSIONS={'MAX_ACTIVE': 0, 'REUSE_BY_DEVICE_NAME': False}):
+            for _ in range(4):
+                self.login()
+        self.assertEqual(len(self.active_ids()), 4)
+
+    def test_reuse_by_device_name(self):
+        """Test a second login from the same device rotates its session's token."""
+        with self.settings(DEVICE_SESSIONS={'MAX_ACTIVE': 3, 'REUSE_BY_DEVICE_NAME': True}):
+            first = self.login('Phone')
+            again = self.login('Phone')
+            other = self.login('Laptop')
+        self.assertEqual(first['session_id'], again['session_id'])
+        self.assertEqual(self.active_ids(), {first['session_id'], other['session_id']})
+        response = self.client.post('/api/auth/refresh', {'refresh': first['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.post('/api/auth/refresh', {'refresh': again['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_default_names_not_reused(self):
+        """Test logins without a device name, or with a placeholder, get their own sessions."""
+        with self.settings(DEVICE_SESSIONS={'MAX_ACTIVE': 0, 'REUSE_BY_DEVICE_NAME': True,
+                                            'GENERIC_NAMES': ['NextAuth Client']}):
+            unnamed = [self.login(None), self.login(None)]
+            placeholder = [self.login('NextAuth Client'), self.login('NextAuth Client')]
+        self.assertEqual(self.active_ids(),
+                         {data['session_id'] for data in unnamed + placeholder})
+        self.assertEqual(len(self.active_ids()), 4)
+
+    def test_eviction_query_uses_index(self):
+        """Test the eviction query reads the (user, revoked, last_seen) index."""
+        if connection.vendor == 'postgresql':
+            # See test_email_lookup: rule out a scan of the near-empty table
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            sort = 'Sort'
+        else:
+            sort = 'TEMP B-TREE'
+        plan = (DeviceSession.objects.filter(user=self.user, revoked=False)
+                .order_by('-last_seen').values_list('id', 'refresh_token_jti')[2:]
+                .explain())
+        self.assertIn('accounts_ds_user_active_seen', plan)
+        self.assertNotIn(sort, plan)  # no separate sort
@@ -1,8 +1,38 @@
+import os
+
 from auth_service.settings import *
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': ':memory:',
-    }
+    },
+    # Spare database for the DeviceSession sharding tests
+    'sessions_1': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
 }
+
+# PostgreSQL instead when TEST_DATABASE_HOST is set; the concurrency tests
+# (test_concurrency.py) only run there. Under pytest-xdist each worker gets
+# its own test databases (test_auth_service_gw0, ...).
+if os.getenv('TEST_DATABASE_HOST'):
+    _postgres = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'HOST': os.getenv('TEST_DATABASE_HOST'),
+        'PORT': os.getenv('TEST_DATABASE_PORT', '5432'),
+        'USER': os.getenv('TEST_DATABASE_USER', 'postgres'),
+        'PASSWORD': os.getenv('TEST_DATABASE_PASSWORD', ''),
+    }
+    DATABASES = {
+        'default': {**_postgres, 'NAME': 'auth_service'},
+        'sessions_1': {**_postgres, 'NAME': 'auth_service_sessions_1'},
+    }
+
+# No flusher thread: tests call events.get_event_log().flush() themselves
+AUTH_EVENTS = {**AUTH_EVENTS, 'FLUSH_INTERVAL': 0}
+
+# Hashing is not under test here: MD5 makes create_user() and logins nearly
+# free. Production hashers are still covered by benchmarks/bench_register.py.
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
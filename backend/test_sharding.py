@@ -0,0 +1,158 @@
+import unittest
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import DeviceSession
+from accounts.sharding import shard_for_session, shard_for_user, uuid7
+
+User = get_user_model()
+
+SHARDS = ['default', 'sessions_1']
+
+
+@override_settings(DEVICE_SESSION_SHARDS=SHARDS)
+class SessionIdTestCase(SimpleTestCase):
+    """
+    Tests for the time-ordered, shard-encoding session ids.
+    """
+
+    def test_uuid7_layout(self):
+        """Test ids are version 7 with the RFC variant and carry the shard."""
+        session_id = uuid7(1)
+        self.assertEqual(session_id.version, 7)
+        self.assertEqual(session_id.variant, uuid.RFC_4122)
+        self.assertEqual(shard_for_session(session_id), 'sessions_1')
+        self.assertEqual(shard_for_session(str(uuid7(0))), 'default')
+
+    def test_uuid7_is_time_ordered(self):
+        """Test ids sort by creation time across milliseconds."""
+        first = uuid7()
+        later = uuid.UUID(int=first.int + (1 << 80))
+        self.assertLess(first, later)
+        self.assertLessEqual(first.int >> 80, uuid7().int >> 80)
+
+    def test_unencoded_ids_have_no_shard(self):
+        """Test UUID4 ids, unknown shard indexes and garbage route nowhere."""
+        self.assertIsNone(shard_for_session(uuid.uuid4()))
+        self.assertIsNone(shard_for_session(uuid7(7)))
+        self.assertIsNone(shard_for_session('not-a-uuid'))
+
+
+@override_settings(DEVICE_SESSION_SHARDS=SHARDS)
+class ShardedSessionsTestCase(APITestCase):
+    """
+    Tests for the session endpoints with sessions spread over two databases.
+    """
+    databases = {'default', 'sessions_1'}
+
+    def setUp(self):
+        self.client = APIClient()
+        # Two consecutive ids land on both shards
+        self.users = [
+            User.objects.create_user(email=f'user{i}@example.com', password='testpass123')
+            for i in range(2)
+        ]
+        self.user = next(u for u in self.users if shard_for_user(u.pk) == 'sessions_1')
+
+    def login(self, user):
+        response = self.client.post('/api/auth/login', {
+            'email': user.email, 'password': 'testpass123', 'device_name': 'Test Device',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_sessions_are_written_to_the_users_shard(self):
+        """Test each user's session row lives only on its shard."""
+        for user in self.users:
+            data = self.login(user)
+            alias = shard_for_user(user.pk)
+            other = next(a for a in SHARDS if a != alias)
+            self.assertEqual(shard_for_session(data['session_id']), alias)
+            self.assertTrue(DeviceSession.objects.using(alias).filter(id=data['session_id']).exists())
+            self.assertFalse(DeviceSession.objects.using(other).filter(id=data['session_id']).exists())
+
+    def test_refresh_list_revoke_and_logout_on_shard(self):
+        """Test the session endpoints find rows on a non-default shard."""
+        data = self.login(self.user)
+        response = self.client.post('/api/auth/refresh', {'refresh': data['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rotated = response.data['refresh']
+        session = DeviceSession.objects.using('sessions_1').get(id=data['session_id'])
+        self.assertEqual(session.refresh_token_jti, str(RefreshToken(rotated)['jti']))
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        response = self.client.get('/api/auth/sessions')
+        self.assertEqual([s['id'] for s in response.data], [data['session_id']])
+
+        other = self.login(self.user)
+        self.client.post(f'/api/auth/sessions/{other["session_id"]}/revoke', {}, format='json')
+        self.assertTrue(DeviceSession.objects.using('sessions_1').get(id=other['session_id']).revoked)
+
+        self.client.post('/api/auth/logout', {'refresh': rotated}, format='json')
+        self.assertTrue(DeviceSession.objects.using('sessions_1').get(id=data['session_id']).revoked)
+
+    def test_refresh_without_sid_routes_by_user_id(self):
+        """Test tokens issued before the sid claim still find their session."""
+        refresh = RefreshToken.for_user(self.user)
+        DeviceSession.objects.using('sessions_1').create(
+            id=uuid.uuid4(), user=self.user, refresh_token_jti=str(refresh['jti']))
+        response = self.client.post('/api/auth/refresh', {'refresh': str(refresh)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_user_stays_on_default_database(self):
+        """Test a session on a shard resolves its user from the default database."""
+        data = self.login(self.user)
+        session = DeviceSession.objects.for_user(self.user).get(id=data['session_id'])
+        self.assertEqual(session.user, self.user)
+        self.assertEqual(session.user._state.db, 'default')
+
+    def test_deleting_user_deletes_sessions_on_shard(self):
+        """Test the cascade reaches sessions on another database."""
+        self.login(self.user)
+        self.user.delete()
+        self.assertFalse(DeviceSession.objects.using('sessions_1').exists())
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql',
+                     'needs PostgreSQL: set TEST_DATABASE_HOST')
+@override_settings(DEVICE_SESSION_SHARDS=['default', 'sessions_migration'])
+class ShardMigrationTestCase(TransactionTestCase):
+    """
+    Tests for migrating a dedicated shard database from scratch. SQLite
+    does not check FK targets when creating tables, so this needs a server.
+    """
+    alias = 'sessions_migration'
+    databases = {'default', alias}
+
+    @classmethod
+    def setUpClass(cls):
+        name = f'{connection.settings_dict["NAME"]}_shard'
+        connections.settings[cls.alias] = {
+            **connection.settings_dict, 'NAME': name,
+            'TEST': {**connection.settings_dict['TEST'], 'NAME': name}}
+        super().setUpClass()
+        cls.old_name = connections[cls.alias].creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[cls.alias].creation.destroy_test_db(cls.old_name, verbosity=0)
+        super().tearDownClass()
+        del connections[cls.alias]
+        del connections.settings[cls.alias]
+
+    def test_shard_holds_sessions_only(self):
+        """Test a shard gets the session table alone, without a constraint to users."""
+        shard = connections[self.alias]
+        tables = shard.introspection.table_names()
+        self.assertIn('accounts_devicesession', tables)
+        self.assertNotIn('accounts_user', tables)
+        with shard.cursor() as cursor:
+            constraints = shard.introspection.get_constraints(cursor, 'accounts_devicesession')
+        self.assertFalse([name for name, info in constraints.items() if info['foreign_key']])
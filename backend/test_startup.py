@@ -0,0 +1,36 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from accounts.management.commands.startup_profile import parse_importtime
+
+
+class StartupTestCase(SimpleTestCase):
+    """
+    Tests for the cold-start tooling.
+    """
+
+    def test_parse_importtime(self):
+        """Test importtime output is aggregated per top-level package."""
+        stderr = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       100 |        100 |   allauth.account\n"
+            "import time:       250 |        350 | allauth\n"
+            "import time:        50 |         50 | jwt\n"
+        )
+        packages = parse_importtime(stderr)
+        self.assertEqual(packages['allauth']['modules'], 2)
+        self.assertAlmostEqual(packages['allauth']['self'], 0.00035)
+        self.assertAlmostEqual(packages['jwt']['self'], 0.00005)
+
+    def test_startup_profile_command(self):
+        """Test the command reports time to first request from a fresh process."""
+        out = StringIO()
+        call_command('startup_profile', '--json', stdout=out)
+        summary = json.loads(out.getvalue())
+        self.assertEqual(summary['status'], 401)
+        self.assertGreater(summary['time_to_first_request'], 0)
+        self.assertIn('accounts', summary['apps'])
+        self.assertIn('django', summary['packages'])
@@ -0,0 +1,141 @@
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from accounts import useragent
+from accounts.models import DeviceSession
+from accounts.useragent import parse
+from test_fixtures import use_revocation_registry
+
+User = get_user_model()
+
+CHROME_MAC = (
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36')
+SAFARI_IPHONE = (
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 '
+    '(KHTML, like Gecko) Version/17.4 Mobile/15E148 Safari/604.1')
+
+USER_AGENTS = [
+    (CHROME_MAC, ('Chrome', 'macOS', 'desktop')),
+    (SAFARI_IPHONE, ('Safari', 'iOS', 'mobile')),
+    ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+     'Chrome/124.0.0.0 Safari/537.36 Edg/124.0.2478.51', ('Edge', 'Windows', 'desktop')),
+    ('Mozilla/5.0 (X11; Linux x86_64; rv:125.0) Gecko/20100101 Firefox/125.0',
+     ('Firefox', 'Linux', 'desktop')),
+    ('Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 (KHTML, like Gecko) '
+     'Chrome/124.0.6367.82 Mobile Safari/537.36', ('Chrome', 'Android', 'mobile')),
+    ('Mozilla/5.0 (Linux; Android 13; SM-X710) AppleWebKit/537.36 (KHTML, like Gecko) '
+     'SamsungBrowser/24.0 Chrome/117.0.0.0 Safari/537.36',
+     ('Samsung Internet', 'Android', 'tablet')),
+    ('Mozilla/5.0 (iPad; CPU OS 17_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) '
+     'CriOS/124.0.6367.88 Mobile/15E148 Safari/604.1', ('Chrome', 'iOS', 'tablet')),
+    ('Mozilla/5.0 (X11; CrOS x86_64 14541.0.0) AppleWebKit/537.36 (KHTML, like Gecko) '
+     'Chrome/124.0.0.0 Safari/537.36', ('Chrome', 'ChromeOS', 'desktop')),
+    ('okhttp/4.12.0', ('okhttp', 'Android', 'mobile')),
+    ('MyApp/3.1 CFNetwork/1492.0.1 Darwin/23.3.0', ('CFNetwork', 'iOS', 'mobile')),
+    ('curl/8.5.0', ('curl', '', 'other')),
+    ('Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
+     ('', '', 'bot')),
+    ('something else entirely', ('', '', 'desktop')),
+]
+
+
+class UserAgentParseTestCase(SimpleTestCase):
+    """
+    Tests for User-Agent parsing and its cache.
+    """
+
+    def setUp(self):
+        parse.cache_clear()
+
+    def test_families(self):
+        """Test common browsers, apps and bots map to normalized families."""
+        for user_agent, expected in USER_AGENTS:
+            self.assertEqual(tuple(parse(user_agent)), expected, user_agent)
+
+    def test_labels(self):
+        """Test device names are built from whatever is known."""
+        self.assertEqual(parse(CHROME_MAC).label, 'Chrome on macOS')
+        self.assertEqual(parse('curl/8.5.0').label, 'curl')
+        self.assertEqual(parse('').label, '')
+        self.assertIs(parse(None), useragent.UNKNOWN)
+
+    def test_memoized(self):
+        """Test a repeated User-Agent is parsed once."""
+        for _ in range(3):
+            parse(SAFARI_IPHONE)
+        info = parse.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 2))
+
+    def test_long_headers_truncated(self):
+        """Test huge User-Agents are cut before parsing, sharing one cache entry."""
+        padding = ' (' + 'x' * 1000
+        parse(CHROME_MAC + padding + ' first)')
+        parse(CHROME_MAC + padding + ' second)')
+        self.assertEqual(parse.cache_info().misses, 1)
+
+
+class DeviceSessionUserAgentTestCase(APITestCase):
+    """
+    Tests for sessions created with device fields from the User-Agent.
+    """
+
+    def setUp(self):
+        self.client = APIClient(HTTP_USER_AGENT=CHROME_MAC)
+        use_revocation_registry(self)
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123')
+
+    def login(self, **data):
+        response = self.client.post('/api/auth/login', {
+            'email': 'test@example.com', 'password': 'testpass123', **data}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return DeviceSession.objects.get(pk=response.data['session_id'])
+
+    def test_login_derives_device(self):
+        """Test a login without a device name is named and typed from its User-Agent."""
+        session = self.login()
+        self.assertEqual(session.device_name, 'Chrome on macOS')
+        self.assertEqual((session.browser, session.os, session.device_type),
+                         ('Chrome', 'macOS', 'desktop'))
+
+    def test_client_device_name_kept(self):
+        """Test a device name sent by the client wins over the derived one."""
+        session = self.login(device_name='Work laptop')
+        self.assertEqual(session.device_name, 'Work laptop')
+        self.assertEqual(session.os, 'macOS')
+
+    def test_register_and_session_list(self):
+        """Test registration stores the device and the session list returns it."""
+        self.client = APIClient(HTTP_USER_AGENT=SAFARI_IPHONE)
+        response = self.client.post('/api/auth/register', {
+            'email': 'new@example.com', 'password': 'Str0ng-Passw0rd!'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        [session] = self.client.get('/api/auth/sessions').data
+        self.assertEqual(session['device_name'], 'Safari on iOS')
+        self.assertEqual(session['device_type'], 'mobile')
+
+    @override_settings(DEVICE_SESSIONS={'REUSE_BY_DEVICE_NAME': True, 'MAX_ACTIVE': 0})
+    def test_reused_session_updates_device(self):
+        """Test reusing a session by device name refreshes its parsed fields."""
+        session = self.login(device_name='Phone')
+        self.client = APIClient(HTTP_USER_AGENT=SAFARI_IPHONE)
+        reused = self.login(device_name='Phone')
+        self.assertEqual(reused.pk, session.pk)
+        self.assertEqual((reused.browser, reused.os), ('Safari', 'iOS'))
+
+    @override_settings(DEVICE_SESSIONS={'REUSE_BY_DEVICE_NAME': True, 'MAX_ACTIVE': 0})
+    def test_derived_name_not_reused(self):
+        """Test two devices with the same User-Agent and no device name get their own sessions."""
+        first, second = self.login(), self.login()
+        self.assertEqual(first.device_name, second.device_name)
+        self.assertNotEqual(first.pk, second.pk)
+
+    def test_fallback_name_without_user_agent(self):
+        """Test a request without a User-Agent keeps the old default name."""
+        self.client = APIClient()
+        session = self.login()
+        self.assertEqual(session.device_name, 'Unknown Device')
+        self.assertEqual(session.device_type, '')
@@ -0,0 +1,229 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import uuid
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts import revocation
+from accounts.revocation import InProcessBroker, RevocationRegistry
+from accounts.sessions import SESSION_ID_CLAIM
+from auth_service import verify_asgi
+from auth_service.verify_asgi import PathRouter, VerifyApp, load_settings
+from test_fixtures import mint_tokens, use_revocation_registry
+
+User = get_user_model()
+
+
+def call(app, method='GET', path='/api/auth/verify', token=None):
+    """Runs one ASGI request through `app`; returns (status, headers, body)."""
+    headers = [(b'authorization', f'Bearer {token}'.encode())] if token else []
+    scope = {'type': 'http', 'method': method, 'path': path, 'headers': headers}
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start, body = messages
+    return start['status'], dict(start['headers']), body['body']
+
+
+def verify_settings(channel):
+    return {
+        'SIMPLE_JWT': load_settings()['SIMPLE_JWT'],
+        'REVOCATION_BROADCAST': {
+            'BROKER': 'accounts.revocation.InProcessBroker',
+            'OPTIONS': {'channel': channel},
+        },
+    }
+
+
+class VerifyAppTestCase(APITestCase):
+    """
+    Tests for the Django-free access-token check against /api/auth/me.
+    """
+
+    def setUp(self):
+        channel = uuid.uuid4().hex
+        self.client = APIClient()
+        self.registry = RevocationRegistry(
+            InProcessBroker(channel), catch_up=revocation.load_unexpired).start()
+        patcher = mock.patch.object(revocation, '_registry', self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.registry.broker.close)
+        self.app = VerifyApp(verify_settings(channel))
+        self.app.start()
+        self.addCleanup(self.app.close)
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123')
+
+    def login(self):
+        response = self.client.post('/api/auth/login', {
+            'email': 'test@example.com', 'password': 'testpass123', 'device_name': 'Phone',
+        }, format='json')
+        return response.data
+
+    def test_valid_access_token(self):
+        """Test a login's access token is accepted with its user and session."""
+        data = self.login()
+        status_code, headers, body = call(self.app, token=data['access'])
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        body = json.loads(body)
+        self.assertEqual(body['user_id'], str(self.user.pk))
+        self.assertEqual(body['session_id'], data['session_id'])
+        self.assertEqual(headers[b'x-auth-user-id'], str(self.user.pk).encode())
+        self.assertEqual(headers[b'x-auth-session-id'], data['session_id'].encode())
+
+    def test_revoked_session_rejected(self):
+        """Test a logged-out session's access token is rejected by both paths."""
+        data = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {data["access"]}')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/auth/logout', {'refresh': data['refresh']}, format='json')
+        self.assertEqual(self.client.get('/api/auth/me').status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+        status_code, _, body = call(self.app, token=data['access'])
+        self.assertEqual(status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(json.loads(body)['detail'], 'Session has been revoked')
+
+    def test_catch_up_on_start(self):
+        """Test revocations made before the app started are applied."""
+        data = self.login()
+        with self.captureOnCommitCallbacks(execute=True):
+            revocation.revoke(session_id=data['session_id'])
+        app = VerifyApp(verify_settings(uuid.uuid4().hex), catch_up=revocation.load_unexpired)
+        app.start()
+        self.addCleanup(app.close)
+        self.assertEqual(call(app, token=data['access'])[0], status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalid_tokens_rejected(self):
+        """Test refresh, expired, tampered, foreign-key and missing tokens get 401."""
+        data = self.login()
+        expired = AccessToken.for_user(self.user)
+        expired.set_exp(lifetime=-timedelta(seconds=1))
+        other_key = verify_settings(uuid.uuid4().hex)
+        other_key['SIMPLE_JWT'] = {**other_key['SIMPLE_JWT'], 'SIGNING_KEY': 'other-key'}
+        other = VerifyApp(other_key)
+        for token in (data['refresh'], str(expired), data['access'][:-2] + 'xx', 'abc', None):
+            status_code, headers, _ = call(self.app, token=token)
+            self.assertEqual(status_code, status.HTTP_401_UNAUTHORIZED, token)
+            self.assertEqual(headers[b'www-authenticate'], b'Bearer realm="api"')
+        self.addCleanup(other.close)
+        self.assertEqual(call(other, token=data['access'])[0], status.HTTP_401_UNAUTHORIZED)
+
+    def test_methods(self):
+        """Test HEAD answers without a body and other methods get 405."""
+        data = self.login()
+        status_code, _, body = call(self.app, method='HEAD', token=data['access'])
+        self.assertEqual((status_code, body), (status.HTTP_200_OK, b''))
+        self.assertEqual(call(self.app, method='POST')[0], status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+SYNC_EVERY_REQUEST = {'INTERVAL': 0, 'MAX_STALENESS': 30, 'OVERLAP': 60}
+
+
+@override_settings(REVOCATION_SYNC=SYNC_EVERY_REQUEST)
+class MountedVerifyAppTestCase(TransactionTestCase):
+    """
+    Tests for the verify app mounted in the Django process, as
+    `auth_service.asgi` does. The sync runs on another thread, so data must
+    be committed.
+    """
+
+    def setUp(self):
+        self.registry = use_revocation_registry(self)
+        settings = {**verify_settings(uuid.uuid4().hex), 'REVOCATION_SYNC': SYNC_EVERY_REQUEST}
+        self.app = VerifyApp(settings, registry=revocation.get_registry, sync=revocation.sync)
+        self.addCleanup(self.app.close)
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123')
+
+    def test_revocation_from_another_worker(self):
+        """Test a logout recorded by another worker's registry reaches the mounted app."""
+        tokens = mint_tokens(self.user)
+        self.assertEqual(call(self.app, token=tokens['access'])[0], status.HTTP_200_OK)
+        self.assertIs(self.app.registry, self.registry)
+
+        other = RevocationRegistry(InProcessBroker(uuid.uuid4().hex)).start()
+        self.addCleanup(other.broker.close)
+        with mock.patch.object(revocation, '_registry', other):
+            revocation.revoke(session_id=tokens['session_id'])
+        self.assertFalse(self.registry.is_revoked(sid=tokens['session_id']))
+
+        status_code, _, body = call(self.app, token=tokens['access'])
+        self.assertEqual(status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(json.loads(body)['detail'], 'Session has been revoked')
+
+    def test_close_keeps_shared_registry(self):
+        """Test closing the app leaves the process's registry subscribed."""
+        self.app.start()
+        self.app.close()
+        self.assertIn(self.registry.apply,
+                      InProcessBroker.channels[self.registry.broker.channel])
+
+
+class VerifyRouterTestCase(SimpleTestCase):
+    """
+    Tests for mounting the verify app in front of another ASGI app.
+    """
+
+    def test_routes_by_path_prefix(self):
+        """Test only the mounted path (and below) reaches the verify app."""
+        async def default(scope, receive, send):
+            await send({'type': 'http.response.start', 'status': 204, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b''})
+
+        app = VerifyApp(verify_settings(uuid.uuid4().hex))
+        self.addCleanup(app.close)
+        router = PathRouter('/api/auth/verify/', app, default)
+        self.assertEqual(call(router, path='/api/auth/verify')[0], 401)
+        self.assertEqual(call(router, path='/api/auth/verify/x')[0], 401)
+        self.assertEqual(call(router, path='/api/auth/verifyx')[0], 204)
+        self.assertEqual(call(router, path='/api/auth/me')[0], 204)
+
+    def test_lifespan(self):
+        """Test lifespan startup starts the registry and shutdown closes it."""
+        app = VerifyApp(verify_settings(uuid.uuid4().hex))
+        events = iter([{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+        sent = []
+
+        async def receive():
+            return next(events)
+
+        async def send(message):
+            sent.append(message['type'])
+            if message['type'] == 'lifespan.startup.complete':
+                self.assertIsNotNone(app.registry)
+
+        asyncio.run(app({'type': 'lifespan'}, receive, send))
+        self.assertEqual(sent, ['lifespan.startup.complete', 'lifespan.shutdown.complete'])
+        self.assertIsNone(app.registry)
+
+    def test_settings_match_simple_jwt(self):
+        """Test the app reads the project's SIMPLE_JWT settings and session claim."""
+        from django.conf import settings
+
+        conf = load_settings()['SIMPLE_JWT']
+        for name, value in settings.SIMPLE_JWT.items():
+            self.assertEqual(conf[name], value)
+        self.assertEqual(verify_asgi.SESSION_ID_CLAIM, SESSION_ID_CLAIM)
+
+    def test_imports_no_django(self):
+        """Test the module loads without importing Django."""
+        code = ('import sys, auth_service.verify_asgi; '
+                'sys.exit(any(m.startswith("django") for m in sys.modules))')
+        env = {**os.environ, 'SECRET_KEY': 'x'}
+        result = subprocess.run([sys.executable, '-c', code], env=env,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(result.returncode, 0)
@@ -0,0 +1,108 @@
+import threading
+from unittest import mock
+
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from accounts import warmup
+
+
+def join_warm_up_threads():
+    for thread in threading.enumerate():
+        if thread.name == 'warm-up':
+            thread.join()
+
+
+class WarmupTestCase(APITestCase):
+    """
+    Tests for the worker warm-up hook and the readiness endpoint.
+    """
+    databases = '__all__'  # the database step connects every alias
+
+    def setUp(self):
+        self.client = APIClient()
+        self.ready_url = '/api/health/ready'
+        self.saved_state = dict(warmup._state, steps=dict(warmup._state['steps']))
+        warmup._state.update(status='pending', steps={})
+
+    def tearDown(self):
+        warmup._state.update(self.saved_state)
+
+    def test_not_ready_before_warm_up(self):
+        """Test the readiness probe fails until warm-up has run."""
+        response = self.client.get(self.ready_url)
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response.data['status'], 'pending')
+
+    def test_ready_after_warm_up(self):
+        """Test every step runs and the readiness probe then succeeds."""
+        self.assertTrue(warmup.warm_up())
+        response = self.client.get(self.ready_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'ready')
+        for name in ('password_hasher', 'password_validators', 'signing_keys',
+                     'url_resolver', 'database', 'cache', 'recent_sessions'):
+            self.assertEqual(response.data['steps'][name]['status'], 'ok')
+
+    def test_warm_up_without_connections(self):
+        """Test connection steps are skipped when the caller cannot keep them."""
+        self.assertTrue(warmup.warm_up(connections=False))
+        steps = warmup.status()['steps']
+        self.assertEqual(steps['database']['status'], 'skipped')
+        self.assertEqual(steps['cache']['status'], 'skipped')
+        self.assertEqual(steps['password_hasher']['status'], 'ok')
+
+    def test_preload_recent_sessions(self):
+        """Test the session preload step queries recently active sessions."""
+        with self.settings(WARMUP={'PRELOAD_SESSIONS': 10}):
+            with self.assertNumQueries(1):
+                warmup._recent_sessions()
+
+    def test_failed_step_is_reported_and_retried(self):
+        """Test a failing step keeps the worker unready and is retried on probe."""
+        failing = ('broken', mock.Mock(side_effect=RuntimeError), False)
+        with mock.patch.object(warmup, '_steps', warmup._steps + [failing]):
+            self.assertFalse(warmup.warm_up())
+        self.assertEqual(warmup.status()['steps']['broken']['status'], 'failed')
+
+        with mock.patch.object(warmup, 'retry') as retry:
+            response = self.client.get(self.ready_url)
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response.data['status'], 'failed')
+        retry.assert_called_once_with()
+
+    def test_retry_with_connections_runs_on_probe(self):
+        """Test a WSGI warm-up is retried on the probe's thread, connections included."""
+        failing = ('broken', mock.Mock(side_effect=[RuntimeError, None]), False)
+        with mock.patch.object(warmup, '_steps', warmup._steps + [failing]):
+            with self.settings(WARMUP={'MODE': 'sync'}):
+                warmup.warm_up_application()
+            response = self.client.get(self.ready_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['steps']['database']['status'], 'ok')
+
+    def test_retry_keeps_connections_false(self):
+        """Test a retry after an ASGI warm-up still skips the connection steps."""
+        failing = ('broken', mock.Mock(side_effect=[RuntimeError, None]), False)
+        with mock.patch.object(warmup, '_steps', warmup._steps + [failing]):
+            with self.settings(WARMUP={'MODE': 'sync'}):
+                warmup.warm_up_application(connections=False)
+            self.client.get(self.ready_url)
+            join_warm_up_threads()
+        self.assertTrue(warmup.is_ready())
+        self.assertEqual(warmup.status()['steps']['database']['status'], 'skipped')
+
+    def test_background_mode_skips_connections(self):
+        """Test background warm-up does not open connections on its own thread."""
+        with self.settings(WARMUP={'MODE': 'background'}):
+            warmup.warm_up_application()
+            join_warm_up_threads()
+        self.assertTrue(warmup.is_ready())
+        self.assertEqual(warmup.status()['steps']['database']['status'], 'skipped')
+
+    def test_warm_up_application_off(self):
+        """Test MODE "off" marks the worker ready without running steps."""
+        with self.settings(WARMUP={'MODE': 'off'}):
+            warmup.warm_up_application()
+        self.assertTrue(warmup.is_ready())
+        self.assertEqual(warmup.status()['steps'], {})